@@ -75,6 +75,11 @@ def get_massive_tickers():
     print(f" - NYSE: {len(df_nyse)}개")
     print(f" - AMEX: {len(df_amex)}개")
     
+    # 거래소 정보 보존 (KIS 차트 조회 시 거래소 코드 캐시 시드로 사용)
+    df_nasdaq['Exchange'] = 'NASDAQ'
+    df_nyse['Exchange'] = 'NYSE'
+    df_amex['Exchange'] = 'AMEX'
+
     # 2. 통합 및 데이터 정제
     df_all = pd.concat([df_nasdaq, df_nyse, df_amex])
     
@@ -102,6 +107,7 @@ def get_massive_tickers():
             "ticker": ticker,
             "name": name,
             "sector": sector,
+            "exchange": row['Exchange'],
             "keywords": keywords, # [NEW]
             "status": "BAD",      # 초기 상태는 '분석 전(BAD)'로 설정 -> 이후 update_volume_tier가 등급 매김
             "fail_count": 0,
@@ -130,6 +136,7 @@ def seed_db():
             bigquery.SchemaField("ticker", "STRING", mode="REQUIRED"),
             bigquery.SchemaField("name", "STRING", mode="NULLABLE"),
             bigquery.SchemaField("sector", "STRING", mode="NULLABLE"),
+            bigquery.SchemaField("exchange", "STRING", mode="NULLABLE"),
             bigquery.SchemaField("keywords", "STRING", mode="NULLABLE"), # [NEW]
             bigquery.SchemaField("status", "STRING", mode="NULLABLE"),
             bigquery.SchemaField("change_rate", "FLOAT", mode="NULLABLE"),
@@ -1,9 +1,8 @@
-import requests
-import json
 import logging
 import os
 import mervis_state
 import kis_auth
+import kis_client
 
 def _get_api_config():
     mode = mervis_state.get_mode()
@@ -44,14 +43,10 @@ def get_my_total_assets():
         logging.error("[Account] Token generation failed.")
         return None
 
-    headers = {
-        "content-type": "application/json; charset=utf-8",
-        "authorization": f"Bearer {token}",
-        "appkey": config['app_key'],
-        "appsecret": config['app_secret'],
-        "tr_id": config['tr_id_balance'],
-        "custtype": "P"
-    }
+    headers = kis_client.make_headers(
+        config['tr_id_balance'], token=token, config=config,
+        content_type="application/json; charset=utf-8", extra={"custtype": "P"}
+    )
 
     params = {
         "CANO": config['cano'],
@@ -65,11 +60,9 @@ def get_my_total_assets():
     }
 
     path = "/uapi/overseas-stock/v1/trading/inquire-present-balance"
-    url = f"{config['base_url']}{path}"
 
     try:
-        res = requests.get(url, headers=headers, params=params, timeout=5)
-        data = res.json()
+        data = kis_client.get(path, params=params, headers=headers)
 
         if data.get('rt_cd') != '0':
             msg = data.get('msg1', 'Unknown Error')
@@ -0,0 +1,80 @@
+import asyncio
+import aiohttp
+import kis_client
+import kis_exchange
+import kis_limiter
+
+# [KIS 비동기 클라이언트]
+# asyncio 크롤러 전용: 하나의 aiohttp 세션으로 다수의 차트 요청을 동시에 처리
+# 호출 속도 제한은 동기 클라이언트와 같은 Token Bucket을 공유함
+
+CHART_PATH = "uapi/overseas-price/v1/quotations/price"
+CHART_TR_ID = "HHDFS76240000"
+
+class AsyncKISClient:
+    def __init__(self, max_connections=20, timeout=5):
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session = None
+        self.base_url = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        self.base_url = kis_client.get_config()['base_url']
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.session:
+            await self.session.close()
+
+    async def get(self, path, params, headers):
+        """
+        GET 요청 (Token Bucket 대기 + 초당 건수 초과 시 백오프 재시도)
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        bucket = kis_limiter.get_bucket()
+
+        for attempt in range(kis_client.MAX_RATE_RETRIES + 1):
+            wait = bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            async with self.session.get(url, params=params, headers=headers) as res:
+                payload = await res.json(content_type=None)
+
+            if kis_limiter.is_rate_limited(payload) and attempt < kis_client.MAX_RATE_RETRIES:
+                bucket.penalize(kis_client.RATE_RETRY_BACKOFF * (2 ** attempt))
+                continue
+            return payload
+
+    async def fetch_chart(self, ticker, gubn="0", bymd="", headers=None):
+        # kis_chart._fetch_chart와 동일한 규칙 (거래소 캐시 우선 조회)
+        if headers is None:
+            headers = kis_client.make_headers(CHART_TR_ID)
+            if not headers: return None
+
+        cached_exc = kis_exchange.get_exchange(ticker)
+        for i, exc in enumerate(kis_exchange.get_candidates(ticker)):
+            if i > 0:
+                kis_exchange.record_probe()
+
+            params = {
+                "AUTH": "", "EXCD": exc, "SYMB": ticker,
+                "GUBN": gubn, "BYMD": bymd, "MODP": "1", "KEYB": ""
+            }
+            try:
+                data = await self.get(CHART_PATH, params, headers)
+                if data.get('rt_cd') == '0' and len(data.get('output2', [])) > 0:
+                    if cached_exc and exc != cached_exc:
+                        kis_exchange.invalidate(ticker)
+                    kis_exchange.learn(ticker, exc)
+                    return data['output2']
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                continue
+        return None
+
+    async def fetch_daily_chart(self, ticker, bymd="", headers=None):
+        return await self.fetch_chart(ticker, "0", bymd, headers=headers)
@@ -2,6 +2,7 @@ import requests
 import json
 import time
 import os
+import threading
 import mervis_state
 
 # 토큰 정보를 저장할 로컬 파일 경로
@@ -22,6 +23,19 @@ def get_env_config(mode):
             "app_secret": os.getenv("KIS_APP_SECRET_MOCK")
         }
 
+# --- 프로세스 내 토큰 저장소 ---
+# 호출마다 파일을 읽지 않도록 메모리에 캐시하고, 파일은 영속화 용도로만 사용
+# 구조: { "REAL": {"token": ..., "expire_time": ..., "approval_key": ..., "approval_key_time": ...} }
+_TOKEN_STORE = None
+_STORE_LOCK = threading.Lock()
+
+# 모드별 재발급 락 (만료 임박 시 한 스레드만 재발급하고 나머지는 대기)
+_REFRESH_LOCKS = {"REAL": threading.Lock(), "MOCK": threading.Lock()}
+
+# 토큰 발급 실패 후 재요청 금지 시간(초) - KIS tokenP는 약 1분당 1회 제한
+TOKEN_RETRY_COOLDOWN = 60
+_TOKEN_FAILED_AT = {}  # { "REAL": 마지막 발급 실패 시각 }
+
 def load_cache():
     # 파일에서 토큰 및 키 정보를 읽어옴
     if not os.path.exists(CACHE_FILE):
@@ -33,27 +47,85 @@ def load_cache():
         return {}
 
 def save_cache(data):
-    # 토큰 및 키 정보를 파일에 저장함
+    # 토큰 및 키 정보를 파일에 저장함 (임시 파일에 쓴 뒤 교체하여 반쯤 쓰인 파일 방지)
+    tmp_file = f"{CACHE_FILE}.{os.getpid()}.tmp"
     try:
-        with open(CACHE_FILE, "w", encoding="utf-8") as f:
+        with open(tmp_file, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=4)
+        os.replace(tmp_file, CACHE_FILE)
     except Exception as e:
         print(f"[System] Failed to save token file: {e}")
 
+def _get_store_unlocked():
+    # _STORE_LOCK을 잡은 상태에서 호출 (최초 1회만 파일 로드)
+    global _TOKEN_STORE
+    if _TOKEN_STORE is None:
+        _TOKEN_STORE = load_cache()
+    return _TOKEN_STORE
+
+def _get_mode_cache(mode):
+    with _STORE_LOCK:
+        return dict(_get_store_unlocked().get(mode, {}))
+
+def _update_mode_cache(mode, values):
+    # 메모리 갱신 후 파일로 영속화
+    # 파일은 다시 읽어 해당 모드 값만 병합 (다른 프로세스가 갱신한 다른 모드 토큰/키를 덮어쓰지 않음)
+    with _STORE_LOCK:
+        store = _get_store_unlocked()
+        store.setdefault(mode, {}).update(values)
+        disk = load_cache()
+        disk.setdefault(mode, {}).update(values)
+        save_cache(disk)
+
+def _reload_mode_cache(mode):
+    # 다른 프로세스(GUI/크롤러 등)가 이미 재발급했을 수 있으므로 파일을 다시 확인
+    disk = load_cache().get(mode, {})
+    if not disk: return
+    with _STORE_LOCK:
+        store = _get_store_unlocked()
+        merged = store.get(mode, {})
+        if disk.get("expire_time", 0) > merged.get("expire_time", 0):
+            merged["token"] = disk.get("token")
+            merged["expire_time"] = disk.get("expire_time", 0)
+        if disk.get("approval_key_time", 0) > merged.get("approval_key_time", 0):
+            merged["approval_key"] = disk.get("approval_key")
+            merged["approval_key_time"] = disk.get("approval_key_time", 0)
+        store[mode] = merged
+
+def _is_token_valid(mode_cache):
+    # 유효기간이 10분(600초) 이상 남았으면 재활용
+    return bool(mode_cache.get("token")) and (mode_cache.get("expire_time", 0) - time.time() > 600)
+
+def _is_ws_key_valid(mode_cache):
+    # 발급된 지 20시간(72000초) 이내라면 재사용
+    return bool(mode_cache.get("approval_key")) and (time.time() - mode_cache.get("approval_key_time", 0) < 72000)
+
 def get_access_token():
     mode = mervis_state.get_mode()
     
-    # 1. 디스크 캐시 확인
-    cache = load_cache()
-    mode_cache = cache.get(mode, {})
-    
-    saved_token = mode_cache.get("token")
-    expire_time = mode_cache.get("expire_time", 0)
+    # 1. 메모리 캐시 확인 (파일 I/O 없음)
+    mode_cache = _get_mode_cache(mode)
+    if _is_token_valid(mode_cache):
+        return mode_cache["token"]
+
+    # 만료 임박: 한 스레드만 재발급 (나머지는 락에서 대기 후 새 토큰 사용)
+    with _REFRESH_LOCKS.setdefault(mode, threading.Lock()):
+        _reload_mode_cache(mode)
+        mode_cache = _get_mode_cache(mode)
+        if _is_token_valid(mode_cache):
+            return mode_cache["token"]
+        # 직전 발급이 실패했으면 대기 중이던 스레드들이 연달아 재요청하지 않도록 잠시 None 반환
+        if time.time() - _TOKEN_FAILED_AT.get(mode, 0) < TOKEN_RETRY_COOLDOWN:
+            return None
+        token = _issue_access_token(mode)
+        if token:
+            _TOKEN_FAILED_AT.pop(mode, None)
+        else:
+            _TOKEN_FAILED_AT[mode] = time.time()
+        return token
+
+def _issue_access_token(mode):
     current_time = time.time()
-    
-    # 유효기간이 10분(600초) 이상 남았으면 재활용
-    if saved_token and (expire_time - current_time > 600):
-        return saved_token
 
     # 2. 토큰 만료 또는 없음 -> 신규 발급 요청
     config = get_env_config(mode)
@@ -87,12 +159,8 @@ def get_access_token():
             expires_in = int(data.get('expires_in', 86400))
             new_expire_time = current_time + expires_in
             
-            # 캐시 업데이트 및 저장
-            if mode not in cache: cache[mode] = {}
-            cache[mode]["token"] = new_token
-            cache[mode]["expire_time"] = new_expire_time
-            
-            save_cache(cache)
+            # 메모리 캐시 업데이트 및 파일 저장
+            _update_mode_cache(mode, {"token": new_token, "expire_time": new_expire_time})
             
             print(f"[Auth] Token issued successfully. (Expires in: {expires_in}s)")
             return new_token
@@ -107,17 +175,20 @@ def get_access_token():
 def get_websocket_key():
     mode = mervis_state.get_mode()
     
-    # 1. 디스크 캐시 확인
-    cache = load_cache()
-    mode_cache = cache.get(mode, {})
-    
-    saved_ws_key = mode_cache.get("approval_key")
-    ws_key_time = mode_cache.get("approval_key_time", 0)
-    current_time = time.time()
+    # 1. 메모리 캐시 확인
+    mode_cache = _get_mode_cache(mode)
+    if _is_ws_key_valid(mode_cache):
+        return mode_cache["approval_key"]
 
-    # 발급된 지 20시간(72000초) 이내라면 재사용
-    if saved_ws_key and (current_time - ws_key_time < 72000):
-        return saved_ws_key
+    with _REFRESH_LOCKS.setdefault(mode, threading.Lock()):
+        _reload_mode_cache(mode)
+        mode_cache = _get_mode_cache(mode)
+        if _is_ws_key_valid(mode_cache):
+            return mode_cache["approval_key"]
+        return _issue_websocket_key(mode)
+
+def _issue_websocket_key(mode):
+    current_time = time.time()
 
     # 2. 신규 키 발급 요청
     config = get_env_config(mode)
@@ -146,12 +217,8 @@ def get_websocket_key():
             data = res.json()
             new_key = data['approval_key']
             
-            # 캐시 업데이트 및 저장
-            if mode not in cache: cache[mode] = {}
-            cache[mode]["approval_key"] = new_key
-            cache[mode]["approval_key_time"] = current_time
-            
-            save_cache(cache)
+            # 메모리 캐시 업데이트 및 파일 저장
+            _update_mode_cache(mode, {"approval_key": new_key, "approval_key_time": current_time})
             
             print(f"[Auth] WebSocket Key issued successfully.")
             return new_key
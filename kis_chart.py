@@ -1,39 +1,26 @@
-import requests
-import kis_auth
-import mervis_state
-import time 
+import kis_client
+import kis_exchange
 
 # 기준일자(BYMD) 파라미터 대응을 위한 공통 함수 수정
 def _fetch_chart(ticker, gubn, bymd=""):
-    # API 호출 전 잠시 대기 (모의투자 서버 부하 방지)
-    time.sleep(0.2)
-    
-    token = kis_auth.get_access_token()
-    if not token: 
+    # 호출 속도는 kis_client의 전역 Token Bucket이 제한 (고정 sleep 제거)
+    # 공통 클라이언트에서 토큰/앱키 헤더 생성 (Keep-Alive 세션 재사용)
+    headers = kis_client.make_headers("HHDFS76240000")
+    if not headers: 
         print(f"[Chart] Error: No token found.")
         return None
-    
-    mode = mervis_state.get_mode()
-    # secret 직접 참조 대신 kis_auth의 환경 설정 함수 사용
-    config = kis_auth.get_env_config(mode)
-    base_url = config['base_url']
-    app_key = config['app_key']
-    app_secret = config['app_secret']
 
     path = "uapi/overseas-price/v1/quotations/price"
-    url = f"{base_url}/{path}"
 
-    headers = {
-        "content-type": "application/json",
-        "authorization": f"Bearer {token}",
-        "appKey": app_key,
-        "appSecret": app_secret,
-        "tr_id": "HHDFS76240000"
-    }
-
-    exchanges = ["NAS", "NYS", "AMS"]
+    # 캐시된 거래소를 먼저 조회 (일반적인 경우 1회 호출로 완료)
+    cached_exc = kis_exchange.get_exchange(ticker)
+    exchanges = kis_exchange.get_candidates(ticker)
+    failed = False # 요청 실패(오류 응답/예외)가 한 번이라도 있었는지
     
-    for exc in exchanges:
+    for i, exc in enumerate(exchanges):
+        if i > 0:
+            kis_exchange.record_probe()
+
         params = {
             "AUTH": "", 
             "EXCD": exc, 
@@ -45,16 +32,22 @@ def _fetch_chart(ticker, gubn, bymd=""):
         }
 
         try:
-            res = requests.get(url, headers=headers, params=params, timeout=5)
-            data = res.json()
+            data = kis_client.get(path, params=params, headers=headers)
             
             if data.get('rt_cd') == '0' and len(data.get('output2', [])) > 0:
+                if cached_exc and exc != cached_exc:
+                    kis_exchange.invalidate(ticker)
+                kis_exchange.learn(ticker, exc)
                 return data['output2']
+            if data.get('rt_cd') != '0':
+                failed = True
                 
         except Exception as e:
+            failed = True
             continue
     
-    return None
+    # 실패: None (다음에 재시도) / 모든 거래소가 정상 응답했지만 데이터 없음: [] (해당 기간 이력 없음)
+    return None if failed else []
 
 def get_daily_chart(ticker, bymd=""):
     return _fetch_chart(ticker, "0", bymd)
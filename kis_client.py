@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import kis_auth
+import kis_limiter
+import mervis_state
+
+# [KIS REST 공통 클라이언트]
+# 모든 KIS REST 호출이 하나의 Session(Keep-Alive 커넥션 풀)을 공유하도록 하여
+# 호출마다 발생하던 TCP+TLS 핸드셰이크 비용을 제거함
+
+# 호스트당 커넥션 풀 크기 (크롤러 MAX_WORKERS와 맞춰 configure_pool로 조정)
+DEFAULT_POOL_SIZE = int(os.getenv("KIS_POOL_SIZE", "10"))
+DEFAULT_TIMEOUT = 5
+
+# 초당 거래건수 초과(EGW00201) 응답 시 재시도 정책
+MAX_RATE_RETRIES = 3
+RATE_RETRY_BACKOFF = 0.5  # 0.5s -> 1s -> 2s
+
+_session = None
+_session_lock = threading.Lock()
+_pool_size = DEFAULT_POOL_SIZE
+
+# 엔드포인트별 지연시간 통계
+# 구조: { "uapi/overseas-price/v1/quotations/price [HHDFS76240000]": {"count": 10, "errors": 0, "rate_limited": 0, "total": 1.2, "max": 0.3} }
+# (시세/차트가 같은 path를 쓰므로 TR ID까지 포함하여 구분)
+_STATS = {}
+_STATS_LOCK = threading.Lock()
+
+def _build_session(pool_size):
+    session = requests.Session()
+    # 재시도는 호출부(rate limit 등)에서 판단하므로 어댑터 레벨 재시도는 사용하지 않음
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_session():
+    # 프로세스 전역 Session (지연 생성)
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session(_pool_size)
+    return _session
+
+def configure_pool(max_workers):
+    """
+    동시 호출 스레드 수에 맞춰 호스트당 커넥션 풀 크기를 재설정
+    (풀이 작으면 스레드가 커넥션을 기다리거나 새 연결을 버리게 됨)
+    """
+    global _session, _pool_size
+    with _session_lock:
+        if max_workers <= _pool_size and _session is not None:
+            return
+        _pool_size = max(int(max_workers), 1)
+        old = _session
+        _session = _build_session(_pool_size)
+    if old:
+        old.close()
+
+def get_config():
+    return kis_auth.get_env_config(mervis_state.get_mode())
+
+def make_headers(tr_id, token=None, config=None, content_type="application/json", extra=None):
+    # KIS 공통 헤더 (토큰, 앱키, TR ID)
+    if config is None:
+        config = get_config()
+    if token is None:
+        token = kis_auth.get_access_token()
+    if not token:
+        return None
+
+    headers = {
+        "content-type": content_type,
+        "authorization": f"Bearer {token}",
+        "appKey": config['app_key'],
+        "appSecret": config['app_secret'],
+        "tr_id": tr_id
+    }
+    if extra:
+        headers.update(extra)
+    return headers
+
+def _record(endpoint, elapsed, ok, rate_limited=False):
+    with _STATS_LOCK:
+        stat = _STATS.get(endpoint)
+        if stat is None:
+            stat = {"count": 0, "errors": 0, "rate_limited": 0, "total": 0.0, "max": 0.0}
+            _STATS[endpoint] = stat
+        stat["count"] += 1
+        if not ok: stat["errors"] += 1
+        if rate_limited: stat["rate_limited"] += 1
+        stat["total"] += elapsed
+        if elapsed > stat["max"]: stat["max"] = elapsed
+
+def request(method, path, tr_id=None, params=None, body=None, headers=None, timeout=DEFAULT_TIMEOUT):
+    """
+    KIS REST 호출 공통 진입점
+    - path: "uapi/..." 형태 (앞의 '/'는 있어도 무방)
+    - headers가 없으면 tr_id로 공통 헤더를 생성
+    - 성공 시 JSON(dict), 토큰 발급 실패 시 None 반환 (통신 오류는 호출부로 예외 전파)
+    """
+    config = get_config()
+    path = path.lstrip("/")
+    url = f"{config['base_url']}/{path}"
+
+    if headers is None:
+        headers = make_headers(tr_id, config=config)
+        if headers is None:
+            return None
+
+    endpoint = f"{path} [{headers.get('tr_id', '-')}]"
+    data = json.dumps(body) if body is not None else None
+
+    for attempt in range(MAX_RATE_RETRIES + 1):
+        # 프로세스 전역 Token Bucket에서 호출 권한 획득 (초과 시 대기)
+        kis_limiter.acquire()
+
+        start = time.perf_counter()
+        try:
+            res = get_session().request(method, url, headers=headers, params=params, data=data, timeout=timeout)
+            payload = res.json()
+        except Exception:
+            _record(endpoint, time.perf_counter() - start, False)
+            raise
+
+        limited = kis_limiter.is_rate_limited(payload)
+        _record(endpoint, time.perf_counter() - start, True, rate_limited=limited)
+
+        if limited and attempt < MAX_RATE_RETRIES:
+            # 버킷을 비워 다른 스레드까지 함께 감속시킨 뒤 재시도
+            kis_limiter.penalize(RATE_RETRY_BACKOFF * (2 ** attempt))
+            continue
+        return payload
+
+def get(path, tr_id=None, params=None, headers=None, timeout=DEFAULT_TIMEOUT):
+    return request("GET", path, tr_id=tr_id, params=params, headers=headers, timeout=timeout)
+
+def post(path, tr_id=None, body=None, headers=None, timeout=DEFAULT_TIMEOUT):
+    return request("POST", path, tr_id=tr_id, body=body, headers=headers, timeout=timeout)
+
+def _connection_counters():
+    # urllib3 커넥션 풀의 누적 요청 수 / 신규 연결 수 집계
+    requests_total = 0
+    connections_total = 0
+    session = _session
+    if session is None:
+        return 0, 0
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None: continue
+            requests_total += getattr(pool, "num_requests", 0)
+            connections_total += getattr(pool, "num_connections", 0)
+    return requests_total, connections_total
+
+def get_stats():
+    """
+    엔드포인트별 지연시간 및 커넥션 재사용 통계 반환
+    """
+    with _STATS_LOCK:
+        endpoints = {}
+        for endpoint, s in _STATS.items():
+            avg = s["total"] / s["count"] if s["count"] else 0.0
+            endpoints[endpoint] = {
+                "count": s["count"],
+                "errors": s["errors"],
+                "rate_limited": s["rate_limited"],
+                "avg_ms": round(avg * 1000, 1),
+                "max_ms": round(s["max"] * 1000, 1)
+            }
+
+    req_total, conn_total = _connection_counters()
+    reused = max(req_total - conn_total, 0)
+    return {
+        "endpoints": endpoints,
+        "limiter": kis_limiter.get_stats(),
+        "pool_size": _pool_size,
+        "requests": req_total,
+        "new_connections": conn_total,
+        "reused_connections": reused,
+        "reuse_rate": round(reused / req_total, 3) if req_total else 0.0
+    }
+
+def print_stats():
+    stats = get_stats()
+    print(f" [KIS Client] Requests: {stats['requests']} | New Conn: {stats['new_connections']} | Reuse: {stats['reuse_rate']*100:.1f}% (Pool: {stats['pool_size']})")
+    for endpoint, s in stats["endpoints"].items():
+        print(f"   - {endpoint}: {s['count']} calls, avg {s['avg_ms']}ms, max {s['max_ms']}ms, errors {s['errors']}, rate-limited {s['rate_limited']}")
+    for mode, b in stats["limiter"].items():
+        print(f"   - Limiter[{mode}]: {b['rate']}/s, {b['acquired']} acquired, waited {b['waited_sec']}s")
+
+def reset_stats():
+    with _STATS_LOCK:
+        _STATS.clear()
@@ -0,0 +1,146 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+# [거래소 코드 캐시]
+# 티커별 KIS 거래소 코드(NAS/NYS/AMS)를 기억하여
+# 차트 조회 시 NAS -> NYS -> AMS 순차 탐색(헛호출)을 생략하기 위한 모듈
+
+CACHE_FILE = "mervis_exchange_cache.json"
+CACHE_TTL = 30 * 86400   # 30일 (상장 거래소 이전 대비)
+SAVE_EVERY = 50          # 신규 학습 50건마다 디스크 반영
+
+EXCHANGES = ["NAS", "NYS", "AMS"]
+
+# ticker_universe / FinanceDataReader 거래소명 -> KIS 거래소 코드
+EXCHANGE_ALIAS = {
+    "NASDAQ": "NAS", "NAS": "NAS", "NASD": "NAS",
+    "NYSE": "NYS", "NYS": "NYS",
+    "AMEX": "AMS", "AMS": "AMS", "NYSE AMERICAN": "AMS"
+}
+
+# 구조: { "TSLA": {"excd": "NAS", "ts": 1767225600.0} }
+_CACHE = {}
+_LOCK = threading.Lock()
+_loaded = False
+_dirty = 0
+
+_STATS = {"lookups": 0, "hits": 0, "misses": 0, "fallback_probes": 0, "invalidations": 0}
+
+def _load():
+    global _loaded
+    if _loaded: return
+    with _LOCK:
+        if _loaded: return
+        if os.path.exists(CACHE_FILE):
+            try:
+                with open(CACHE_FILE, "r", encoding="utf-8") as f:
+                    _CACHE.update(json.load(f))
+            except Exception as e:
+                print(f"[Exchange] Failed to load cache file: {e}")
+        _loaded = True
+
+def _save_locked():
+    # 임시 파일에 쓴 뒤 교체 (쓰기 도중 종료되어도 기존 파일 보존)
+    global _dirty
+    tmp = f"{CACHE_FILE}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_CACHE, f)
+        os.replace(tmp, CACHE_FILE)
+        _dirty = 0
+    except Exception as e:
+        print(f"[Exchange] Failed to save cache file: {e}")
+
+def flush():
+    with _LOCK:
+        if _dirty:
+            _save_locked()
+
+atexit.register(flush)
+
+def normalize(exchange):
+    if not exchange: return None
+    return EXCHANGE_ALIAS.get(str(exchange).strip().upper())
+
+def seed(exchange_map):
+    """
+    ticker_universe 등 외부 소스의 {ticker: 거래소} 정보로 캐시 초기화
+    (이미 응답으로 학습된 값은 덮어쓰지 않음)
+    """
+    global _dirty
+    _load()
+    now = time.time()
+    added = 0
+    with _LOCK:
+        for ticker, exchange in exchange_map.items():
+            excd = normalize(exchange)
+            if not excd or ticker in _CACHE: continue
+            _CACHE[ticker] = {"excd": excd, "ts": now}
+            added += 1
+        if added:
+            _dirty += added
+            _save_locked()
+    return added
+
+def get_exchange(ticker):
+    # 유효한 캐시가 있으면 거래소 코드, 없으면 None
+    _load()
+    with _LOCK:
+        entry = _CACHE.get(ticker)
+    if entry and time.time() - entry.get("ts", 0) < CACHE_TTL:
+        return entry["excd"]
+    return None
+
+def get_candidates(ticker):
+    """
+    조회 순서 반환: 캐시된 거래소를 맨 앞에, 나머지는 기본 순서대로
+    """
+    excd = get_exchange(ticker)
+    with _LOCK:
+        _STATS["lookups"] += 1
+        if excd: _STATS["hits"] += 1
+        else: _STATS["misses"] += 1
+    if not excd:
+        return list(EXCHANGES)
+    return [excd] + [e for e in EXCHANGES if e != excd]
+
+def record_probe():
+    # 첫 후보가 실패하여 다음 거래소로 넘어간 횟수
+    with _LOCK:
+        _STATS["fallback_probes"] += 1
+
+def learn(ticker, excd):
+    # 성공 응답을 받은 거래소 코드 기록
+    global _dirty
+    _load()
+    with _LOCK:
+        entry = _CACHE.get(ticker)
+        if entry and entry.get("excd") == excd and time.time() - entry.get("ts", 0) < CACHE_TTL:
+            return
+        _CACHE[ticker] = {"excd": excd, "ts": time.time()}
+        _dirty += 1
+        if _dirty >= SAVE_EVERY:
+            _save_locked()
+
+def invalidate(ticker):
+    # 캐시된 거래소에서 조회가 실패한 경우 (상장 이전/폐지 등)
+    global _dirty
+    _load()
+    with _LOCK:
+        if _CACHE.pop(ticker, None) is not None:
+            _STATS["invalidations"] += 1
+            _dirty += 1
+
+def get_stats():
+    with _LOCK:
+        stats = dict(_STATS)
+        stats["cached"] = len(_CACHE)
+    stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 3) if stats["lookups"] else 0.0
+    return stats
+
+def print_stats():
+    s = get_stats()
+    print(f" [Exchange Cache] Lookups: {s['lookups']} | Hit: {s['hit_rate']*100:.1f}% | Fallback Probes: {s['fallback_probes']} | Invalidated: {s['invalidations']} | Cached: {s['cached']}")
@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+import mervis_state
+
+# [KIS API 호출 속도 제한기 (Token Bucket)]
+# 스레드마다 고정 sleep을 거는 대신, 프로세스 전체에서 초당 호출 수를 제한
+# 실전/모의 서버의 초당 허용 건수가 달라 모드별로 별도 버킷을 사용
+
+RATE_LIMITS = {
+    "REAL": float(os.getenv("KIS_RATE_REAL", "18")),  # 실전: 초당 20건 (여유분 확보)
+    "MOCK": float(os.getenv("KIS_RATE_MOCK", "4"))    # 모의: 초당 5건 미만 권장
+}
+
+# KIS 초당 거래건수 초과 응답 코드
+RATE_LIMIT_MSG_CODES = {"EGW00201"}
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity else max(rate, 1.0))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waited = 0.0
+        self.acquired = 0
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def reserve(self):
+        """
+        토큰 1개를 예약하고 대기해야 할 시간(초)을 반환
+        (토큰이 부족하면 음수 잔량으로 예약하여 호출 순서를 보장)
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1.0
+            self.acquired += 1
+            if self.tokens >= 0:
+                return 0.0
+            wait = -self.tokens / self.rate
+            self.waited += wait
+            return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, seconds):
+        # 서버가 제한 초과를 응답하면 버킷을 비워 다른 스레드도 함께 감속
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+_BUCKETS = {}
+_BUCKETS_LOCK = threading.Lock()
+
+def get_bucket(mode=None):
+    mode = mode or mervis_state.get_mode()
+    bucket = _BUCKETS.get(mode)
+    if bucket is None:
+        with _BUCKETS_LOCK:
+            bucket = _BUCKETS.get(mode)
+            if bucket is None:
+                bucket = TokenBucket(RATE_LIMITS.get(mode, RATE_LIMITS["MOCK"]))
+                _BUCKETS[mode] = bucket
+    return bucket
+
+def acquire(mode=None):
+    return get_bucket(mode).acquire()
+
+def penalize(seconds, mode=None):
+    get_bucket(mode).penalize(seconds)
+
+def is_rate_limited(payload):
+    # KIS는 HTTP 200/500과 함께 msg_cd로 초과 여부를 알려줌
+    if not isinstance(payload, dict): return False
+    return payload.get('rt_cd') != '0' and payload.get('msg_cd') in RATE_LIMIT_MSG_CODES
+
+def get_stats():
+    with _BUCKETS_LOCK:
+        return {
+            mode: {"rate": b.rate, "acquired": b.acquired, "waited_sec": round(b.waited, 2)}
+            for mode, b in _BUCKETS.items()
+        }
@@ -1,7 +1,6 @@
-import requests
-import json
 import os
 import kis_auth
+import kis_client
 import mervis_state
 
 def send_order(ticker, price, qty, is_buy=True):
@@ -12,9 +11,6 @@ def send_order(ticker, price, qty, is_buy=True):
     
     # 환경 변수 로드
     config = kis_auth.get_env_config(mode)
-    base_url = config['base_url']
-    app_key = config['app_key']
-    app_secret = config['app_secret']
 
     # 계좌 정보 로드 (환경 변수)
     if mode == "REAL":
@@ -29,15 +25,7 @@ def send_order(ticker, price, qty, is_buy=True):
         tr_id = "VTTT1002U" if is_buy else "VTTT1006U"
 
     path = "uapi/overseas-stock/v1/trading/order"
-    url = f"{base_url}/{path}"
-
-    headers = {
-        "content-type": "application/json",
-        "authorization": f"Bearer {token}",
-        "appKey": app_key,
-        "appSecret": app_secret,
-        "tr_id": tr_id
-    }
+    headers = kis_client.make_headers(tr_id, token=token, config=config)
     
     params = {
         "CANO": cano,
@@ -51,8 +39,7 @@ def send_order(ticker, price, qty, is_buy=True):
     }
 
     try:
-        res = requests.post(url, headers=headers, data=json.dumps(params), timeout=5)
-        data = res.json()
+        data = kis_client.post(path, body=params, headers=headers)
         if data['rt_cd'] == '0':
             print(f"[주문성공] {ticker} {'매수' if is_buy else '매도'} 접수")
             return True
@@ -1,7 +1,5 @@
-import requests
-import json
-import kis_auth
-import mervis_state
+import kis_client
+import kis_exchange
 
 # === [머비스 설정] ===
 # 기능: 미국 주식 현재 가격 조회
@@ -11,37 +9,21 @@ def get_current_price(ticker):
     """
     특정 종목의 현재가(USD)를 조회하여 반환
     """
-    access_token = kis_auth.get_access_token()
-    if not access_token:
-        return None
-
-    # 현재 모드에 맞는 설정 가져오기
-    mode = mervis_state.get_mode()
-    config = kis_auth.get_env_config(mode)
-    
-    # URL 설정 (해외주식 현재가)
+    # 해외주식 현재가 (공통 클라이언트가 토큰/앱키 헤더 생성)
     path = "uapi/overseas-price/v1/quotations/price"
-    url = f"{config['base_url']}/{path}"
-
-    headers = {
-        "content-type": "application/json",
-        "authorization": f"Bearer {access_token}",
-        "appKey": config['app_key'],
-        "appSecret": config['app_secret'],
-        "tr_id": "HHDFS76200200"
-    }
 
-    # 거래소 코드는 편의상 나스닥(NAS)으로 고정, 추후 확장 가능
+    # 거래소 코드는 차트 조회 시 학습된 캐시 사용 (없으면 나스닥)
     params = {
         "AUTH": "",
-        "EXCD": "NAS",
+        "EXCD": kis_exchange.get_exchange(ticker) or "NAS",
         "SYMB": ticker
     }
     
     # 조회 시도
     try:
-        res = requests.get(url, headers=headers, params=params)
-        data = res.json()
+        data = kis_client.get(path, tr_id="HHDFS76200200", params=params)
+        if not data:
+            return None
         
         if data['rt_cd'] == '0':
             output = data['output']
@@ -57,6 +39,32 @@ def get_current_price(ticker):
         print(f"머비스: 시스템 오류 ({e})")
         return None
 
+def get_price_detail(ticker):
+    """
+    [웹소켓 공백 보정용] 현재가/등락률/누적거래량 조회 (실시간 체결 HDFSCNT0의 LAST/RATE/TVOL에 대응)
+    - 반환: {"last": float, "rate": float, "tvol": float}, 실패 시 None (출력 없음)
+    """
+    path = "uapi/overseas-price/v1/quotations/price"
+    params = {
+        "AUTH": "",
+        "EXCD": kis_exchange.get_exchange(ticker) or "NAS",
+        "SYMB": ticker
+    }
+    try:
+        data = kis_client.get(path, tr_id="HHDFS76200200", params=params)
+        if not data or data.get('rt_cd') != '0':
+            return None
+        output = data['output']
+        last = float(output['last']) if output.get('last') else 0.0
+        if last <= 0: return None # 장 종료 후 빈 응답 등
+        return {
+            "last": last,
+            "rate": float(output.get('rate') or 0.0),
+            "tvol": float(output.get('tvol') or 0.0)
+        }
+    except Exception:
+        return None
+
 if __name__ == "__main__":
     # 테슬라(TSLA) 가격 확인 테스트
     price = get_current_price("TSLA")
\ No newline at end of file
@@ -1,11 +1,16 @@
 import websocket
 import json
+import os
+import random
 import time
 import threading
 import logging
 import kis_auth
 import mervis_state
+import mervis_candles # 틱 -> 1분/5분봉 집계 (import 시 mervis_state 갱신 구독)
 import notification
+import kis_ws_decoder # 실시간 체결 프레임 디코더 (다중 레코드)
+import kis_price
 
 # 미국 주식 실시간 체결가 TR ID
 TR_ID_REAL = "HDFSCNT0" 
@@ -14,12 +19,25 @@ WS_URL_REAL = "ws://ops.koreainvestment.com:21000"
 # 최대 동시 감시 종목 수
 MAX_WATCH_LIMIT = 40
 
+# 재접속 대기(초): 1, 2, 4 ... 최대 RECONNECT_MAX (지터 포함)
+RECONNECT_BASE = float(os.getenv("MERVIS_WS_RECONNECT_BASE", "1.0"))
+RECONNECT_MAX = float(os.getenv("MERVIS_WS_RECONNECT_MAX", "60.0"))
+
+# 이 시간(초) 이상 유지된 연결이 끊기면 대기 시간을 처음부터 다시 계산
+RECONNECT_STABLE = 60
+
+# 하트비트 타임아웃(초): 체결/PINGPONG 포함 어떤 메시지도 없으면 끊긴 연결로 보고 재접속
+HEARTBEAT_TIMEOUT = float(os.getenv("MERVIS_WS_HEARTBEAT_TIMEOUT", "90"))
+
 # 글로벌 감시자 인스턴스
 _active_watcher = None
 
 # 사용자가 직접 지정한 알림 타겟
 _user_watch_list = {}
 
+# 감시 조건 락 (웹소켓 수신 스레드 / REST 보정 스레드 / GUI·AI 스레드가 함께 수정)
+_WATCH_LOCK = threading.RLock()
+
 def add_watch_condition(ticker, target_price, condition="GE", tag="지정가"):
     """
     [외부 호출용] 감시 조건 추가
@@ -27,37 +45,44 @@ def add_watch_condition(ticker, target_price, condition="GE", tag="지정가"):
     global _user_watch_list, _active_watcher
     ticker = ticker.upper()
     
-    if ticker not in _user_watch_list:
-        _user_watch_list[ticker] = []
-        
-    # 중복 조건 방지
-    for item in _user_watch_list[ticker]:
-        if item['price'] == float(target_price) and item['cond'] == condition:
-            return False
-
-    # 조건 리스트에 추가
-    _user_watch_list[ticker].append({
-        "price": float(target_price),
-        "cond": condition,
-        "tag": tag
-    })
+    with _WATCH_LOCK:
+        if ticker not in _user_watch_list:
+            _user_watch_list[ticker] = []
+            
+        # 중복 조건 방지
+        for item in _user_watch_list[ticker]:
+            if item['price'] == float(target_price) and item['cond'] == condition:
+                return False
+
+        # 조건 리스트에 추가
+        _user_watch_list[ticker].append({
+            "price": float(target_price),
+            "cond": condition,
+            "tag": tag
+        })
     
     logging.info(f"[Watch List] Added {ticker} - {tag} ${target_price} ({condition})")
     
     # 실시간 감시자에 구독 추가 요청
-    if _active_watcher and _active_watcher.is_running:
+    if _active_watcher and _active_watcher.should_run:
         _active_watcher.add_new_target(ticker)
         
     return True
 
+def get_watch_prices(ticker):
+    # 종목에 걸린 사용자 감시 가격 목록 (스케줄러의 근접도 판정용)
+    with _WATCH_LOCK:
+        return [w['price'] for w in _user_watch_list.get(ticker, [])]
+
 def remove_watch_condition(ticker):
     global _user_watch_list
     ticker = ticker.upper()
-    if ticker in _user_watch_list:
+    with _WATCH_LOCK:
+        if ticker not in _user_watch_list:
+            return False
         del _user_watch_list[ticker]
-        logging.info(f"[Watch List] Removed User Target: {ticker}")
-        return True
-    return False
+    logging.info(f"[Watch List] Removed User Target: {ticker}")
+    return True
 
 class MervisWatcher:
     def __init__(self, target_list):
@@ -65,8 +90,16 @@ class MervisWatcher:
         self.subscribed_tickers = set() 
         self.ws = None
         self.ws_key = None
-        self.is_running = False
+        self.is_running = False     # 현재 연결(구독 가능) 상태
+        self.should_run = True      # 감시 유지 여부 (stop 전까지 끊겨도 재접속)
         self.base_url = WS_URL_REAL 
+        self._stop_event = threading.Event()
+        self.restore_tickers = set() # 끊기기 직전 구독 종목 (재접속 시 복원)
+        self.connected_at = 0.0
+        self.disconnected_at = None
+        self.last_message_at = 0.0
+        self.stats = {"connects": 0, "reconnects": 0, "disconnects": 0,
+                      "heartbeat_timeouts": 0, "backfilled": 0}
 
     def _subscribe_target(self, ticker):
         # KIS 서버에 구독 요청 전송
@@ -115,7 +148,8 @@ class MervisWatcher:
         if len(self.subscribed_tickers) < MAX_WATCH_LIMIT:
             return
 
-        candidates = [t for t in self.subscribed_tickers if t not in _user_watch_list]
+        with _WATCH_LOCK:
+            candidates = [t for t in self.subscribed_tickers if t not in _user_watch_list]
         
         if candidates:
             victim = candidates[0]
@@ -128,49 +162,55 @@ class MervisWatcher:
         if ticker in self.subscribed_tickers:
             return 
 
+        if not self.is_running:
+            # 재접속 대기 중: 다음 연결에서 구독하도록 복원 목록에 기록
+            self.restore_tickers.add(ticker)
+            return
+
         self.manage_subscription_limit()
         
         if len(self.subscribed_tickers) < MAX_WATCH_LIMIT:
             self._subscribe_target(ticker)
 
     def check_user_alert(self, ticker, current_price, change_rate):
-        # 체결 시 다중 조건 확인 및 달성된 조건 삭제
+        # 체결 시 다중 조건 확인 및 달성된 조건 삭제 (판정/삭제는 락 안에서, 알림 전송은 락 밖에서)
         global _user_watch_list
-        if ticker not in _user_watch_list: return
-
-        conditions = _user_watch_list[ticker]
-        triggered_indexes = [] 
-
-        for i, watch in enumerate(conditions):
-            target = watch['price']
-            cond = watch['cond']
-            tag = watch['tag']
-            is_triggered = False
-            msg = ""
-
-            if cond == "GE" and current_price >= target: 
-                is_triggered = True
-                msg = f"[{tag} 달성] {ticker} ${target} 돌파 (현재 ${current_price})"
-            elif cond == "LE" and current_price <= target: 
-                is_triggered = True
-                msg = f"[{tag} 도달] {ticker} ${target} 이하 (현재 ${current_price})"
-
-            if is_triggered:
-                logging.info(f"[ALERT] {msg}")
-                # 손절은 빨간색, 익절/목표는 파란색
-                noti_color = "red" if "손절" in tag else "blue"
-                notification.send_alert("매매 신호 감지", msg, color=noti_color)
-                triggered_indexes.append(i)
-
-        # 달성된 조건만 역순으로 삭제
-        for i in sorted(triggered_indexes, reverse=True):
-            del _user_watch_list[ticker][i]
-
-        # 남은 조건이 없으면 종목 키 삭제
-        if not _user_watch_list[ticker]:
-            del _user_watch_list[ticker]
+        alerts = []
+        with _WATCH_LOCK:
+            conditions = _user_watch_list.get(ticker)
+            if not conditions: return
+
+            remaining = []
+            for watch in conditions:
+                target = watch['price']
+                cond = watch['cond']
+                tag = watch['tag']
+                msg = ""
+
+                if cond == "GE" and current_price >= target: 
+                    msg = f"[{tag} 달성] {ticker} ${target} 돌파 (현재 ${current_price})"
+                elif cond == "LE" and current_price <= target: 
+                    msg = f"[{tag} 도달] {ticker} ${target} 이하 (현재 ${current_price})"
+
+                if msg:
+                    alerts.append((tag, msg))
+                else:
+                    remaining.append(watch)
+
+            # 달성된 조건은 제거, 남은 조건이 없으면 종목 키 삭제
+            if remaining:
+                _user_watch_list[ticker] = remaining
+            else:
+                del _user_watch_list[ticker]
+
+        for tag, msg in alerts:
+            logging.info(f"[ALERT] {msg}")
+            # 손절은 빨간색, 익절/목표는 파란색
+            noti_color = "red" if "손절" in tag else "blue"
+            notification.send_alert("매매 신호 감지", msg, color=noti_color)
 
     def on_message(self, ws, message):
+        self.last_message_at = time.time()
         try:
             if message[0] == '{':
                 data = json.loads(message)
@@ -178,26 +218,15 @@ class MervisWatcher:
                     ws.send(message)
                     return
 
-            parts = message.split('|')
-            if len(parts) > 3:
-                tr_id = parts[1]
-                if tr_id == TR_ID_REAL:
-                    raw_data = parts[3].split('^')
-                    if len(raw_data) > 15:
-                        raw_ticker = raw_data[0]
-                        ticker = raw_ticker[4:] if len(raw_ticker) > 4 else raw_ticker
-                        price = float(raw_data[11]) 
-                        change_rate = float(raw_data[14])
-                        # 거래량 파싱 (미국주식 체결통보 기준 인덱스 확인 필요, 통상 13~15 인근)
-                        # KIS 해외주식 체결가 TR: 11=현재가, 14=등락률, 13=체결량(틱), 12=누적거래량
-                        volume = float(raw_data[12]) 
-
-                        # 1. State 모듈에 실시간 가격 전송 (동적 캔들용)
-                        mervis_state.update_realtime_price(ticker, price, change_rate, volume)
-                        
-                        # 2. 알림 조건 확인
-                        self.check_user_alert(ticker, price, change_rate)
-                    
+            # 한 프레임에 여러 체결이 묶여 올 수 있으므로 레코드별로 처리
+            # (KIS 해외주식 실시간체결가 HDFSCNT0: 11=LAST, 14=RATE, 20=TVOL 누적거래량)
+            for ticker, price, change_rate, volume in kis_ws_decoder.decode_frame(message, TR_ID_REAL):
+                # 1. State 모듈에 실시간 가격 전송 (동적 캔들용)
+                mervis_state.update_realtime_price(ticker, price, change_rate, volume)
+
+                # 2. 알림 조건 확인
+                self.check_user_alert(ticker, price, change_rate)
+
         except Exception as e:
             logging.debug(f"Parsing Error: {e}")
 
@@ -205,40 +234,133 @@ class MervisWatcher:
         logging.error(f"[Watcher Error] {error}")
 
     def on_close(self, ws, close_status_code, close_msg):
-        logging.info("[Watcher] Disconnected.")
+        logging.info(f"[Watcher] Disconnected. (code={close_status_code})")
+        if self.is_running and self.should_run:
+            self.stats["disconnects"] += 1
+            self.disconnected_at = time.time()
         self.is_running = False
+        if self.subscribed_tickers:
+            self.restore_tickers = set(self.subscribed_tickers)
         self.subscribed_tickers.clear()
 
+    def _subscription_targets(self):
+        # 복원 우선순위: 사용자 지정 종목 -> 끊기기 전 구독 종목 -> 최초 감시 대상
+        targets = []
+        with _WATCH_LOCK:
+            user_tickers = list(_user_watch_list)
+        for ticker in user_tickers + sorted(self.restore_tickers) + self.initial_targets:
+            if ticker not in targets:
+                targets.append(ticker)
+        return targets[:MAX_WATCH_LIMIT]
+
     def on_open(self, ws):
-        logging.info("[Watcher] Connected.")
+        reconnected = self.disconnected_at is not None
+        logging.info(f"[Watcher] {'Reconnected' if reconnected else 'Connected'}.")
         self.is_running = True
-        
-        count = 0
-        for ticker in self.initial_targets:
-            if count >= MAX_WATCH_LIMIT: break
+        self.connected_at = self.last_message_at = time.time()
+        self.stats["connects"] += 1
+        if reconnected:
+            self.stats["reconnects"] += 1
+
+        targets = self._subscription_targets()
+        for ticker in targets:
             self._subscribe_target(ticker)
+
+        if reconnected:
+            # 끊긴 동안 놓친 체결은 REST 현재가로 보정 (수신 스레드를 막지 않도록 별도 스레드)
+            t = threading.Thread(target=self._backfill, args=(targets, self.connected_at), daemon=True)
+            t.start()
+
+    def _backfill(self, tickers, since):
+        """
+        재접속 후 종목별 현재가/누적거래량을 REST로 조회해 상태 갱신
+        - 분봉: 누적거래량(TVOL) 차이로 공백 구간 거래량이 현재 봉에 반영됨
+        - 알림: 끊긴 동안 감시가를 지나쳤으면 현재가 기준으로 발동
+        - 재접속 후 이미 웹소켓 체결이 들어온 종목은 건너뜀 (더 최신 데이터)
+        """
+        count = 0
+        for ticker in tickers:
+            if not self.should_run: break
+            if self._has_tick_since(ticker, since):
+                continue
+            detail = kis_price.get_price_detail(ticker)
+            # REST 조회(최대 수 초) 중에 웹소켓 체결이 들어왔으면 더 최신이므로 버림
+            if not detail or self._has_tick_since(ticker, since):
+                continue
+            mervis_state.update_realtime_price(ticker, detail["last"], detail["rate"], detail["tvol"])
+            self.check_user_alert(ticker, detail["last"], detail["rate"])
             count += 1
-            
-    def start_loop(self):
-        self.ws_key = kis_auth.get_websocket_key()
-        if not self.ws_key: return
+        self.stats["backfilled"] += count
+        if count:
+            logging.info(f"[Watcher] Backfilled {count}/{len(tickers)} tickers via REST.")
+
+    def _has_tick_since(self, ticker, since):
+        latest = mervis_state.get_realtime_data(ticker)
+        return bool(latest and latest["updated_at"].timestamp() >= since)
+
+    def _heartbeat_loop(self):
+        # 메시지가 HEARTBEAT_TIMEOUT 동안 없으면 연결을 닫아 재접속 유도
+        while not self._stop_event.wait(5):
+            if self.is_running and time.time() - self.last_message_at > HEARTBEAT_TIMEOUT:
+                logging.warning(f"[Watcher] Heartbeat timeout ({HEARTBEAT_TIMEOUT:.0f}s). Reconnecting...")
+                self.stats["heartbeat_timeouts"] += 1
+                try: self.ws.close()
+                except Exception: pass
+
+    def _backoff_delay(self, attempt):
+        delay = min(RECONNECT_BASE * (2 ** attempt), RECONNECT_MAX)
+        return delay * random.uniform(0.5, 1.0)
 
-        ws_url = f"{self.base_url}"
-        self.ws = websocket.WebSocketApp(
-            ws_url,
-            on_open=self.on_open, on_message=self.on_message,
-            on_error=self.on_error, on_close=self.on_close
-        )
-        self.ws.run_forever()
+    def start_loop(self):
+        """
+        연결 감독 루프: stop() 전까지 끊기면 지수 백오프 후 재접속 (구독 복원 + REST 공백 보정)
+        """
+        threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+        attempt = 0
+        while self.should_run:
+            self.ws_key = kis_auth.get_websocket_key()
+            if self.ws_key:
+                self.ws = websocket.WebSocketApp(
+                    self.base_url,
+                    on_open=self.on_open, on_message=self.on_message,
+                    on_error=self.on_error, on_close=self.on_close
+                )
+                try:
+                    self.ws.run_forever()
+                except Exception as e:
+                    logging.error(f"[Watcher] Connection Error: {e}")
+                self.is_running = False
+            else:
+                logging.error("[Watcher] Websocket key unavailable.")
+
+            if not self.should_run: break
+            # 방금 끊긴 연결이 충분히 유지되었을 때만 대기 시간 초기화 (사용한 연결 시각은 비워서 재시도 실패가 누적되도록)
+            if self.connected_at and time.time() - self.connected_at >= RECONNECT_STABLE:
+                attempt = 0
+            self.connected_at = 0.0
+            delay = self._backoff_delay(attempt)
+            attempt += 1
+            logging.info(f"[Watcher] Reconnecting in {delay:.1f}s (attempt {attempt})")
+            if self._stop_event.wait(delay): break
+        self._stop_event.set()
 
     def stop(self):
+        self.should_run = False
+        self._stop_event.set()
         if self.ws:
             self.ws.close()
         self.is_running = False
 
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["connected"] = self.is_running
+        stats["subscribed"] = len(self.subscribed_tickers)
+        stats["last_message_age"] = round(time.time() - self.last_message_at, 1) if self.last_message_at else None
+        return stats
+
 def start_background_monitoring(target_list):
     global _active_watcher
-    if _active_watcher and _active_watcher.is_running:
+    if is_active():
         stop_monitoring()
         time.sleep(1)
 
@@ -257,5 +379,11 @@ def stop_monitoring():
         logging.info("[Watcher] Monitoring Stopped.")
 
 def is_active():
+    # 재접속 대기 중에도 감시는 유지 중으로 간주
     global _active_watcher
-    return _active_watcher is not None and _active_watcher.is_running
\ No newline at end of file
+    return _active_watcher is not None and _active_watcher.should_run
+
+def get_connection_stats():
+    # 연결/재접속/하트비트 타임아웃/보정 카운터 (감시 중이 아니면 None)
+    if _active_watcher is None: return None
+    return _active_watcher.get_stats()
@@ -0,0 +1,126 @@
+import time
+
+# [KIS 웹소켓 실시간 프레임 디코더]
+# 실시간 프레임 형식: "암호화여부|TR_ID|레코드수|필드^필드^...^필드" (레코드 여러 개가 '^'로 이어서 전송됨)
+# 헤더 3개만 잘라 읽고, 본문은 한 번만 split 한 뒤 레코드 간격(26) 슬라이스로 필요한 4개 필드 열만 꺼냄
+# 단일 레코드 프레임("001")은 maxsplit으로 TVOL(20)까지만 나눔
+# (CPython에서는 필드마다 find를 반복하는 파이썬 루프가 C 레벨 split 1회보다 훨씬 느림)
+# 레코드 수(parts[2])만큼 모두 반환하므로 한 프레임에 묶여 온 틱도 빠짐없이 처리
+
+# 해외주식 실시간체결가(HDFSCNT0) 레코드당 필드 수 및 사용 필드 위치
+HDFSCNT0_FIELDS = 26
+F_RSYM = 0    # 실시간종목코드 (예: DNASAAPL)
+F_LAST = 11   # 현재가
+F_RATE = 14   # 등락율
+F_TVOL = 20   # 누적거래량
+
+# 예외 상황만 집계 (정상 경로에서 카운터를 올리면 단일 레코드 처리량이 ~10% 떨어짐)
+_STATS = {"errors": 0, "skipped": 0}
+
+def decode_frame(message, tr_id="HDFSCNT0"):
+    """
+    실시간 체결 프레임 -> [(ticker, price, change_rate, volume), ...]
+    - JSON 제어 메시지 / 다른 TR / 암호화 프레임은 빈 리스트 (skipped)
+    - 레코드 수와 필드 수가 맞지 않으면 온전한 레코드까지만 반환 (errors)
+    """
+    # 헤더 3개만 분리 (본문은 그대로 문자열 유지)
+    parts = message.split('|', 3)
+    if len(parts) < 4 or parts[1] != tr_id or parts[0] != '0':
+        _STATS["skipped"] += 1
+        return []
+    body = parts[3]
+    try:
+        if parts[2] == "001":
+            # 가장 흔한 단일 레코드: 정수 변환 없이 판정, TVOL(20) 이후 필드는 나누지 않음
+            f = body.split('^', F_TVOL + 1)
+            sym = f[F_RSYM]
+            return [(sym[4:] if len(sym) > 4 else sym, float(f[F_LAST]), float(f[F_RATE]), float(f[F_TVOL]))]
+        count = int(parts[2])
+    except (ValueError, IndexError):
+        _STATS["errors"] += 1
+        return []
+
+    fields = body.split('^')
+    complete = len(fields) // HDFSCNT0_FIELDS
+    if complete < count:
+        _STATS["errors"] += 1 # 잘린 프레임
+        count = complete
+
+    step = HDFSCNT0_FIELDS
+    stop = count * step
+    records = []
+    for sym, last, rate, tvol in zip(fields[F_RSYM:stop:step], fields[F_LAST:stop:step],
+                                     fields[F_RATE:stop:step], fields[F_TVOL:stop:step]):
+        try:
+            records.append((sym[4:] if len(sym) > 4 else sym, float(last), float(rate), float(tvol)))
+        except ValueError:
+            _STATS["errors"] += 1
+    return records
+
+def get_stats():
+    return dict(_STATS)
+
+# --- 벤치마크 ---
+
+def _legacy_decode(message):
+    # 기존 on_message 방식 (split 후 첫 레코드만 사용)
+    parts = message.split('|')
+    if len(parts) > 3 and parts[1] == "HDFSCNT0":
+        raw_data = parts[3].split('^')
+        if len(raw_data) > 20:
+            raw_ticker = raw_data[0]
+            ticker = raw_ticker[4:] if len(raw_ticker) > 4 else raw_ticker
+            return [(ticker, float(raw_data[11]), float(raw_data[14]), float(raw_data[20]))]
+    return []
+
+def _synthetic_frames(n_frames=50000, max_records=4, seed=7):
+    # 실제 HDFSCNT0 프레임과 같은 구조의 합성 프레임 (레코드 1~max_records개)
+    import random
+    rng = random.Random(seed)
+    symbols = ["AAPL", "TSLA", "NVDA", "MSFT", "AMZN", "META", "GOOGL", "AMD"]
+    frames = []
+    for i in range(n_frames):
+        count = rng.randint(1, max_records)
+        recs = []
+        for _ in range(count):
+            sym = rng.choice(symbols)
+            last = round(rng.uniform(50, 500), 4)
+            fields = [
+                f"DNAS{sym}", sym, "4", "20260105", "20260105", "093015", "20260105", "233015",
+                f"{last - 1:.4f}", f"{last + 1:.4f}", f"{last - 2:.4f}", f"{last:.4f}", "2",
+                "1.2300", f"{rng.uniform(-5, 5):.2f}", f"{last - 0.01:.4f}", f"{last + 0.01:.4f}",
+                "100", "200", str(rng.randint(1, 500)), str(1000000 + i), str(250000000 + i), "10", "20", "95.12", "1"
+            ]
+            recs.append("^".join(fields))
+        frames.append(f"0|HDFSCNT0|{count:03d}|" + "^".join(recs))
+    return frames
+
+def _measure(func, frames, repeat=5):
+    # 반복 측정 중 최고 처리량 (스케줄링 잡음 제거)
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = sum(len(func(f)) for f in frames)
+        best = max(best, len(frames) / (time.perf_counter() - start))
+    return best, best * records / len(frames), records
+
+def run_benchmark(n_frames=50000):
+    frames = _synthetic_frames(n_frames)
+    single = _synthetic_frames(n_frames, max_records=1)
+    total_records = sum(int(f.split('|')[2]) for f in frames)
+    print(f" [Benchmark] 합성 프레임 {n_frames:,}개 (레코드 {total_records:,}건, 프레임당 1~4건)")
+
+    for label, data in (("단일 레코드", single), ("다중 레코드", frames)):
+        l_msg, l_tick, l_rec = _measure(_legacy_decode, data)
+        f_msg, f_tick, f_rec = _measure(decode_frame, data)
+        print(f"   - [{label}] 기존 split 파서: {l_msg:,.0f} msg/s, {l_tick:,.0f} ticks/s (처리 {l_rec:,}건)")
+        print(f"   - [{label}] 디코더:          {f_msg:,.0f} msg/s, {f_tick:,.0f} ticks/s (처리 {f_rec:,}건)")
+
+    # 정합성: 레코드 누락 없음 + 첫 레코드는 기존 파서와 동일
+    decoded = [decode_frame(f) for f in frames]
+    missing = total_records - sum(len(r) for r in decoded)
+    mismatches = sum(1 for f, r in zip(frames, decoded) if _legacy_decode(f) != r[:1])
+    print(f"   - 정합성 검사: 누락 레코드 {missing}건, 첫 레코드 불일치 {mismatches}건")
+
+if __name__ == "__main__":
+    run_benchmark()
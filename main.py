@@ -18,6 +18,7 @@ import kis_websocket
 import kis_account
 import notification
 import mervis_examiner 
+import mervis_scheduler
 
 # 전역 변수 및 스레드 상태 관리
 is_scheduled = False
@@ -66,47 +67,59 @@ def check_market_open_time():
     return 2, "장 마감", 0
 
 def job_realtime_analysis():
-    # 백그라운드 실시간 전략 분석 루프
+    # 백그라운드 실시간 전략 분석 루프 (가격/거래량 이벤트 기반, 신호 강도 순)
     global is_analyzing
     logging.info("[Analysis Thread] 실시간 전략 분석 스레드 시작")
+
+    scheduler = mervis_scheduler.AnalysisScheduler(watch_provider=kis_websocket.get_watch_prices)
+    scheduler.attach()
     
     while is_analyzing:
         try:
-            # 현재 감시 중인 종목 리스트 조회
-            active_tickers = mervis_state.get_all_realtime_tickers()
-            
-            if active_tickers:
-                for ticker in active_tickers:
-                    if not is_analyzing: break
+            picked = scheduler.next_ticker(timeout=1.0)
+            if not picked: continue
+            ticker, score, reasons = picked
 
-                    # 실시간 데이터 스냅샷 조회
-                    rt_data = mervis_state.get_realtime_data(ticker)
-                    if not rt_data: continue
+            # 실시간 데이터 스냅샷 조회
+            rt_data = mervis_state.get_realtime_data(ticker)
+            if not rt_data:
+                scheduler.done(ticker, None)
+                continue
 
-                    item = {"code": ticker, "price": rt_data['price']}
-                    
-                    # Brain 분석 실행
-                    result = mervis_brain.analyze_stock(item)
-                    
-                    report = result.get('report', '')
-                    current_p = rt_data['price']
-                    
-                    if "매수추천" in report or "매수 권고" in report:
-                        title = f"[매수 신호] {ticker}"
-                        msg = f"현재가: ${current_p}\n{report[:200]}..."
-                        notification.send_alert(title, msg, color='blue')
-                        logging.info(f"[SIGNAL] {ticker} 매수 신호 발생 (${current_p})")
+            # ML 예측은 감시 종목 전체를 쿼리 1회로 선조회 (거래일 캐시, analyze_stock은 캐시에서 읽음)
+            mervis_bigquery.get_predictions(mervis_state.get_all_realtime_tickers())
+
+            logging.info(f"[Scheduler] {ticker} 분석 (score {score:.2f}: {', '.join(reasons)})")
+            item = {"code": ticker, "price": rt_data['price']}
+            
+            # Brain 분석 실행
+            try:
+                result = mervis_brain.analyze_stock(item)
+            except Exception:
+                scheduler.done(ticker, None)
+                raise
             
-            # 분석 주기 1분
-            for _ in range(60): 
-                if not is_analyzing: break
-                time.sleep(1)
+            report = result.get('report', '') if result else ''
+            current_p = rt_data['price']
+            strategy = mervis_brain.extract_strategy_values(report)
+            scheduler.done(ticker, current_p, [strategy['target_price'], strategy['cut_price']])
+            
+            # 캐시 재사용 리포트는 이미 알림이 나간 내용이므로 생략
+            if result and result.get('cached'):
+                continue
+
+            if "매수추천" in report or "매수 권고" in report:
+                title = f"[매수 신호] {ticker}"
+                msg = f"현재가: ${current_p}\n{report[:200]}..."
+                notification.send_alert(title, msg, color='blue')
+                logging.info(f"[SIGNAL] {ticker} 매수 신호 발생 (${current_p})")
                 
         except Exception as e:
             logging.error(f"[Analysis Thread Error] {e}")
             time.sleep(5)
 
-    logging.info("[Analysis Thread] 실시간 전략 분석 스레드 종료")
+    scheduler.detach()
+    logging.info(f"[Analysis Thread] 실시간 전략 분석 스레드 종료 ({scheduler.get_stats()})")
 
 def start_analysis_thread():
     global analysis_thread, is_analyzing
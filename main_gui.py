@@ -7,12 +7,12 @@ from PyQt6.QtWidgets import (
     QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView,
     QGroupBox, QFormLayout, QLineEdit, QComboBox
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyQt6.QtGui import QFont, QColor
 
 import mervis_state
 import mervis_bigquery
-import kis_chart
+import mervis_chart_store
 import kis_websocket 
 import kis_account
 import notification
@@ -103,7 +103,7 @@ class ChartLoader(QThread):
 
     def run(self):
         try:
-            raw_data = kis_chart.get_daily_chart(self.ticker)
+            raw_data = mervis_chart_store.get_daily_chart(self.ticker)
             if not raw_data:
                 self.error_occurred.emit(f"{self.ticker} 데이터 없음")
                 return
@@ -153,21 +153,28 @@ class ChartLoader(QThread):
             self.error_occurred.emit(f"차트 오류: {str(e)}")
 
 class WebSocketWorker(QThread):
-    price_updated = pyqtSignal(str, float, float, float)
+    # 프레임당 1회, 바뀐 종목만 묶어서 전달: { ticker: (price, change, volume) }
+    prices_updated = pyqtSignal(dict)
+    FRAME_INTERVAL = 0.1  # 초 (최대 10회/초 화면 갱신)
+
     def __init__(self):
         super().__init__()
         self.is_running = True
+        self.feed = mervis_state.subscribe_changes()
     def run(self):
         while self.is_running:
             try:
-                active = mervis_state.get_all_realtime_tickers()
-                for ticker in active:
-                    data = mervis_state.get_realtime_data(ticker)
-                    if data:
-                        self.price_updated.emit(ticker, data.get('price', 0.0), data.get('change', 0.0), data.get('volume', 0.0))
-                time.sleep(0.5)
+                # 시세 변경이 없으면 여기서 대기 (폴링 없음)
+                if not self.feed.wait(timeout=1.0): continue
+                batch = self.feed.drain()
+                if batch:
+                    self.prices_updated.emit(batch)
+                # 다음 프레임까지 들어온 틱은 종목당 최신값으로 합쳐짐
+                time.sleep(self.FRAME_INTERVAL)
             except: time.sleep(1)
-    def stop(self): self.is_running = False
+    def stop(self):
+        self.is_running = False
+        self.feed.close()
 
 class ChatWorker(QThread):
     response_received = pyqtSignal(str)
@@ -317,9 +324,15 @@ class MervisMainWindow(QMainWindow):
         self.stock_view.request_unsubscribe.connect(self.unsubscribe_ticker)
 
         self.ws_worker = WebSocketWorker()
-        self.ws_worker.price_updated.connect(self.on_realtime_data_received)
+        self.ws_worker.prices_updated.connect(self.on_realtime_batch_received)
         self.ws_worker.start()
 
+        # 차트 다시 그리기는 비용이 커서 0.5초 간격으로 최신값만 반영
+        self.chart_pending = None
+        self.chart_timer = QTimer(self)
+        self.chart_timer.timeout.connect(self.flush_chart_update)
+        self.chart_timer.start(500)
+
         self.start_system_initialization()
 
     def create_top_menu(self, layout):
@@ -474,8 +487,23 @@ class MervisMainWindow(QMainWindow):
         QMessageBox.warning(self, "데이터 로드 실패", f"차트 데이터를 불러오지 못했습니다.\n{msg}")
         self.content_stack.setCurrentIndex(0)
 
-    def on_realtime_data_received(self, ticker, price, change, volume):
-        self.stock_view.update_prices(ticker, price, change)
+    def on_realtime_batch_received(self, batch):
+        self.stock_view.update_prices_batch(batch)
+        
+        # 차트는 보고 있는 종목이 바뀐 경우에만 (다음 타이머 주기에 반영)
+        ticker = self.chart_view.current_ticker
+        if ticker in batch:
+            self.chart_pending = (ticker,) + tuple(batch[ticker])
+
+    def flush_chart_update(self):
+        if self.chart_pending is None: return
+        ticker, price, change, volume = self.chart_pending
+        self.chart_pending = None
+        self.on_realtime_data_received(ticker, price, change, volume, update_list=False)
+
+    def on_realtime_data_received(self, ticker, price, change, volume, update_list=True):
+        if update_list:
+            self.stock_view.update_prices(ticker, price, change)
         
         if self.content_stack.currentIndex() == 1:
             if self.chart_view.current_ticker == ticker:
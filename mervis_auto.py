@@ -8,6 +8,7 @@ from logging.handlers import RotatingFileHandler
 import mervis_bigquery
 import mervis_brain
 import mervis_state
+import mervis_scheduler
 import kis_websocket
 import notification
 
@@ -27,56 +28,70 @@ is_running = True
 def job_realtime_learning():
     """
     [실시간 학습 루프]
-    지속적으로 종목 상태를 체크하고, 분석 결과를 DB에 적재.
+    가격/거래량 이벤트로 트리거된 종목만 신호 강도 순으로 분석하고, 분석 결과를 DB에 적재.
     """
     logging.info("실시간 분석 및 학습 프로세스 가동 시작.")
+
+    scheduler = mervis_scheduler.AnalysisScheduler(watch_provider=kis_websocket.get_watch_prices)
+    scheduler.attach()
     
     while is_running:
         try:
-            # 1. 감시 중인 핵심 40개 종목 리스트 가져오기
-            active_tickers = mervis_state.get_all_realtime_tickers()
+            # 1. 우선순위 큐에서 가장 크게 움직인 종목 선택 (없으면 1초 대기)
+            picked = scheduler.next_ticker(timeout=1.0)
+            if not picked: continue
+            ticker, score, reasons = picked
+
+            # 2. 실시간 데이터 스냅샷 (가격, 거래량 등)
+            rt_data = mervis_state.get_realtime_data(ticker)
+            if not rt_data:
+                scheduler.done(ticker, None)
+                continue
+
+            # ML 예측은 감시 종목 전체를 쿼리 1회로 선조회 (거래일 캐시, analyze_stock은 캐시에서 읽음)
+            mervis_bigquery.get_predictions(mervis_state.get_all_realtime_tickers())
+
+            # 3. Brain 분석 실행 (학습)
+            # analyze_stock 함수 내부에서 '전략'이 도출되면 자동으로 BigQuery(trade_history)에 저장
+            logging.info(f"[트리거] {ticker} score {score:.2f} ({', '.join(reasons)})")
+            item = {"code": ticker, "price": rt_data['price']}
+            try:
+                result = mervis_brain.analyze_stock(item)
+            except Exception:
+                scheduler.done(ticker, None)
+                raise
+
+            report = result.get('report', '') if result else ''
+            current_p = rt_data['price']
+            strategy = mervis_brain.extract_strategy_values(report)
+            scheduler.done(ticker, current_p, [strategy['target_price'], strategy['cut_price']])
             
-            if active_tickers:
-                for ticker in active_tickers:
-                    if not is_running: break
-
-                    # 2. 실시간 데이터 스냅샷 (가격, 거래량 등)
-                    rt_data = mervis_state.get_realtime_data(ticker)
-                    if not rt_data: continue
-
-                    # 3. Brain 분석 실행 (학습)
-                    # analyze_stock 함수 내부에서 '전략'이 도출되면 자동으로 BigQuery(trade_history)에 저장
-                    item = {"code": ticker, "price": rt_data['price']}
-                    result = mervis_brain.analyze_stock(item)
-                    
-                    if result:
-                        report = result.get('report', '')
-                        current_p = rt_data['price']
-                        
-                        # [단타 신호 알림]
-                        # 사용자가 직접 매매할 수 있도록 중요 신호(매수/매도 권고)만 선별하여 알림 발송
-                        if "매수추천" in report or "매수 권고" in report:
-                            logging.info(f"[신호 포착] {ticker} 매수 시그널 발생 (${current_p}) - DB 저장 완료")
-                            notification.send_alert(
-                                f"[매수 권고] {ticker}", 
-                                f"현재가: ${current_p}\n분석 결과가 학습되었습니다.\n\n{report[:200]}...",
-                                color='blue'
-                            )
-                        elif "매도권고" in report:
-                            logging.info(f"[신호 포착] {ticker} 매도 시그널 발생 (${current_p}) - DB 저장 완료")
-                            notification.send_alert(
-                                f"[매도 권고] {ticker}", 
-                                f"현재가: ${current_p}\n이익 실현 또는 손절이 필요할 수 있습니다.",
-                                color='red'
-                            )
-
-            # 사이클 간 대기 (API 호출 제한 및 과부하 방지, 1분 주기)
-            time.sleep(60) 
+            # 캐시 재사용 리포트는 이미 알림이 나간 내용이므로 생략
+            if result and not result.get('cached'):
+                # [단타 신호 알림]
+                # 사용자가 직접 매매할 수 있도록 중요 신호(매수/매도 권고)만 선별하여 알림 발송
+                if "매수추천" in report or "매수 권고" in report:
+                    logging.info(f"[신호 포착] {ticker} 매수 시그널 발생 (${current_p}) - DB 저장 완료")
+                    notification.send_alert(
+                        f"[매수 권고] {ticker}", 
+                        f"현재가: ${current_p}\n분석 결과가 학습되었습니다.\n\n{report[:200]}...",
+                        color='blue'
+                    )
+                elif "매도권고" in report:
+                    logging.info(f"[신호 포착] {ticker} 매도 시그널 발생 (${current_p}) - DB 저장 완료")
+                    notification.send_alert(
+                        f"[매도 권고] {ticker}", 
+                        f"현재가: ${current_p}\n이익 실현 또는 손절이 필요할 수 있습니다.",
+                        color='red'
+                    )
 
         except Exception as e:
             logging.error(f"학습 루프 중 오류 발생: {e}")
             time.sleep(10)
 
+    scheduler.detach()
+    logging.info(f"스케줄러 통계: {scheduler.get_stats()}")
+
 def main():
     global is_running
     
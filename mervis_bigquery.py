@@ -1,11 +1,17 @@
 from google.cloud import bigquery
+from google.api_core.exceptions import NotFound
 from google.oauth2 import service_account
 import os
 import json
 import math
-from datetime import datetime
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+import pytz
 from deep_translator import GoogleTranslator
 import mervis_state
+import mervis_local_model
 
 # BigQuery 상수
 DATASET_ID = "mervis_db"
@@ -16,21 +22,106 @@ TABLE_BALANCE = "daily_balance"
 TABLE_ANALYSIS = "stock_analysis"
 TABLE_FEATURES = "daily_features"
 
-def get_client():
+# 프로세스 전역 클라이언트 (인증/커넥션 재사용, 지연 생성)
+_client = None
+_client_lock = threading.Lock()
+
+# 이번 프로세스에서 이미 확인한 테이블 생성/스키마 보정 작업
+_ENSURED = set()
+_ENSURED_LOCK = threading.Lock()
+
+# trade_history 조회 결과 로컬 캐시 (기억/교훈 조회는 분석마다 반복되므로)
+# 구조: { ("memories", "TSLA", "REAL", 3): (1767225600.0, [...]) }
+# save_log / 결과·피드백 업데이트 시 해당 종목 항목 무효화
+HISTORY_CACHE_TTL = int(os.getenv("MERVIS_HISTORY_CACHE_TTL", "600"))
+_HISTORY_CACHE = {}
+_HISTORY_CACHE_LOCK = threading.Lock()
+
+# 기억/교훈 조회 범위 (일). 날짜 조건을 걸어야 파티션 프루닝이 적용됨
+HISTORY_LOOKBACK_DAYS = int(os.getenv("MERVIS_HISTORY_LOOKBACK_DAYS", "365"))
+
+# trade_history 클러스터링 컬럼 (파티션: DATE(log_date))
+HISTORY_CLUSTERING = ["ticker", "mode"]
+
+def _create_client():
     # 1. 로컬 개발 환경용: 파일이 존재하면 사용 (선택 사항)
     # 2. 클라우드 환경용: 파일이 없으면 ADC(Application Default Credentials) 사용
-    try:
-        if os.path.exists("service_account.json"):
-            credentials = service_account.Credentials.from_service_account_file("service_account.json")
-            return bigquery.Client(credentials=credentials, project=credentials.project_id)
-        else:
-            # GCP Secret Manager나 환경 변수에 의해 인증됨
-            # 프로젝트 ID는 환경 변수 'GOOGLE_CLOUD_PROJECT'에서 자동으로 가져옴
-            project_id = os.getenv("GCP_PROJECT_ID")
-            return bigquery.Client(project=project_id)
-    except Exception as e:
-        print(f" [BQ Error] Failed to initialize BigQuery Client: {e}")
-        return None
+    if os.path.exists("service_account.json"):
+        credentials = service_account.Credentials.from_service_account_file("service_account.json")
+        return bigquery.Client(credentials=credentials, project=credentials.project_id)
+    else:
+        # GCP Secret Manager나 환경 변수에 의해 인증됨
+        # 프로젝트 ID는 환경 변수 'GOOGLE_CLOUD_PROJECT'에서 자동으로 가져옴
+        project_id = os.getenv("GCP_PROJECT_ID")
+        return bigquery.Client(project=project_id)
+
+def get_client():
+    """
+    공용 BigQuery 클라이언트 반환 (최초 호출 시 1회 생성, 실패 시 None 후 다음 호출에서 재시도)
+    google-cloud-bigquery Client는 스레드 간 공유 가능
+    """
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            try:
+                _client = _create_client()
+            except Exception as e:
+                print(f" [BQ Error] Failed to initialize BigQuery Client: {e}")
+                return None
+        return _client
+
+def _ensure_once(key, func, *args):
+    """
+    테이블 생성/스키마 보정처럼 프로세스당 한 번이면 충분한 메타데이터 작업 실행
+    (성공 여부와 관계없이 같은 key는 다시 실행하지 않음)
+    """
+    if key in _ENSURED: return
+    with _ENSURED_LOCK:
+        if key in _ENSURED: return
+        try:
+            func(*args)
+        finally:
+            _ENSURED.add(key)
+
+def ensure_table(client, table_ref, schema, partition_field=None, clustering_fields=None):
+    # 테이블이 없으면 생성 (프로세스당 1회)
+    def create():
+        table = bigquery.Table(table_ref, schema=schema)
+        if partition_field:
+            table.time_partitioning = bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY, field=partition_field)
+        if clustering_fields:
+            table.clustering_fields = clustering_fields
+        try: client.create_table(table, exists_ok=True)
+        except: pass
+    _ensure_once(("table", table_ref), create)
+
+# --- trade_history 조회 캐시 ---
+
+def _history_cache_get(key):
+    with _HISTORY_CACHE_LOCK:
+        entry = _HISTORY_CACHE.get(key)
+    if entry and time.time() - entry[0] < HISTORY_CACHE_TTL:
+        return entry[1]
+    return None
+
+def _history_cache_put(key, value):
+    with _HISTORY_CACHE_LOCK:
+        _HISTORY_CACHE[key] = (time.time(), value)
+
+def invalidate_history_cache(ticker=None):
+    # ticker 지정 시 해당 종목 항목만, 없으면 전체 삭제
+    with _HISTORY_CACHE_LOCK:
+        if ticker is None:
+            _HISTORY_CACHE.clear()
+            return
+        for key in [k for k in _HISTORY_CACHE if k[1] == ticker]:
+            del _HISTORY_CACHE[key]
+
+def _lookback_start():
+    # 날짜 단위로 고정된 값이라 같은 날 같은 파라미터의 쿼리는 BigQuery 결과 캐시도 재사용됨
+    return (datetime.now(pytz.utc) - timedelta(days=HISTORY_LOOKBACK_DAYS)).strftime('%Y-%m-%d')
 
 def check_db_freshness():
     client = get_client()
@@ -99,10 +190,20 @@ def get_tickers_from_db(limit=40, tags=[]):
     return [{"code": row.ticker, "tag": row.sector} for row in results]
 
 def ensure_history_table_schema(client):
-    # trade_history 테이블 스키마 보정
+    # trade_history 테이블 스키마 보정 (프로세스당 1회)
+    _ensure_once(("schema", TABLE_HISTORY), _ensure_history_table_schema, client)
+
+def _ensure_history_table_schema(client):
     table_id = f"{client.project}.{DATASET_ID}.{TABLE_HISTORY}"
     try:
         table = client.get_table(table_id)
+    except NotFound:
+        return # 아직 없음 (save_log가 파티션/클러스터 설정으로 생성)
+    except Exception as e:
+        print(f" [BQ] {TABLE_HISTORY} 조회 실패: {e}")
+        return
+
+    try:
         new_columns = [
             bigquery.SchemaField("action", "STRING", mode="NULLABLE"),
             bigquery.SchemaField("target_price", "FLOAT", mode="NULLABLE"),
@@ -120,8 +221,53 @@ def ensure_history_table_schema(client):
             original_schema = table.schema
             new_schema = original_schema[:] + added_fields
             table.schema = new_schema
-            client.update_table(table, ["schema"])
-    except: pass
+            # 갱신된 etag를 가진 반환 객체로 이어서 수정 (이전 객체 재사용 시 precondition 실패)
+            table = client.update_table(table, ["schema"])
+
+        # 클러스터링은 기존 테이블에도 바로 지정 가능 (이후 적재분부터 적용)
+        if not table.clustering_fields:
+            table.clustering_fields = HISTORY_CLUSTERING
+            client.update_table(table, ["clustering_fields"])
+        if not table.time_partitioning:
+            print(f" [BQ] {TABLE_HISTORY} 파티션 미적용 테이블 -> 'python mervis_bigquery.py'로 마이그레이션 권장")
+    except Exception as e:
+        print(f" [BQ] {TABLE_HISTORY} 스키마/클러스터링 갱신 실패: {e}")
+
+def migrate_history_table():
+    """
+    [1회성] 기존 비파티션 trade_history -> DATE(log_date) 파티션 + (ticker, mode) 클러스터 테이블로 교체
+    원본은 trade_history_backup_<날짜>로 이름만 바꿔 보관
+    """
+    client = get_client()
+    if not client: return False
+    table_id = f"{client.project}.{DATASET_ID}.{TABLE_HISTORY}"
+    try:
+        table = client.get_table(table_id)
+    except Exception as e:
+        print(f" [BQ Migration] {TABLE_HISTORY} 조회 실패: {e}")
+        return False
+    if table.time_partitioning:
+        print(f" [BQ Migration] {TABLE_HISTORY} 이미 파티션 적용됨 ({table.time_partitioning.field})")
+        return True
+
+    new_name = f"{TABLE_HISTORY}_partitioned"
+    backup_name = f"{TABLE_HISTORY}_backup_{datetime.now().strftime('%Y%m%d%H%M')}"
+    dataset = f"{client.project}.{DATASET_ID}"
+    try:
+        client.query(f"""
+            CREATE OR REPLACE TABLE `{dataset}.{new_name}`
+            PARTITION BY DATE(log_date)
+            CLUSTER BY {', '.join(HISTORY_CLUSTERING)}
+            AS SELECT * FROM `{dataset}.{TABLE_HISTORY}`
+        """).result()
+        client.query(f"ALTER TABLE `{dataset}.{TABLE_HISTORY}` RENAME TO `{backup_name}`").result()
+        client.query(f"ALTER TABLE `{dataset}.{new_name}` RENAME TO `{TABLE_HISTORY}`").result()
+    except Exception as e:
+        print(f" [BQ Migration] 실패 (원본 유지): {e}")
+        return False
+    invalidate_history_cache()
+    print(f" [BQ Migration] {TABLE_HISTORY} 파티션/클러스터 적용 완료 (백업: {backup_name})")
+    return True
 
 def save_log(ticker, mode, price, report, news_summary="", action="WAITING", target_price=0.0, cut_price=0.0):
     client = get_client()
@@ -143,8 +289,7 @@ def save_log(ticker, mode, price, report, news_summary="", action="WAITING", tar
         bigquery.SchemaField("result_status", "STRING", mode="NULLABLE"),
         bigquery.SchemaField("feedback", "STRING", mode="NULLABLE")
     ]
-    try: client.create_table(bigquery.Table(table_ref, schema=schema), exists_ok=True)
-    except: pass
+    ensure_table(client, table_ref, schema, partition_field="log_date", clustering_fields=HISTORY_CLUSTERING)
 
     rows = [{
         "log_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
@@ -162,6 +307,7 @@ def save_log(ticker, mode, price, report, news_summary="", action="WAITING", tar
     }]
     try: client.insert_rows_json(table_ref, rows)
     except Exception as e: print(f" [DB Save Error] {e}")
+    invalidate_history_cache(ticker)
 
 def save_analysis_result(ticker, price, score, report):
     client = get_client()
@@ -174,8 +320,7 @@ def save_analysis_result(ticker, price, score, report):
         bigquery.SchemaField("report", "STRING", mode="NULLABLE"),
         bigquery.SchemaField("updated_at", "TIMESTAMP", mode="NULLABLE"),
     ]
-    try: client.create_table(bigquery.Table(table_ref, schema=schema), exists_ok=True)
-    except: pass
+    ensure_table(client, table_ref, schema)
     rows = [{
         "code": ticker,
         "price": float(price),
@@ -197,8 +342,7 @@ def save_daily_balance(total_asset, cash, stock_val, pnl_daily):
         bigquery.SchemaField("stock_val", "FLOAT", mode="NULLABLE"),
         bigquery.SchemaField("pnl_daily", "FLOAT", mode="NULLABLE"),
     ]
-    try: client.create_table(bigquery.Table(table_ref, schema=schema), exists_ok=True)
-    except: pass
+    ensure_table(client, table_ref, schema)
     today = datetime.now().strftime("%Y-%m-%d")
     rows = [{
         "date": today, "total_asset": float(total_asset),
@@ -227,7 +371,10 @@ def safe_float(val, default=0.0):
         return default
 
 def ensure_daily_features_schema(client):
-    # daily_features 테이블에 price 컬럼이 없으면 자동 추가
+    # daily_features 테이블에 price 컬럼이 없으면 자동 추가 (프로세스당 1회)
+    _ensure_once(("schema", TABLE_FEATURES), _ensure_daily_features_schema, client)
+
+def _ensure_daily_features_schema(client):
     table_id = f"{client.project}.{DATASET_ID}.{TABLE_FEATURES}"
     try:
         table = client.get_table(table_id)
@@ -242,120 +389,222 @@ def ensure_daily_features_schema(client):
             original_schema = table.schema
             new_schema = original_schema[:] + new_columns
             table.schema = new_schema
-            client.update_table(table, ["schema"])
+            # 갱신된 etag를 가진 반환 객체로 이어서 수정 (이전 객체 재사용 시 precondition 실패)
+            table = client.update_table(table, ["schema"])
             # print(" [Info] daily_features 테이블에 price 컬럼이 자동 추가되었습니다.")
     except: pass
 
-def save_daily_features(ticker, price, tech_data, fund_data, supply_data):
-    # ML 학습용 데이터 저장 (Schema Update Logic Included)
-    client = get_client()
-    if not client: return
+# ML Feature Schema (daily_features)
+DAILY_FEATURES_SCHEMA = [
+    bigquery.SchemaField("date", "DATE", mode="REQUIRED"),
+    bigquery.SchemaField("ticker", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("price", "FLOAT", mode="NULLABLE"),
     
-    # 1. 스키마 보정
-    ensure_daily_features_schema(client)
+    # Technical
+    bigquery.SchemaField("rsi", "FLOAT", mode="NULLABLE"),
+    bigquery.SchemaField("vwap_ratio", "FLOAT", mode="NULLABLE"), 
+    bigquery.SchemaField("ma20_ratio", "FLOAT", mode="NULLABLE"), 
+    bigquery.SchemaField("vol_ratio", "FLOAT", mode="NULLABLE"),
     
-    table_ref = f"{client.project}.{DATASET_ID}.{TABLE_FEATURES}"
+    # Fundamental
+    bigquery.SchemaField("forward_pe", "FLOAT", mode="NULLABLE"),
+    bigquery.SchemaField("target_upside", "FLOAT", mode="NULLABLE"),
     
-    # ML Feature Schema (참고용 - 실제 생성은 create_table이 수행)
-    schema = [
-        bigquery.SchemaField("date", "DATE", mode="REQUIRED"),
-        bigquery.SchemaField("ticker", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("price", "FLOAT", mode="NULLABLE"),
-        
-        # Technical
-        bigquery.SchemaField("rsi", "FLOAT", mode="NULLABLE"),
-        bigquery.SchemaField("vwap_ratio", "FLOAT", mode="NULLABLE"), 
-        bigquery.SchemaField("ma20_ratio", "FLOAT", mode="NULLABLE"), 
-        bigquery.SchemaField("vol_ratio", "FLOAT", mode="NULLABLE"),
-        
-        # Fundamental
-        bigquery.SchemaField("forward_pe", "FLOAT", mode="NULLABLE"),
-        bigquery.SchemaField("target_upside", "FLOAT", mode="NULLABLE"),
-        
-        # Supply
-        bigquery.SchemaField("inst_pct", "FLOAT", mode="NULLABLE"),
-        bigquery.SchemaField("short_ratio", "FLOAT", mode="NULLABLE"),
-        
-        # Target (Label)
-        bigquery.SchemaField("next_day_return", "FLOAT", mode="NULLABLE")
-    ]
+    # Supply
+    bigquery.SchemaField("inst_pct", "FLOAT", mode="NULLABLE"),
+    bigquery.SchemaField("short_ratio", "FLOAT", mode="NULLABLE"),
     
-    try: client.create_table(bigquery.Table(table_ref, schema=schema), exists_ok=True)
-    except: pass
+    # Target (Label)
+    bigquery.SchemaField("next_day_return", "FLOAT", mode="NULLABLE")
+]
 
-    try:
-        # 데이터 정제
-        current_price = safe_float(price)
-        rsi = tech_data.get('rsi', 0.0)
-        vwap = tech_data.get('vwap', 0.0)
-        
-        if safe_float(vwap) == 0.0:
-            vwap_ratio = 1.0
-        else:
-            vwap_ratio = current_price / vwap
-            
-        ma20_ratio = tech_data.get('ma20_ratio', 0.0)
-        vol_ratio = tech_data.get('vol_ratio', 0.0)
-        
-        # Fundamental
-        val = fund_data.get('valuation', {}) if fund_data else {}
-        con = fund_data.get('consensus', {}) if fund_data else {}
-        target_mean = con.get('target_mean', 0.0)
-        
-        if current_price == 0.0:
-            target_upside = 0.0
-        else:
-            target_upside = (target_mean - current_price) / current_price if target_mean else 0.0
-        
-        today = datetime.now().strftime("%Y-%m-%d")
-        
-        rows = [{
-            "date": today,
-            "ticker": ticker,
-            "price": current_price,
-            "rsi": safe_float(rsi),
-            "vwap_ratio": safe_float(vwap_ratio, 1.0),
-            "ma20_ratio": safe_float(ma20_ratio, 0.0),
-            "vol_ratio": safe_float(vol_ratio, 0.0),
-            "forward_pe": safe_float(val.get('forward_pe', 0.0)),
-            "target_upside": safe_float(target_upside, 0.0),
-            "inst_pct": safe_float(supply_data.get('institution_pct', 0.0)),
-            "short_ratio": safe_float(supply_data.get('short_ratio', 0.0)),
-            "next_day_return": None 
-        }]
+def build_daily_feature_row(ticker, price, tech_data, fund_data, supply_data, date=None):
+    """
+    분석 결과 -> daily_features 1행 (NaN/None 정제 포함)
+    """
+    tech_data = tech_data or {}
+    supply_data = supply_data or {}
+    current_price = safe_float(price)
+    rsi = tech_data.get('rsi', 0.0)
+    vwap = tech_data.get('vwap', 0.0)
+    
+    if safe_float(vwap) == 0.0:
+        vwap_ratio = 1.0
+    else:
+        vwap_ratio = current_price / vwap
         
-        client.insert_rows_json(table_ref, rows)
-    except Exception as e:
-        print(f" [DB Feature Save Error] {ticker}: {e}")
+    ma20_ratio = tech_data.get('ma20_ratio', 0.0)
+    vol_ratio = tech_data.get('vol_ratio', 0.0)
+    
+    # Fundamental
+    val = fund_data.get('valuation', {}) if fund_data else {}
+    con = fund_data.get('consensus', {}) if fund_data else {}
+    target_mean = con.get('target_mean', 0.0)
+    
+    if current_price == 0.0:
+        target_upside = 0.0
+    else:
+        target_upside = (target_mean - current_price) / current_price if target_mean else 0.0
+    
+    return {
+        "date": date or datetime.now().strftime("%Y-%m-%d"),
+        "ticker": ticker,
+        "price": current_price,
+        "rsi": safe_float(rsi),
+        "vwap_ratio": safe_float(vwap_ratio, 1.0),
+        "ma20_ratio": safe_float(ma20_ratio, 0.0),
+        "vol_ratio": safe_float(vol_ratio, 0.0),
+        "forward_pe": safe_float(val.get('forward_pe', 0.0)),
+        "target_upside": safe_float(target_upside, 0.0),
+        "inst_pct": safe_float(supply_data.get('institution_pct', 0.0)),
+        "short_ratio": safe_float(supply_data.get('short_ratio', 0.0)),
+        "next_day_return": None 
+    }
 
-def get_recent_memory(ticker):
-    client = get_client()
-    if not client: return None
-    current_mode = mervis_state.get_mode()
-    query = f"""
-        SELECT report, log_date FROM `{client.project}.{DATASET_ID}.{TABLE_HISTORY}`
-        WHERE ticker = '{ticker}' AND mode = '{current_mode}' 
-        ORDER BY log_date DESC LIMIT 1
+# 저장 실패 후 자동 flush 재시도 대기(초): 30, 60, 120 ... 최대 600
+FEATURE_RETRY_BASE = 30
+FEATURE_RETRY_MAX = 600
+
+# 저장 실패가 이어질 때 보관할 최대 행 수 (flush_size 배수, 초과분은 오래된 행부터 버림)
+FEATURE_MAX_PENDING_BATCHES = 20
+
+class DailyFeatureSink:
     """
-    try:
-        results = list(client.query(query).result())
-        if results: return {"date": str(results[0].log_date), "report": results[0].report}
-    except: return None
+    [daily_features 일괄 저장기]
+    행을 모아 두었다가 flush 시 임시 테이블에 Load Job 1회로 적재 후
+    (date, ticker) 기준 MERGE로 반영 -> 재실행해도 같은 날짜/종목이 중복되지 않음
+    (스트리밍 insert를 쓰지 않으므로 labeler의 MERGE가 스트리밍 버퍼에 막히지 않음)
+    - 저장 실패 시 add()의 자동 flush는 백오프 동안 멈추고, 마지막 flush() 호출은 항상 재시도
+    """
+    def __init__(self, flush_size=500):
+        self.flush_size = flush_size
+        self.rows = {}        # {(date, ticker): row} - 같은 키는 마지막 값 유지
+        self.client = None
+        self.prepared = False
+        self.written = 0
+        self.failures = 0     # 연속 실패 횟수
+        self.retry_at = 0.0   # 이 시각 전에는 자동 flush 하지 않음
+        self.dropped = 0
+
+    def _prepare(self):
+        # 테이블 생성/스키마 보정은 실행당 1회
+        if self.prepared: return self.client is not None
+        self.prepared = True
+        self.client = get_client()
+        if not self.client: return False
+        table_ref = f"{self.client.project}.{DATASET_ID}.{TABLE_FEATURES}"
+        ensure_table(self.client, table_ref, DAILY_FEATURES_SCHEMA)
+        ensure_daily_features_schema(self.client)
+        return True
+
+    def add(self, ticker, price, tech_data, fund_data, supply_data):
+        row = build_daily_feature_row(ticker, price, tech_data, fund_data, supply_data)
+        self.rows[(row["date"], row["ticker"])] = row
+        if len(self.rows) >= self.flush_size and time.time() >= self.retry_at:
+            self.flush()
+        self._trim()
+
+    def _trim(self):
+        # 저장이 계속 실패하는 동안 버퍼가 무한히 커지지 않도록 오래된 행부터 버림
+        limit = self.flush_size * FEATURE_MAX_PENDING_BATCHES
+        over = len(self.rows) - limit
+        if over <= 0: return
+        for key in list(self.rows)[:over]:
+            del self.rows[key]
+        self.dropped += over
+        print(f" [DB Feature Save] 저장 지연으로 {over}건 버림 (누적 {self.dropped}건)")
+
+    def _on_failure(self):
+        self.failures += 1
+        delay = min(FEATURE_RETRY_BASE * (2 ** (self.failures - 1)), FEATURE_RETRY_MAX)
+        self.retry_at = time.time() + delay
+        print(f" [DB Feature Save] {delay}초 동안 자동 저장 중지 (대기 {len(self.rows)}건, 연속 실패 {self.failures}회)")
+
+    def flush(self):
+        if not self.rows: return 0
+        if not self._prepare():
+            self._on_failure()
+            return 0
+        client = self.client
+        rows = list(self.rows.values())
+        target = f"{client.project}.{DATASET_ID}.{TABLE_FEATURES}"
+        staging = f"{client.project}.{DATASET_ID}.{TABLE_FEATURES}_staging_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+        try:
+            job_config = bigquery.LoadJobConfig(
+                schema=DAILY_FEATURES_SCHEMA,
+                source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+                write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE
+            )
+            client.load_table_from_json(rows, staging, job_config=job_config).result()
+
+            update_cols = [f.name for f in DAILY_FEATURES_SCHEMA if f.name not in ("date", "ticker", "next_day_return")]
+            insert_cols = [f.name for f in DAILY_FEATURES_SCHEMA]
+            merge_query = f"""
+                MERGE `{target}` T
+                USING `{staging}` S
+                ON T.date = S.date AND T.ticker = S.ticker
+                WHEN MATCHED THEN
+                  UPDATE SET {", ".join(f"{c} = S.{c}" for c in update_cols)}
+                WHEN NOT MATCHED THEN
+                  INSERT ({", ".join(insert_cols)}) VALUES ({", ".join(f"S.{c}" for c in insert_cols)})
+            """
+            client.query(merge_query).result()
+            self.written += len(rows)
+            self.rows.clear()
+            self.failures, self.retry_at = 0, 0.0
+            return len(rows)
+        except Exception as e:
+            print(f" [DB Feature Save Error] {len(rows)}건 일괄 저장 실패: {e}")
+            self._on_failure()
+            return 0
+        finally:
+            try: client.delete_table(staging, not_found_ok=True)
+            except: pass
+
+def save_daily_features(ticker, price, tech_data, fund_data, supply_data):
+    # ML 학습용 데이터 저장 (단건, 일괄 저장은 DailyFeatureSink 사용)
+    sink = DailyFeatureSink()
+    sink.add(ticker, price, tech_data, fund_data, supply_data)
+    sink.flush()
+
+def get_recent_memory(ticker):
+    memories = get_multi_memories(ticker, limit=1)
+    if memories: return {"date": memories[0]["date"], "report": memories[0]["report"]}
     return None
 
 def get_multi_memories(ticker, limit=3):
+    """
+    종목의 최근 분석 기록 (현재 모드 기준)
+    파라미터 쿼리 + 조회 기간 조건으로 파티션/클러스터 프루닝, 결과는 HISTORY_CACHE_TTL 동안 로컬 캐시
+    """
+    current_mode = mervis_state.get_mode()
+    key = ("memories", ticker, current_mode, limit)
+    cached = _history_cache_get(key)
+    if cached is not None: return list(cached)
+
     client = get_client()
     if not client: return []
-    current_mode = mervis_state.get_mode()
     query = f"""
         SELECT report, log_date, price FROM `{client.project}.{DATASET_ID}.{TABLE_HISTORY}`
-        WHERE ticker = '{ticker}' AND mode = '{current_mode}' 
-        ORDER BY log_date DESC LIMIT {limit}
+        WHERE ticker = @ticker AND mode = @mode
+          AND log_date >= TIMESTAMP(@since)
+        ORDER BY log_date DESC LIMIT @limit
     """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("ticker", "STRING", ticker),
+            bigquery.ScalarQueryParameter("mode", "STRING", current_mode),
+            bigquery.ScalarQueryParameter("since", "STRING", _lookback_start()),
+            bigquery.ScalarQueryParameter("limit", "INT64", limit)
+        ]
+    )
     try:
-        results = list(client.query(query).result())
-        return [{"date": str(row.log_date), "report": row.report, "price": row.price} for row in results]
+        results = list(client.query(query, job_config=job_config).result())
     except: return []
+    memories = [{"date": str(row.log_date), "report": row.report, "price": row.price} for row in results]
+    _history_cache_put(key, memories)
+    return list(memories)
 
 def get_analyzed_ticker_list():
     client = get_client()
@@ -363,11 +612,14 @@ def get_analyzed_ticker_list():
     current_mode = mervis_state.get_mode()
     query = f"""
         SELECT ticker FROM `{client.project}.{DATASET_ID}.{TABLE_HISTORY}`
-        WHERE mode = '{current_mode}'
+        WHERE mode = @mode
         GROUP BY ticker ORDER BY MAX(log_date) DESC
     """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("mode", "STRING", current_mode)]
+    )
     try:
-        results = list(client.query(query).result())
+        results = list(client.query(query, job_config=job_config).result())
         return [row.ticker for row in results]
     except: return []
 
@@ -406,10 +658,16 @@ def get_top_ranked_stocks(limit=5):
             query_history = f"""
                 SELECT ticker, report, price, log_date
                 FROM `{client.project}.{DATASET_ID}.{TABLE_HISTORY}`
-                WHERE mode = '{current_mode}'
-                ORDER BY log_date DESC LIMIT {limit}
+                WHERE mode = @mode
+                ORDER BY log_date DESC LIMIT @limit
             """
-            rows = list(client.query(query_history).result())
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[
+                    bigquery.ScalarQueryParameter("mode", "STRING", current_mode),
+                    bigquery.ScalarQueryParameter("limit", "INT64", limit)
+                ]
+            )
+            rows = list(client.query(query_history, job_config=job_config).result())
             for row in rows:
                 results.append({
                     "code": row['ticker'], "price": row['price'],
@@ -452,19 +710,94 @@ def update_trade_result(ticker, log_date, result_status):
     client = get_client()
     if not client: return
     
-    date_str = log_date.strftime('%Y-%m-%d %H:%M:%S')
-    
+    # log_date(파티션 컬럼) 동등 조건이라 해당 날짜 파티션만 스캔
     query = f"""
         UPDATE `{client.project}.{DATASET_ID}.{TABLE_HISTORY}`
-        SET result_status = '{result_status}'
-        WHERE ticker = '{ticker}' 
-          AND log_date = '{date_str}'
+        SET result_status = @result_status
+        WHERE ticker = @ticker 
+          AND log_date = @log_date
     """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("result_status", "STRING", result_status),
+            bigquery.ScalarQueryParameter("ticker", "STRING", ticker),
+            bigquery.ScalarQueryParameter("log_date", "TIMESTAMP", log_date)
+        ]
+    )
     try:
-        query_job = client.query(query)
+        query_job = client.query(query, job_config=job_config)
         query_job.result()
     except Exception as e:
         print(f" [BQ Update Error] {ticker} 업데이트 실패: {e}")
+    invalidate_history_cache(ticker)
+
+def _merge_history_column(items, column, tag, condition):
+    """
+    trade_history 단일 컬럼 일괄 갱신 공용 루틴
+    items: [{"ticker", "log_date"(datetime), column: 값}]
+    임시 테이블에 Load Job 1회로 적재 후 MERGE 1회로 반영 (건별 UPDATE DML 대체)
+    반환: 반영 요청 건수 (실패 시 0)
+    """
+    if not items: return 0
+    client = get_client()
+    if not client: return 0
+
+    # 같은 (종목, 시각)은 마지막 값만 사용 (MERGE 소스 중복 방지)
+    rows = {}
+    for r in items:
+        rows[(r["ticker"], r["log_date"])] = {
+            "ticker": r["ticker"],
+            "log_date": r["log_date"].isoformat(),
+            column: r[column]
+        }
+    rows = list(rows.values())
+    since = min(r["log_date"] for r in items).strftime('%Y-%m-%d')
+
+    schema = [
+        bigquery.SchemaField("ticker", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("log_date", "TIMESTAMP", mode="REQUIRED"),
+        bigquery.SchemaField(column, "STRING", mode="NULLABLE")
+    ]
+    target = f"{client.project}.{DATASET_ID}.{TABLE_HISTORY}"
+    staging = f"{client.project}.{DATASET_ID}.{TABLE_HISTORY}_{tag}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+    try:
+        job_config = bigquery.LoadJobConfig(
+            schema=schema,
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE
+        )
+        client.load_table_from_json(rows, staging, job_config=job_config).result()
+
+        # 가장 오래된 대상 날짜 이후 파티션만 스캔
+        merge_query = f"""
+            MERGE `{target}` T
+            USING `{staging}` S
+            ON T.ticker = S.ticker AND T.log_date = S.log_date
+               AND T.log_date >= TIMESTAMP(@since)
+            WHEN MATCHED AND {condition} THEN
+              UPDATE SET {column} = S.{column}
+        """
+        query_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter("since", "STRING", since)]
+        )
+        client.query(merge_query, job_config=query_config).result()
+        return len(rows)
+    except Exception as e:
+        print(f" [BQ Update Error] {column} {len(rows)}건 일괄 반영 실패: {e}")
+        return 0
+    finally:
+        try: client.delete_table(staging, not_found_ok=True)
+        except: pass
+        for ticker in {r["ticker"] for r in rows}:
+            invalidate_history_cache(ticker)
+
+def update_trade_results(results):
+    # [채점 일괄 반영] results: [{"ticker", "log_date", "result_status"}] (PENDING 항목만 갱신)
+    return _merge_history_column(results, "result_status", "grading", "T.result_status = 'PENDING'")
+
+def update_trade_feedbacks(feedbacks):
+    # [오답노트 일괄 반영] feedbacks: [{"ticker", "log_date", "feedback"}] (피드백이 없는 항목만 갱신)
+    return _merge_history_column(feedbacks, "feedback", "feedback", "T.feedback IS NULL")
 
 def update_trade_feedback(ticker, log_date, feedback):
     client = get_client()
@@ -490,8 +823,10 @@ def update_trade_feedback(ticker, log_date, feedback):
         query_job.result()
     except Exception as e:
         print(f" [BQ Feedback Error] {ticker} 피드백 저장 실패: {e}")
+    invalidate_history_cache(ticker)
 
-def get_trades_needing_feedback():
+def get_trades_needing_feedback(limit=None):
+    # limit 미지정 시 피드백이 없는 채점 완료 항목 전체 (최신순)
     client = get_client()
     if not client: return []
     
@@ -501,10 +836,13 @@ def get_trades_needing_feedback():
         WHERE result_status IN ('WIN', 'LOSE')
           AND feedback IS NULL
         ORDER BY log_date DESC
-        LIMIT 5
+        {"LIMIT @limit" if limit else ""}
     """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("limit", "INT64", limit)] if limit else []
+    )
     try:
-        results = list(client.query(query).result())
+        results = list(client.query(query, job_config=job_config).result())
         return [{
             "ticker": row.ticker,
             "mode": row.mode,
@@ -517,24 +855,38 @@ def get_trades_needing_feedback():
     except: return []
 
 def get_past_lessons(ticker, limit=5):
+    key = ("lessons", ticker, None, limit)
+    cached = _history_cache_get(key)
+    if cached is not None: return list(cached)
+
     client = get_client()
     if not client: return []
     
     query = f"""
         SELECT log_date, result_status, feedback
         FROM `{client.project}.{DATASET_ID}.{TABLE_HISTORY}`
-        WHERE ticker = '{ticker}' 
+        WHERE ticker = @ticker 
+          AND log_date >= TIMESTAMP(@since)
           AND feedback IS NOT NULL
-        ORDER BY log_date DESC LIMIT {limit}
+        ORDER BY log_date DESC LIMIT @limit
     """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("ticker", "STRING", ticker),
+            bigquery.ScalarQueryParameter("since", "STRING", _lookback_start()),
+            bigquery.ScalarQueryParameter("limit", "INT64", limit)
+        ]
+    )
     try:
-        results = list(client.query(query).result())
-        return [{
-            "date": str(row.log_date)[:10], 
-            "result": row.result_status, 
-            "feedback": row.feedback
-        } for row in results]
+        results = list(client.query(query, job_config=job_config).result())
     except: return []
+    lessons = [{
+        "date": str(row.log_date)[:10], 
+        "result": row.result_status, 
+        "feedback": row.feedback
+    } for row in results]
+    _history_cache_put(key, lessons)
+    return list(lessons)
 
 def get_all_tickers_simple():
     """
@@ -551,41 +903,137 @@ def get_all_tickers_simple():
         print(f" [DB Error] 전체 티커 로드 실패: {e}")
         return []
 
-def get_prediction(ticker):
+def get_ticker_exchanges():
     """
-    [머신러닝] Boosted Tree 모델에게 '내일 수익률' 예측 요청 (ML.PREDICT 사용)
+    [거래소 캐시 시드용] ticker_universe의 종목별 거래소 정보 로드
+    (exchange 컬럼이 없는 구버전 테이블이면 빈 dict)
     """
     client = get_client()
+    if not client: return {}
+    
+    query = f"""
+        SELECT ticker, exchange FROM `{client.project}.{DATASET_ID}.{TABLE_TICKERS}`
+        WHERE exchange IS NOT NULL
+    """
+    try:
+        results = list(client.query(query).result())
+        return {row.ticker: row.exchange for row in results}
+    except Exception:
+        return {}
+
+# [ML 예측 캐시] 거래일(미국 동부 기준)별 {ticker: 예측 dict 또는 None}
+# daily_features는 하루 한 번(크롤러) 갱신되므로 같은 거래일 안에서는 결과가 변하지 않음
+_PREDICTIONS = {"day": None, "data": {}}
+_PREDICTIONS_LOCK = threading.Lock()
+
+def _trading_day():
+    return datetime.now(pytz.timezone('US/Eastern')).strftime('%Y%m%d')
+
+def clear_prediction_cache():
+    with _PREDICTIONS_LOCK:
+        _PREDICTIONS["day"] = None
+        _PREDICTIONS["data"] = {}
+
+def get_predictions(tickers):
+    """
+    [머신러닝] 여러 종목의 '내일 수익률' 예측을 ML.PREDICT 1회로 조회 (거래일 단위 캐시)
+    - 반환: {ticker: {"predicted_return", "return_min", "return_max"} 또는 None}
+    - 이미 캐시된 종목은 쿼리에서 제외, 피처가 없는 종목도 None으로 캐시
+    """
+    day = _trading_day()
+    with _PREDICTIONS_LOCK:
+        if _PREDICTIONS["day"] != day:
+            _PREDICTIONS["day"] = day
+            _PREDICTIONS["data"] = {}
+        cache = _PREDICTIONS["data"]
+        missing = sorted({t for t in tickers if t not in cache})
+
+    if missing:
+        fetched = _predict_batch(missing)
+        if fetched is not None:
+            with _PREDICTIONS_LOCK:
+                if _PREDICTIONS["day"] == day:
+                    for t in missing:
+                        _PREDICTIONS["data"][t] = fetched.get(t)
+
+    with _PREDICTIONS_LOCK:
+        data = _PREDICTIONS["data"]
+        return {t: data.get(t) for t in tickers}
+
+def _predict_batch(tickers):
+    # 종목별 최신 피처 1행씩 예측 (실패 시 None -> 캐시하지 않음)
+    client = get_client()
     if not client: return None
 
-    # 최신 데이터 1건을 가져와서 예측
+    # 로컬 모델이 유효하면 피처만 조회하여 프로세스 안에서 예측
+    if mervis_local_model.is_available():
+        results = _predict_batch_local(client, tickers)
+        if results is not None:
+            return results
+
     # ML.PREDICT는 회귀 모델의 경우 'predicted_정답컬럼명'으로 결과를 반환
     # 정답 컬럼은 predicted_next_day_return
     query = f"""
         SELECT
+          ticker,
           predicted_next_day_return as predicted_return
         FROM
           ML.PREDICT(MODEL `{client.project}.{DATASET_ID}.return_forecast_model`, 
             (
               SELECT * FROM `{client.project}.{DATASET_ID}.{TABLE_FEATURES}`
-              WHERE ticker = '{ticker}'
-              ORDER BY date DESC
-              LIMIT 1
+              WHERE ticker IN UNNEST(@tickers)
+              QUALIFY ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY date DESC) = 1
             )
           )
     """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ArrayQueryParameter("tickers", "STRING", list(tickers))]
+    )
     try:
-        results = list(client.query(query).result())
-        if results:
-            row = results[0]
+        results = {}
+        for row in client.query(query, job_config=job_config).result():
+            if row.predicted_return is None: continue
             pred = float(row.predicted_return)
             # 회귀 모델은 구간 예측을 기본 제공하지 않으므로, 일단 예측값으로 통일
-            return {
+            results[row.ticker] = {
                 "predicted_return": pred,
                 "return_min": pred,
                 "return_max": pred
             }
+        return results
     except Exception as e:
-        # print(f" [ML Error] {ticker} 예측 실패: {e}") 
+        # print(f" [ML Error] 일괄 예측 실패: {e}") 
         return None
-    return None
\ No newline at end of file
+
+def _predict_batch_local(client, tickers):
+    cols = ", ".join(["ticker"] + mervis_local_model.FEATURES)
+    query = f"""
+        SELECT {cols} FROM `{client.project}.{DATASET_ID}.{TABLE_FEATURES}`
+        WHERE ticker IN UNNEST(@tickers)
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY date DESC) = 1
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ArrayQueryParameter("tickers", "STRING", list(tickers))]
+    )
+    try:
+        rows = [dict(row.items()) for row in client.query(query, job_config=job_config).result()]
+        if not rows: return {}
+        preds = mervis_local_model.predict_rows(rows)
+        if preds is None: return None
+        return {
+            row["ticker"]: {"predicted_return": p, "return_min": p, "return_max": p}
+            for row, p in zip(rows, preds)
+        }
+    except Exception:
+        return None
+
+def get_prediction(ticker):
+    """
+    [머신러닝] Boosted Tree 모델에게 '내일 수익률' 예측 요청
+    (get_predictions 캐시에서 제공, 미적중 시 해당 종목만 조회)
+    """
+    return get_predictions([ticker]).get(ticker)
+
+if __name__ == "__main__":
+    # trade_history 파티션/클러스터 마이그레이션 (1회 실행)
+    migrate_history_table()
@@ -1,6 +1,11 @@
 from google import genai
 import os
-import kis_chart
+import time
+import math
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import mervis_chart_store
 import kis_scan
 import json
 import re
@@ -8,15 +13,49 @@ import mervis_profile
 import mervis_state 
 import mervis_bigquery 
 import mervis_painter
+import mervis_local_model
 
 # 분석 모듈 임포트
-from modules import technical, fundamental, supply
+from modules import technical, technical_batch, fundamental, supply
 
 # API 키를 환경 변수에서 로드
 api_key = os.getenv("GEMINI_API_KEY")
 client = genai.Client(api_key=api_key)
 USER_NAME = os.getenv("USER_NAME", "User")
 
+# 로컬 예측 모델 로드 (없거나 오래되었으면 BigQuery ML.PREDICT 사용)
+mervis_local_model.load()
+
+# [분석 데이터 병렬 수집]
+# 차트/수급/재무/ML 예측/기억/오답노트는 서로 독립적인 네트워크 호출이므로 동시에 시작
+# 소스별 제한 시간(초)은 작업이 풀에서 실행되기 시작한 시점부터 적용 (다른 분석과 풀을 공유해도 대기 시간은 제외)
+# 제한 시간을 넘기면 해당 소스만 기본값으로 대체하고 분석은 계속 진행
+GATHER_WORKERS = int(os.getenv("MERVIS_GATHER_WORKERS", "16"))
+SOURCE_TIMEOUTS = {
+    'charts': 20.0,
+    'supply': 10.0,
+    'fund': 10.0,
+    'prediction': 8.0,
+    'memories': 8.0,
+    'lessons': 8.0,
+    'profile': 5.0,
+    'market_open': 3.0
+}
+_GATHER_POOL = ThreadPoolExecutor(max_workers=GATHER_WORKERS, thread_name_prefix="brain-gather")
+
+# 풀 대기열에서 실행 시작까지 기다리는 최대 시간(초) - 풀이 막혔을 때 분석이 무한정 멈추지 않도록
+GATHER_QUEUE_WAIT = float(os.getenv("MERVIS_GATHER_QUEUE_WAIT", "30"))
+
+# [리포트 캐시]
+# 프롬프트 입력(차트/재무/수급/ML 예측/교훈/프로필 + 구간화한 현재가)의 해시가 같으면 Gemini 호출 없이 직전 리포트 재사용
+# 장 마감 후처럼 입력이 그대로인 구간에서는 LLM 호출이 시간이 아니라 시장 움직임에 비례
+REPORT_PRICE_TOLERANCE = float(os.getenv("MERVIS_REPORT_PRICE_TOL", "0.005"))  # 현재가 구간 폭 (0.5%)
+REPORT_CACHE_TTL = int(os.getenv("MERVIS_REPORT_CACHE_TTL", str(4 * 3600)))  # 최대 재사용 시간(초)
+REPORT_CACHE_PER_TICKER = 8
+# 구조: { "TSLA": { "<sha256>": {"report": "...", "ts": 1767225600.0, "price": 251.3} } }
+_REPORT_CACHE = {}
+_REPORT_CACHE_LOCK = threading.Lock()
+
 # --- 유틸리티 함수 ---
 
 def load_memories(ticker):
@@ -76,7 +115,8 @@ def summarize_data(raw_data, period_name, limit=10):
     return "\n".join(summary)
 
 def get_gap_analysis(ticker, last_date):
-    gap_data = kis_chart.get_daily_chart(ticker)
+    # analyze_stock에서 방금 갱신한 로컬 일봉 재사용 (추가 네트워크 호출 없음)
+    gap_data = mervis_chart_store.get_daily_chart(ticker)
     if not gap_data or not last_date: return "공백기 데이터 없음"
     clean_last = last_date.replace("-", "").replace(" ", "").replace(":", "")[:8]
     recent = [d for d in gap_data if str(d['xymd']) > clean_last]
@@ -86,6 +126,160 @@ def get_gap_analysis(ticker, last_date):
         summary += f"- {d['xymd']}: ${d['clos']} ({d['rate']}%)\n"
     return summary
 
+# --- 병렬 수집 유틸리티 ---
+
+def _timed(timings, name, func, *args, **kwargs):
+    # 호출 스레드에서 바로 실행하는 단계용
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        timings[name] = round(time.perf_counter() - start, 3)
+
+class _GatherJob:
+    """
+    풀에 제출한 소스 1개 (실행 시작 시각/소요 시간은 작업 스레드가 기록, timings 반영은 _collect가 담당)
+    """
+    def __init__(self, func, args, kwargs):
+        self.func, self.args, self.kwargs = func, args, kwargs
+        self.started = threading.Event()
+        self.start = None
+        self.elapsed = None
+        self.future = None
+
+    def run(self):
+        self.start = time.perf_counter()
+        self.started.set()
+        try:
+            return self.func(*self.args, **self.kwargs)
+        finally:
+            self.elapsed = round(time.perf_counter() - self.start, 3)
+
+def _submit(func, *args, **kwargs):
+    job = _GatherJob(func, args, kwargs)
+    job.future = _GATHER_POOL.submit(job.run)
+    return job
+
+def _collect(ticker, jobs, timings, name, fallback, timeout=None):
+    """
+    소스 결과 대기 (제한 시간은 해당 소스의 실행 시작 시점 기준)
+    시간 초과/예외 시 fallback 반환, 제때 끝난 소스만 timings에 기록
+    """
+    job = jobs[name] if isinstance(jobs, dict) else jobs
+    limit = timeout if timeout is not None else SOURCE_TIMEOUTS.get(name, 10.0)
+    if not job.started.wait(GATHER_QUEUE_WAIT):
+        job.future.cancel()
+        print(f" [Brain] {ticker} '{name}' 작업 대기 초과 ({GATHER_QUEUE_WAIT:.0f}s) - 기본값으로 진행")
+        return fallback
+    remaining = max(limit - (time.perf_counter() - job.start), 0.0)
+    try:
+        result = job.future.result(timeout=remaining)
+        timings[name] = job.elapsed
+        return result
+    except FutureTimeout:
+        print(f" [Brain] {ticker} '{name}' 시간 초과 ({limit}s) - 기본값으로 진행")
+    except Exception as e:
+        print(f" [Brain] {ticker} '{name}' 조회 실패: {e}")
+    return fallback
+
+def _load_past_lessons(ticker):
+    if hasattr(mervis_bigquery, 'get_past_lessons'):
+        return mervis_bigquery.get_past_lessons(ticker)
+    return []
+
+def _load_prediction(ticker):
+    # 빅쿼리 ML 예측 조회 (Inference)
+    if hasattr(mervis_bigquery, 'get_prediction'):
+        return mervis_bigquery.get_prediction(ticker)
+    return None
+
+def _predict_local(ticker, price, d_data, fund_data, supply_data):
+    """
+    로컬 모델로 즉시 예측 (크롤러와 같은 방식으로 현재 데이터에서 피처 생성)
+    피처 생성 실패 시 BigQuery 예측으로 대체
+    """
+    features = technical_batch.compute_features({ticker: d_data})
+    if ticker in features.index:
+        tech = technical_batch.to_tech_data(features.loc[ticker])
+        row = mervis_bigquery.build_daily_feature_row(ticker, price, tech, fund_data, supply_data)
+        pred = mervis_local_model.predict(row)
+        if pred: return pred
+    return _load_prediction(ticker)
+
+def _print_timings(ticker, timings):
+    order = ['charts', 'supply', 'fund', 'prediction', 'memories', 'lessons', 'profile', 'market_open', 'tech', 'gather', 'llm', 'painter', 'total']
+    parts = [f"{k} {timings[k]:.2f}s" for k in order if k in timings]
+    print(f" [Brain] {ticker} 단계별 소요: " + " | ".join(parts))
+
+# --- 리포트 캐시 ---
+
+def _price_bucket(price):
+    # 로그 스케일 구간 (가격대와 무관하게 REPORT_PRICE_TOLERANCE 폭)
+    if not price or price <= 0: return 0
+    return int(round(math.log(price) / math.log1p(REPORT_PRICE_TOLERANCE)))
+
+def _round(value, digits):
+    try: return round(float(value), digits)
+    except (TypeError, ValueError): return value
+
+def report_fingerprint(ticker, price, chart_set, is_open, is_realtime, analysis_results, feedback_list, user_profile, tech_signals):
+    """
+    리포트 입력 지문 (sha256)
+    - 진행 중인 최신 봉은 장중 계속 바뀌므로 제외하고 구간화한 현재가로 대신 반영
+    - 과거 분석 기록(past_memories)은 머비스 자신의 출력이라 제외 (저장할 때마다 캐시가 깨지는 것 방지)
+    """
+    fund = analysis_results.get('fund_data') or {}
+    consensus = fund.get('consensus', {})
+    valuation = fund.get('valuation', {})
+    supply_data = analysis_results.get('supply_data') or {}
+    pred = analysis_results.get('bq_prediction') or {}
+
+    def closed_bars(records, limit):
+        return [(str(r.get('xymd')), _round(r.get('clos'), 4)) for r in (records or [])[1:limit + 1]]
+
+    payload = {
+        "ticker": ticker,
+        "price": _price_bucket(price),
+        "is_open": bool(is_open),
+        "is_realtime": bool(is_realtime),
+        "profile": user_profile,
+        "signals": sorted(str(sig) for sig in (tech_signals or [])),
+        "daily": closed_bars(chart_set.get('daily'), 15),
+        "weekly": closed_bars(chart_set.get('weekly'), 8),
+        "consensus": [_round(consensus.get('target_mean', 0), 2), consensus.get('recommendation')],
+        "valuation": [_round(valuation.get('forward_pe', 0), 2), _round(valuation.get('trailing_pe', 0), 2)],
+        "supply": [_round(supply_data.get('institution_pct', 0), 3), _round(supply_data.get('short_ratio', 0), 2)],
+        "supply_conclusion": analysis_results.get('supply_conclusion'),
+        "prediction": [_round(pred.get(k), 4) for k in ('predicted_return', 'return_min', 'return_max')],
+        "lessons": [(f.get('date'), f.get('result'), f.get('feedback')) for f in (feedback_list or [])]
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def get_cached_report(ticker, fingerprint):
+    # 적중 시 (리포트, 경과 초), 없으면 (None, None)
+    with _REPORT_CACHE_LOCK:
+        entry = _REPORT_CACHE.get(ticker, {}).get(fingerprint)
+    if not entry: return None, None
+    age = time.time() - entry["ts"]
+    if age > REPORT_CACHE_TTL: return None, None
+    return entry["report"], age
+
+def store_report(ticker, fingerprint, report, price):
+    # 정상 리포트만 저장 (API 오류 응답은 다음 주기에 재시도)
+    if not report or "전략:" not in report or "분석불가" in report: return
+    with _REPORT_CACHE_LOCK:
+        entries = _REPORT_CACHE.setdefault(ticker, {})
+        entries[fingerprint] = {"report": report, "ts": time.time(), "price": price}
+        if len(entries) > REPORT_CACHE_PER_TICKER:
+            oldest = min(entries, key=lambda k: entries[k]["ts"])
+            del entries[oldest]
+
+def clear_report_cache(ticker=None):
+    with _REPORT_CACHE_LOCK:
+        if ticker is None: _REPORT_CACHE.clear()
+        else: _REPORT_CACHE.pop(ticker, None)
+
 # --- 리포트 생성 로직 ---
 
 def get_strategy_report(ticker, chart_set, is_open, past_memories, analysis_results, feedback_list, user_profile, is_realtime=False):
@@ -223,17 +417,35 @@ def get_strategy_report(ticker, chart_set, is_open, past_memories, analysis_resu
 def analyze_stock(item):
     """
     종목 분석 메인 함수 (실시간 데이터 연동 및 ML 예측 포함)
+    독립적인 데이터 소스는 병렬로 수집하므로 전체 소요 시간 ≈ 가장 느린 소스 + LLM 호출
     """
     ticker = item['code']
     price = item.get('price', 0)
-    
-    # 1. 차트 데이터 로드 (Batch/Static)
-    d_data = kis_chart.get_daily_chart(ticker)
-    w_data = kis_chart.get_weekly_chart(ticker)
-    m_data = kis_chart.get_monthly_chart(ticker)
-    y_data = kis_chart.get_yearly_chart(ticker)
-    
-    if not d_data: return None
+
+    started = time.perf_counter()
+    timings = {}
+    use_local_model = mervis_local_model.is_available()
+
+    # 0. 독립 소스 동시 시작
+    jobs = {
+        # 차트 데이터 (일봉 증분 갱신 1회, 주/월/년봉은 일봉에서 변환)
+        'charts': _submit(mervis_chart_store.get_period_charts, ticker),
+        'supply': _submit(supply.analyze_supply_structure, ticker),
+        'fund': _submit(fundamental.analyze_fundamentals, ticker),
+        'memories': _submit(load_memories, ticker),
+        'lessons': _submit(_load_past_lessons, ticker),
+        'profile': _submit(mervis_profile.get_user_profile),
+        'market_open': _submit(kis_scan.is_market_open_check)
+    }
+    if not use_local_model:
+        jobs['prediction'] = _submit(_load_prediction, ticker)
+
+    # 1. 차트 데이터 (없으면 분석 불가)
+    charts = _collect(ticker, jobs, timings, 'charts', None)
+    if not charts or not charts['daily']:
+        for job in jobs.values(): job.future.cancel()
+        return None
+    d_data, w_data, m_data, y_data = charts['daily'], charts['weekly'], charts['monthly'], charts['yearly']
 
     latest_daily = d_data[0]
     volume_info = f"Vol: {latest_daily.get('acml_vol', 0)}"
@@ -247,6 +459,11 @@ def analyze_stock(item):
         change_rate = realtime_data.get('change', 0.0)
         rt_vol = realtime_data.get('volume', 0)
         volume_info = f"Live Vol: {rt_vol} ({change_rate}%)"
+        # 틱 링 버퍼 기반 장중 지표 (네트워크 호출 없음, VWAP은 당일 정규장 시작 이후)
+        tick_vwap = mervis_state.get_intraday_vwap(ticker, since=mervis_state.session_open())
+        tick_mom = mervis_state.get_momentum(ticker, 60)
+        if tick_vwap: volume_info += f" | Tick VWAP: ${tick_vwap:.2f}"
+        if tick_mom is not None: volume_info += f" | 1m Momentum: {tick_mom:+.2f}%"
         is_realtime = True
         print(f" [Brain] {ticker} 실시간 데이터 적용: ${price}")
     else:
@@ -255,7 +472,7 @@ def analyze_stock(item):
             if p_val: price = float(p_val)
 
     # 사용자 프로필 로드
-    user_profile = mervis_profile.get_user_profile()
+    user_profile = _collect(ticker, jobs, timings, 'profile', {})
     style = user_profile.get('investment_style', 'SCALPING')
 
     # 성향별 전략 설정
@@ -269,21 +486,25 @@ def analyze_stock(item):
 
     # 3대 모듈 실행
     
-    # 기술적 분석 (일봉 데이터 기준)
-    tech_data, tech_err, tech_signals = technical.analyze_technical_signals(d_data, active_strategies)
+    # 기술적 분석 (일봉 데이터 기준, 다른 소스를 기다리는 동안 계산)
+    tech_data, tech_err, tech_signals = _timed(timings, 'tech', technical.analyze_technical_signals, d_data, active_strategies)
     if tech_err: print(f" [Brain] Tech Warning: {tech_err}")
 
+    # 차트 그리기 (리포트 생성과 무관하므로 LLM 호출과 동시에 진행)
+    painter_job = _submit(mervis_painter.draw_chart, ticker, d_data, highlight_indicators=tech_signals)
+
     # 수급 분석
-    supply_data, supply_err, _ = supply.analyze_supply_structure(ticker)
+    supply_data, supply_err, _ = _collect(ticker, jobs, timings, 'supply', ({}, "Supply Timeout", []))
     supply_conclusion = supply.analyze_hybrid_supply(supply_data, tech_signals)
 
     # 기본적 분석
-    fund_data, fund_err, _ = fundamental.analyze_fundamentals(ticker)
+    fund_data, fund_err, _ = _collect(ticker, jobs, timings, 'fund', ({}, "Fundamental Timeout", []))
     
-    # 빅쿼리 ML 예측 조회 (Inference)
-    bq_prediction = None
-    if hasattr(mervis_bigquery, 'get_prediction'):
-        bq_prediction = mervis_bigquery.get_prediction(ticker)
+    # ML 예측 (로컬 모델 우선, 사용 불가 시 빅쿼리 ML.PREDICT 결과)
+    if use_local_model:
+        bq_prediction = _timed(timings, 'prediction', _predict_local, ticker, price, d_data, fund_data, supply_data)
+    else:
+        bq_prediction = _collect(ticker, jobs, timings, 'prediction', None)
     
     # 분석 결과 종합
     analysis_results = {
@@ -300,22 +521,35 @@ def analyze_stock(item):
     }
     
     news_data = "" 
-    is_open = kis_scan.is_market_open_check()
-    past_memories = load_memories(ticker)
-    
-    feedback_list = []
-    if hasattr(mervis_bigquery, 'get_past_lessons'):
-        feedback_list = mervis_bigquery.get_past_lessons(ticker)
+    is_open = _collect(ticker, jobs, timings, 'market_open', False)
+    past_memories = _collect(ticker, jobs, timings, 'memories', [])
+    feedback_list = _collect(ticker, jobs, timings, 'lessons', [])
+    timings['gather'] = round(time.perf_counter() - started, 3)
+
+    # 입력이 직전과 같으면 (현재가는 구간 단위) 이전 리포트 재사용
+    fingerprint = report_fingerprint(ticker, price, chart_set, is_open, is_realtime, analysis_results, feedback_list, user_profile, tech_signals)
+    report, report_age = get_cached_report(ticker, fingerprint)
+
+    if report is not None:
+        timings['llm'] = 0.0
+        print(f" [Brain] {ticker} 입력 변화 없음 - {int(report_age)}초 전 리포트 재사용 (LLM 생략)")
+    else:
+        # 리포트 생성 (is_realtime 플래그 전달)
+        report = _timed(timings, 'llm', get_strategy_report, ticker, chart_set, is_open, past_memories, analysis_results, feedback_list, user_profile, is_realtime=is_realtime)
+        store_report(ticker, fingerprint, report, price)
     
-    # 차트 그리기
-    chart_path = mervis_painter.draw_chart(ticker, d_data, highlight_indicators=tech_signals)
+        # 같은 리포트를 다시 기억으로 저장하지 않음 (캐시 적중 시 생략)
+        if "전략:" in report:
+            save_memory(ticker, price, report, news_data)
+
+    chart_path = _collect(ticker, painter_job, timings, 'painter', None, timeout=SOURCE_TIMEOUTS['charts'])
     if chart_path:
         print(f" [Painter] 차트 생성 완료 ({chart_path})")
 
-    # 리포트 생성 (is_realtime 플래그 전달)
-    report = get_strategy_report(ticker, chart_set, is_open, past_memories, analysis_results, feedback_list, user_profile, is_realtime=is_realtime)
-    
-    if "전략:" in report:
-        save_memory(ticker, price, report, news_data)
+    timings['total'] = round(time.perf_counter() - started, 3)
+    _print_timings(ticker, timings)
     
-    return { "code": ticker, "price": price, "report": report, "chart_path": chart_path }
\ No newline at end of file
+    return {
+        "code": ticker, "price": price, "report": report, "chart_path": chart_path,
+        "cached": report_age is not None, "report_age": report_age, "timings": timings
+    }
\ No newline at end of file
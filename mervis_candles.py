@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import pytz
+import mervis_state
+
+# [장중 분봉 생성기]
+# 웹소켓 틱(mervis_state 가격 갱신 이벤트)을 종목별 1분/5분 OHLCV 봉으로 집계
+# 봉 거래량은 KIS 누적 거래량(TVOL)의 증가분으로 계산 -> 분봉 차트 API 추가 호출 없이 장중 분석 가능
+
+# 봉 간격 (초)
+INTERVALS = {"1m": 60, "5m": 300}
+
+# 간격별 보관 봉 수 (1분봉 1000개 ~= 정규장 2.5일)
+MAX_BARS = 1000
+
+# 봉 시각 표기 기준 (미국 동부)
+MARKET_TZ = pytz.timezone('US/Eastern')
+
+class CandleBuilder:
+    """
+    종목 1개, 간격 1개의 봉 집계 상태
+    - bars: 완성된 봉 (오래된 순), current: 진행 중인 봉
+    - 봉: {"ts": 봉 시작 epoch 초, "open", "high", "low", "close", "volume"}
+    """
+    def __init__(self, interval_sec, max_bars=MAX_BARS):
+        self.interval = interval_sec
+        self.bars = deque(maxlen=max_bars)
+        self.current = None
+        self.last_cum_volume = None
+
+    def _volume_delta(self, cum_volume):
+        # 누적 거래량 증가분 = 이번 틱 체결량
+        last = self.last_cum_volume
+        self.last_cum_volume = cum_volume
+        if last is None:
+            return 0.0 # 첫 틱: 이전 누적값을 모르므로 봉에 귀속할 수 없음
+        if cum_volume < last:
+            return cum_volume # 새 세션 시작 (누적 초기화)
+        return cum_volume - last
+
+    def add_tick(self, ts, price, cum_volume):
+        """
+        틱 반영, 새 봉이 시작되어 직전 봉이 확정되면 그 봉을 반환
+        """
+        volume = self._volume_delta(cum_volume)
+        start = int(ts // self.interval) * self.interval
+        cur = self.current
+        closed = None
+
+        if cur is not None and start < cur["ts"]:
+            # 늦게 도착한 틱: 가격은 무시하고 거래량만 현재 봉에 반영
+            cur["volume"] += volume
+            return None
+
+        if cur is None or start > cur["ts"]:
+            if cur is not None:
+                self.bars.append(cur)
+                closed = cur
+            self.current = {"ts": start, "open": price, "high": price, "low": price, "close": price, "volume": volume}
+            return closed
+
+        cur["high"] = max(cur["high"], price)
+        cur["low"] = min(cur["low"], price)
+        cur["close"] = price
+        cur["volume"] += volume
+        return None
+
+    def snapshot(self, limit=None, include_current=True):
+        current = [dict(self.current)] if include_current and self.current is not None else []
+        if limit:
+            # 최근 limit개만 뒤에서부터 복사 (틱마다 호출되는 limit=1 경로에서 전체 복사 방지)
+            need = max(limit - len(current), 0)
+            tail = [self.bars[-i] for i in range(min(need, len(self.bars)), 0, -1)]
+            return (tail + current)[-limit:]
+        return list(self.bars) + current
+
+# --- 종목별 레지스트리 ---
+
+_BUILDERS = {}  # { ("TSLA", "1m"): CandleBuilder }
+_LOCK = threading.Lock()
+
+# 봉 확정 이벤트 구독자: func(ticker, interval, bar)
+_LISTENERS = []
+
+def add_listener(func):
+    if func not in _LISTENERS:
+        _LISTENERS.append(func)
+
+def remove_listener(func):
+    if func in _LISTENERS:
+        _LISTENERS.remove(func)
+
+def on_tick(ticker, price, cum_volume, ts=None):
+    ts = ts if ts is not None else time.time()
+    closed = []
+    with _LOCK:
+        for name, sec in INTERVALS.items():
+            builder = _BUILDERS.get((ticker, name))
+            if builder is None:
+                builder = CandleBuilder(sec)
+                _BUILDERS[(ticker, name)] = builder
+            bar = builder.add_tick(ts, float(price), float(cum_volume))
+            if bar is not None:
+                closed.append((name, dict(bar)))
+
+    for name, bar in closed:
+        for listener in list(_LISTENERS):
+            try: listener(ticker, name, bar)
+            except Exception: pass
+
+def _on_state_update(ticker, data, prev):
+    # mervis_state 가격 갱신 리스너
+    on_tick(ticker, data["price"], data.get("volume", 0.0), data["updated_at"].timestamp())
+
+def attach():
+    # 웹소켓 수신 데이터로 봉 집계 시작 (중복 호출 무시)
+    mervis_state.add_listener(_on_state_update)
+
+def detach():
+    mervis_state.remove_listener(_on_state_update)
+
+def get_bars(ticker, interval="1m", limit=None, include_current=True):
+    """
+    분봉 리스트 (오래된 순), 없으면 빈 리스트
+    - include_current: 진행 중인 마지막 봉 포함 여부
+    """
+    with _LOCK:
+        builder = _BUILDERS.get((ticker, interval))
+        if builder is None: return []
+        return builder.snapshot(limit, include_current)
+
+def to_records(bars):
+    # KIS 차트 응답과 같은 형태 (최신 봉이 맨 앞, xymd + xhms) -> technical.prepare_data 입력용
+    records = []
+    for b in reversed(bars):
+        t = datetime.fromtimestamp(b["ts"], MARKET_TZ)
+        records.append({
+            "xymd": t.strftime("%Y%m%d"), "xhms": t.strftime("%H%M%S"),
+            "open": b["open"], "high": b["high"], "low": b["low"], "clos": b["close"], "tvol": b["volume"]
+        })
+    return records
+
+def get_bars_frame(ticker, interval="1m", limit=None):
+    """
+    [GUI 차트용] mplfinance 형식 DataFrame (Date 인덱스, Open/High/Low/Close/Volume), 봉이 없으면 None
+    """
+    bars = get_bars(ticker, interval, limit)
+    if not bars: return None
+    import pandas as pd
+    df = pd.DataFrame(bars)
+    df['Date'] = pd.to_datetime(df['ts'], unit='s', utc=True).dt.tz_convert(MARKET_TZ).dt.tz_localize(None)
+    df = df.rename(columns={'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'})
+    return df.set_index('Date')[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+def analyze_signals(ticker, interval="1m", active_strategies=[]):
+    """
+    [장중 분석] 분봉으로 technical.analyze_technical_signals 실행 (일봉 분석과 같은 반환 형태)
+    """
+    from modules import technical
+    bars = get_bars(ticker, interval)
+    if not bars: return {}, "데이터 부족", []
+    return technical.analyze_technical_signals(to_records(bars), active_strategies)
+
+# 모듈 로드 시 자동 구독 (kis_websocket이 import)
+attach()
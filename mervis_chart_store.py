@@ -0,0 +1,284 @@
+import os
+import threading
+import time
+import pandas as pd
+import kis_chart
+
+# [일봉 로컬 저장소]
+# 종목별 일봉(OHLCV)을 Parquet 파일로 보관하고, 최신 구간만 KIS에서 받아 병합
+# 과거 봉은 바뀌지 않으므로 분석/GUI/채점/크롤러가 같은 데이터를 반복 다운로드할 필요가 없음
+
+STORE_DIR = os.getenv("MERVIS_CHART_DIR", "chart_store")
+
+# 마지막 갱신 후 이 시간(초)이 지나지 않았으면 네트워크 호출 없이 로컬 데이터 사용
+REFRESH_TTL = int(os.getenv("MERVIS_CHART_TTL", "300"))
+
+# KIS 일봉 응답 필드 중 저장할 컬럼 (xymd 외에는 숫자형)
+NUMERIC_COLS = ['open', 'high', 'low', 'clos', 'diff', 'rate', 'tvol', 'tamt']
+COLUMNS = ['xymd'] + NUMERIC_COLS
+
+# 주/월/년봉을 일봉에서 직접 만들기 위해 확보할 최소 일봉 수 (약 13개월)
+RESAMPLE_MIN_BARS = 280
+
+# 기간별 봉 요약 시 필요한 최소 봉 수 (mervis_brain 프롬프트 기준)
+MIN_PERIOD_BARS = {"weekly": 8, "monthly": 12, "yearly": 12}
+
+# 메모리 캐시: { "TSLA": {"df": DataFrame(오름차순), "refreshed": 1767225600.0, "complete": False} }
+# complete: 과거 방향 수집이 상장일까지 도달했는지 여부 (<ticker>.complete 표시 파일로 프로세스 간 유지)
+_MEM = {}
+_MEM_LOCK = threading.Lock()
+_TICKER_LOCKS = {}
+
+_STATS = {"reads": 0, "network_fetches": 0, "backfill_fetches": 0, "api_fallbacks": 0}
+_STATS_LOCK = threading.Lock()
+
+def _count(key):
+    # 크롤러 스레드 여러 개가 동시에 갱신
+    with _STATS_LOCK:
+        _STATS[key] += 1
+
+def _ticker_lock(ticker):
+    with _MEM_LOCK:
+        lock = _TICKER_LOCKS.get(ticker)
+        if lock is None:
+            lock = threading.Lock()
+            _TICKER_LOCKS[ticker] = lock
+        return lock
+
+def _path(ticker):
+    return os.path.join(STORE_DIR, f"{ticker}.parquet")
+
+def _complete_path(ticker):
+    return os.path.join(STORE_DIR, f"{ticker}.complete")
+
+def _mark_complete(ticker):
+    # 과거 수집 완료 표시 (상장일 이전 데이터는 생기지 않으므로 한 번 기록하면 유지)
+    try:
+        os.makedirs(STORE_DIR, exist_ok=True)
+        open(_complete_path(ticker), "w").close()
+    except OSError as e:
+        print(f" [ChartStore] {ticker} 완료 표시 저장 실패: {e}")
+
+def _normalize(records):
+    # KIS output2(list of dict) -> 저장 포맷 DataFrame (날짜 오름차순)
+    if not records:
+        return pd.DataFrame(columns=COLUMNS)
+    df = pd.DataFrame(records)
+    if 'xymd' not in df.columns:
+        return pd.DataFrame(columns=COLUMNS)
+    if 'clos' not in df.columns and 'last' in df.columns:
+        df['clos'] = df['last']
+    if 'tvol' not in df.columns and 'acml_vol' in df.columns:
+        df['tvol'] = df['acml_vol']
+    for c in NUMERIC_COLS:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors='coerce')
+        else:
+            df[c] = 0.0
+    df['xymd'] = df['xymd'].astype(str)
+    df = df[df['xymd'].str.len() == 8]
+    return df[COLUMNS].drop_duplicates('xymd', keep='last').sort_values('xymd').reset_index(drop=True)
+
+def _merge(old_df, new_df):
+    # 같은 날짜는 새 데이터가 우선 (당일 봉은 장중에 계속 변함)
+    if old_df is None or old_df.empty: return new_df
+    if new_df is None or new_df.empty: return old_df
+    merged = pd.concat([old_df[~old_df['xymd'].isin(new_df['xymd'])], new_df], ignore_index=True)
+    return merged.sort_values('xymd').reset_index(drop=True)
+
+def _load_disk(ticker):
+    path = _path(ticker)
+    if not os.path.exists(path):
+        # 일봉 파일 없이 남은 완료 표시는 무효 (처음부터 다시 수집)
+        try: os.remove(_complete_path(ticker))
+        except OSError: pass
+        return None, 0.0
+    try:
+        return pd.read_parquet(path), os.path.getmtime(path)
+    except Exception as e:
+        print(f" [ChartStore] {ticker} 로컬 파일 손상, 재수집: {e}")
+        # 과거 구간도 다시 받아야 하므로 완료 표시 제거
+        try: os.remove(_complete_path(ticker))
+        except OSError: pass
+        return None, 0.0
+
+def _save_disk(ticker, df):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    path = _path(ticker)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f" [ChartStore] {ticker} 저장 실패: {e}")
+
+def _get_entry(ticker):
+    with _MEM_LOCK:
+        entry = _MEM.get(ticker)
+    if entry is None:
+        df, refreshed = _load_disk(ticker)
+        if df is not None:
+            entry = {"df": df, "refreshed": refreshed, "complete": os.path.exists(_complete_path(ticker))}
+            with _MEM_LOCK:
+                _MEM[ticker] = entry
+    return entry
+
+def merge(ticker, records):
+    """
+    외부에서 받은 KIS 일봉 응답을 저장소에 병합 (예: 비동기 크롤러)
+    """
+    new_df = _normalize(records)
+    with _ticker_lock(ticker):
+        entry = _get_entry(ticker)
+        merged = _merge(entry["df"] if entry else None, new_df)
+        _save_disk(ticker, merged)
+        with _MEM_LOCK:
+            _MEM[ticker] = {"df": merged, "refreshed": time.time(), "complete": entry.get("complete", False) if entry else False}
+    return merged
+
+def _refresh_locked(ticker, entry):
+    # 최신 구간(BYMD 미지정 = 오늘 기준 최근 봉)만 받아서 병합
+    _count("network_fetches")
+    records = kis_chart.get_daily_chart(ticker)
+    if not records:
+        return entry
+    merged = _merge(entry["df"] if entry else None, _normalize(records))
+    _save_disk(ticker, merged)
+    entry = {"df": merged, "refreshed": time.time(), "complete": entry.get("complete", False) if entry else False}
+    with _MEM_LOCK:
+        _MEM[ticker] = entry
+    return entry
+
+def _backfill_locked(ticker, entry, min_bars):
+    # 보유 데이터의 가장 오래된 날짜 이전 구간을 BYMD로 거슬러 올라가며 수집
+    df = entry["df"]
+    complete = entry.get("complete", False)
+    while len(df) < min_bars and not complete:
+        first = pd.to_datetime(df['xymd'].iloc[0], format='%Y%m%d') - pd.Timedelta(days=1)
+        _count("backfill_fetches")
+        records = kis_chart.get_daily_chart(ticker, bymd=first.strftime('%Y%m%d'))
+        if records is None:
+            break # 요청 실패 (다음 호출 때 재시도)
+        older = _normalize(records)
+        # 정상 응답인데 빈 목록([]) 또는 더 과거 봉이 없음 -> 상장일 도달
+        if older.empty or older['xymd'].iloc[0] >= df['xymd'].iloc[0]:
+            complete = True
+            break
+        df = _merge(df, older)
+    if len(df) != len(entry["df"]) or complete:
+        if len(df) != len(entry["df"]):
+            _save_disk(ticker, df)
+        if complete and not entry.get("complete"):
+            _mark_complete(ticker)
+        entry = {"df": df, "refreshed": entry["refreshed"], "complete": complete}
+        with _MEM_LOCK:
+            _MEM[ticker] = entry
+    return entry
+
+def get_daily_frame(ticker, min_bars=0, max_age=None):
+    """
+    일봉 DataFrame 반환 (xymd 오름차순, KIS 필드명 유지)
+    - max_age: 마지막 갱신 후 허용 경과 시간(초). 초과 시 최신 구간만 증분 조회
+    - min_bars: 보유 봉 수가 부족하면 과거 구간을 추가 수집
+    """
+    if max_age is None: max_age = REFRESH_TTL
+    _count("reads")
+
+    with _ticker_lock(ticker):
+        entry = _get_entry(ticker)
+        if entry is None or time.time() - entry["refreshed"] > max_age:
+            entry = _refresh_locked(ticker, entry)
+        if entry is None or entry["df"].empty:
+            return None
+        if min_bars and len(entry["df"]) < min_bars and not entry.get("complete"):
+            entry = _backfill_locked(ticker, entry, min_bars)
+        return entry["df"].copy()
+
+def read_daily_frame(ticker):
+    """
+    네트워크 호출 없이 로컬에 저장된 일봉만 반환 (없으면 None)
+    """
+    entry = _get_entry(ticker)
+    if entry is None or entry["df"].empty:
+        return None
+    return entry["df"].copy()
+
+def to_records(df, limit=None):
+    # 저장 포맷 -> KIS 응답과 같은 형태(list of dict, 최신 날짜가 맨 앞)
+    if df is None or df.empty: return None
+    out = df.iloc[::-1]
+    if limit: out = out.head(limit)
+    return out.to_dict('records')
+
+def get_daily_chart(ticker, min_bars=0, max_age=None, limit=None):
+    """
+    kis_chart.get_daily_chart 대체용 (같은 형태의 리스트 반환)
+    """
+    return to_records(get_daily_frame(ticker, min_bars=min_bars, max_age=max_age), limit=limit)
+
+def is_history_complete(ticker):
+    entry = _get_entry(ticker)
+    return bool(entry and entry.get("complete"))
+
+# --- 주/월/년봉 변환 ---
+
+_PERIOD_FREQ = {"weekly": "W-FRI", "monthly": "M"}
+
+def resample(df, period):
+    """
+    일봉 DataFrame(xymd 오름차순) -> 주봉/월봉 DataFrame (같은 컬럼 구성)
+    - xymd: 해당 기간의 마지막 거래일
+    - rate/diff: 직전 기간 종가 대비
+    """
+    if df is None or df.empty: return None
+    if period == "yearly":
+        # 기존 get_yearly_chart와 동일: 월봉 최근 12개
+        monthly = resample(df, "monthly")
+        return monthly.tail(12).reset_index(drop=True) if monthly is not None else None
+
+    dates = pd.to_datetime(df['xymd'], format='%Y%m%d')
+    key = dates.dt.to_period(_PERIOD_FREQ[period])
+    grouped = df.groupby(key, sort=True)
+    out = pd.DataFrame({
+        'xymd': grouped['xymd'].last(),
+        'open': grouped['open'].first(),
+        'high': grouped['high'].max(),
+        'low': grouped['low'].min(),
+        'clos': grouped['clos'].last(),
+        'tvol': grouped['tvol'].sum(),
+        'tamt': grouped['tamt'].sum()
+    }).reset_index(drop=True)
+    prev_close = out['clos'].shift(1)
+    out['diff'] = (out['clos'] - prev_close).round(4)
+    out['rate'] = (out['diff'] / prev_close * 100).round(2)
+    out[['diff', 'rate']] = out[['diff', 'rate']].fillna(0.0)
+    return out[COLUMNS]
+
+def get_period_charts(ticker):
+    """
+    [analyze_stock용] 일봉 1회(증분) 조회로 일/주/월/년봉 세트 생성
+    일봉 이력이 부족하고(수집 미완료) 변환 결과가 모자라면 해당 기간만 API로 조회
+    """
+    daily = get_daily_frame(ticker, min_bars=RESAMPLE_MIN_BARS)
+    if daily is None:
+        return None
+
+    charts = {"daily": to_records(daily)}
+    complete = len(daily) >= RESAMPLE_MIN_BARS or is_history_complete(ticker)
+    api_fallback = {
+        "weekly": kis_chart.get_weekly_chart,
+        "monthly": kis_chart.get_monthly_chart,
+        "yearly": kis_chart.get_yearly_chart
+    }
+    for period, fetch in api_fallback.items():
+        bars = resample(daily, period)
+        if not complete and (bars is None or len(bars) < MIN_PERIOD_BARS[period]):
+            _count("api_fallbacks")
+            charts[period] = fetch(ticker)
+        else:
+            charts[period] = to_records(bars)
+    return charts
+
+def get_stats():
+    with _STATS_LOCK:
+        return dict(_STATS)
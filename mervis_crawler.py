@@ -1,4 +1,6 @@
+import sys
 import time
+import asyncio
 import logging
 import concurrent.futures
 from datetime import datetime
@@ -6,8 +8,10 @@ from google.cloud import bigquery
 
 # 사용자 모듈 임포트
 import mervis_bigquery
-import kis_chart
-from modules import technical, fundamental, supply
+import mervis_chart_store
+import kis_client
+import kis_exchange
+from modules import technical_batch, fundamental, supply, yf_provider
 
 # 로깅 설정
 logging.basicConfig(
@@ -20,6 +24,12 @@ logging.basicConfig(
 # --- 설정 ---
 MAX_WORKERS = 10
 BATCH_SIZE = 50   
+FEATURE_FLUSH_SIZE = 1000  # daily_features 일괄 저장(Load Job + MERGE) 단위
+
+# [비동기 모드] 작업자 수(동시 차트 요청 수) / yfinance(동기) 동시 실행 수 / 단계별 제한 시간(대기 시간 제외)
+ASYNC_CONCURRENCY = 50
+ASYNC_YF_WORKERS = 10
+TICKER_TIMEOUT = 30
 
 def get_all_tickers():
     client = mervis_bigquery.get_client()
@@ -37,9 +47,19 @@ def process_single_stock(ticker):
     개별 종목 분석 (스마트 스킵 적용)
     """
     try:
-        # 1. 차트 데이터 (KIS)
-        d_data = kis_chart.get_daily_chart(ticker)
-        
+        # 1. 차트 데이터 (KIS -> 로컬 저장소에 병합, 다음 날 분석에서 재사용)
+        d_data = mervis_chart_store.get_daily_chart(ticker)
+        return analyze_chart_data(ticker, d_data)
+    except Exception as e:
+        return None
+
+def analyze_chart_data(ticker, d_data):
+    """
+    차트 수신 이후 단계 (스마트 스킵 -> 수급/펀더멘털 분석)
+    스레드 모드와 비동기 모드가 공유
+    (기술적 지표는 저장 직전 배치 단위로 technical_batch에서 일괄 계산)
+    """
+    try:
         # [데이터 부족 컷]
         if not d_data or len(d_data) < 20:
             return None 
@@ -57,18 +77,15 @@ def process_single_stock(ticker):
         if vol < 50000:
             return None
 
-        # 3. 기술적 분석
-        tech_data, _, _ = technical.analyze_technical_signals(d_data, [])
-
-        # 4. 수급/펀더멘털 분석
+        # 3. 수급/펀더멘털 분석
         supply_data, _, _ = supply.analyze_supply_structure(ticker)
         fund_data, _, _ = fundamental.analyze_fundamentals(ticker)
 
-        # 5. 결과 패키징 (Price 추가됨)
+        # 4. 결과 패키징 (Price 추가됨)
         return {
             "ticker": ticker,
             "price": price,
-            "tech": tech_data,
+            "chart": d_data,
             "fund": fund_data,
             "supply": supply_data
         }
@@ -76,18 +93,27 @@ def process_single_stock(ticker):
     except Exception as e:
         return None
 
-def save_batch_features(batch_results):
-    """결과 묶음 DB 저장"""
+def save_batch_features(batch_results, sink):
+    """결과 묶음 기술적 지표 일괄 계산 후 저장 버퍼(DailyFeatureSink)에 적재"""
     if not batch_results: return
+    features = technical_batch.compute_features({item['ticker']: item['chart'] for item in batch_results})
+    missing = 0
     for item in batch_results:
-        # mervis_bigquery.save_daily_features 함수도 price를 받도록 수정되어야 함
-        mervis_bigquery.save_daily_features(
+        if item['ticker'] in features.index:
+            item['tech'] = technical_batch.to_tech_data(features.loc[item['ticker']])
+        else:
+            # 지표 계산 제외 종목(봉 부족 등)도 기존처럼 기본값으로 저장
+            item['tech'] = {}
+            missing += 1
+        sink.add(
             item['ticker'], 
             item['price'],
             item['tech'], 
             item['fund'], 
             item['supply']
         )
+    if missing:
+        logging.info(f"[Crawler] 기술적 지표 미산출 {missing}/{len(batch_results)}개 (기본값으로 저장)")
 
 def run_fast_crawler():
     start_time = time.time()
@@ -97,16 +123,17 @@ def run_fast_crawler():
     tickers = get_all_tickers()
     if not tickers: return
 
-    
-    # 스레드 풀 시작 전에, 첫 번째 종목으로 API를 1회 동기적으로 호출
-    # 메인 스레드에서 토큰이 안전하게 생성/갱신되어 파일로 저장
-    print(" [Init] 토큰 유효성 검사 및 사전 발급 진행 중...")
-    try:
-        kis_chart.get_daily_chart(tickers[0])
-        print(" [Init] 토큰 준비 완료. 크롤링을 시작합니다.")
-    except Exception as e:
-        print(f" [Error] 토큰 초기화 실패: {e}")
-        return
+    # 워커 수만큼 Keep-Alive 커넥션을 유지하도록 풀 크기 조정
+    kis_client.configure_pool(MAX_WORKERS)
+
+    # ticker_universe의 거래소 정보로 캐시 시드 (NAS -> NYS -> AMS 헛호출 방지)
+    seeded = kis_exchange.seed(mervis_bigquery.get_ticker_exchanges())
+    if seeded:
+        print(f" [Init] 거래소 코드 캐시 시드: {seeded}개")
+
+    # 현재가는 yf.download 다중 종목 조회로 일괄 선조회 (종목별 fast_info 호출 생략)
+    priced = yf_provider.prefetch_prices(tickers)
+    print(f" [Init] yfinance 일괄 시세 선조회: {priced}개")
 
     total = len(tickers)
     print(f" [Crawler] 총 {total}개 후보군 스캔 시작...")
@@ -114,6 +141,7 @@ def run_fast_crawler():
     processed_count = 0
     saved_count = 0
     success_buffer = [] 
+    sink = mervis_bigquery.DailyFeatureSink(flush_size=FEATURE_FLUSH_SIZE)
 
     try:
         with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
@@ -133,7 +161,7 @@ def run_fast_crawler():
                     print(f" Progress: {processed_count}/{total} (Saved: {saved_count})", end='\r')
 
                     if len(success_buffer) >= BATCH_SIZE:
-                        save_batch_features(success_buffer)
+                        save_batch_features(success_buffer, sink)
                         success_buffer = [] 
                         
                 except Exception:
@@ -141,16 +169,138 @@ def run_fast_crawler():
     
     except KeyboardInterrupt:
         print("\n\n [Stop] 사용자 요청으로 크롤링을 중단합니다...")
+        sink.flush() # 이미 완료된 배치는 저장
         print(" [Info] 대기 중인 작업을 취소하고 종료합니다.")
         return
 
     # 남은 데이터 저장 (강제 종료가 아닐 때만)
     if success_buffer:
-        save_batch_features(success_buffer)
+        save_batch_features(success_buffer, sink)
+    sink.flush()
 
     end_time = time.time()
     duration = (end_time - start_time) / 60
     print(f"\n [Crawler] 완료! 소요 시간: {duration:.1f}분 | 총 저장된 유의미한 종목: {saved_count}개")
+    kis_exchange.flush()
+    kis_exchange.print_stats()
+    kis_client.print_stats()
+    yf_provider.print_stats()
+
+def _merge_and_analyze(ticker, d_data):
+    # 로컬 일봉 저장소에도 반영하여 분석/GUI가 재사용
+    merged = mervis_chart_store.merge(ticker, d_data)
+    return analyze_chart_data(ticker, mervis_chart_store.to_records(merged))
+
+async def _process_single_stock_async(client, ticker, headers, yf_sem, yf_executor):
+    """
+    제한 시간은 실제 작업 구간에만 적용 (작업자/스레드 풀 대기 시간은 제외)
+    """
+    loop = asyncio.get_running_loop()
+    d_data = await asyncio.wait_for(client.fetch_daily_chart(ticker, headers=headers), timeout=TICKER_TIMEOUT)
+    if not d_data or len(d_data) < 20:
+        return None
+    # yfinance는 동기 라이브러리이므로 제한된 스레드 풀에서 실행 (풀 크기만큼만 투입해 대기열 없이 시작)
+    async with yf_sem:
+        return await asyncio.wait_for(
+            loop.run_in_executor(yf_executor, _merge_and_analyze, ticker, d_data),
+            timeout=TICKER_TIMEOUT
+        )
+
+async def _crawl_async(tickers, on_progress):
+    import kis_async
+
+    loop = asyncio.get_running_loop()
+    # 토큰/헤더는 시작 전에 한 번만 준비 (토큰 발급은 동기 HTTP라 이벤트 루프 밖에서 실행)
+    headers = await loop.run_in_executor(None, kis_client.make_headers, kis_async.CHART_TR_ID)
+    if not headers:
+        print(" [Crawler] 토큰 발급 실패로 크롤링을 중단합니다.")
+        return
+
+    queue = asyncio.Queue()
+    for t in tickers:
+        queue.put_nowait(t)
+
+    yf_sem = asyncio.Semaphore(ASYNC_YF_WORKERS)
+    yf_executor = concurrent.futures.ThreadPoolExecutor(max_workers=ASYNC_YF_WORKERS)
+
+    async def worker(client):
+        # 동시 차트 요청 수 = 작업자 수 (종목을 하나씩 꺼내 처리)
+        while True:
+            try:
+                ticker = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                result = await _process_single_stock_async(client, ticker, headers, yf_sem, yf_executor)
+            except asyncio.TimeoutError:
+                logging.warning(f"[Async Crawler] {ticker} timeout ({TICKER_TIMEOUT}s)")
+                result = None
+            except Exception as e:
+                logging.warning(f"[Async Crawler] {ticker} error: {e}")
+                result = None
+            on_progress(result)
+
+    try:
+        async with kis_async.AsyncKISClient(max_connections=ASYNC_CONCURRENCY) as client:
+            workers = [asyncio.create_task(worker(client)) for _ in range(min(ASYNC_CONCURRENCY, len(tickers)))]
+            await asyncio.gather(*workers)
+    finally:
+        yf_executor.shutdown(wait=False, cancel_futures=True)
+
+def run_async_crawler():
+    """
+    [asyncio 모드] 차트 요청을 이벤트 루프에서 동시 처리
+    (동시성은 작업자 수, 초당 호출 수는 전역 Token Bucket이 제한)
+    """
+    start_time = time.time()
+    print(f" [Crawler] 비동기 모드 시작 (Concurrency: {ASYNC_CONCURRENCY}, YF Workers: {ASYNC_YF_WORKERS})")
+
+    tickers = get_all_tickers()
+    if not tickers: return
+
+    seeded = kis_exchange.seed(mervis_bigquery.get_ticker_exchanges())
+    if seeded:
+        print(f" [Init] 거래소 코드 캐시 시드: {seeded}개")
+
+    # 현재가는 yf.download 다중 종목 조회로 일괄 선조회 (종목별 fast_info 호출 생략)
+    priced = yf_provider.prefetch_prices(tickers)
+    print(f" [Init] yfinance 일괄 시세 선조회: {priced}개")
+
+    total = len(tickers)
+    print(f" [Crawler] 총 {total}개 후보군 스캔 시작...")
+
+    state = {"processed": 0, "saved": 0, "buffer": []}
+    sink = mervis_bigquery.DailyFeatureSink(flush_size=FEATURE_FLUSH_SIZE)
+
+    def on_progress(result):
+        state["processed"] += 1
+        if result:
+            state["buffer"].append(result)
+            state["saved"] += 1
+        print(f" Progress: {state['processed']}/{total} (Saved: {state['saved']})", end='\r')
+        if len(state["buffer"]) >= BATCH_SIZE:
+            save_batch_features(state["buffer"], sink)
+            state["buffer"] = []
+
+    try:
+        asyncio.run(_crawl_async(tickers, on_progress))
+    except KeyboardInterrupt:
+        print("\n\n [Stop] 사용자 요청으로 크롤링을 중단합니다...")
+        sink.flush() # 이미 완료된 배치는 저장
+        return
+
+    if state["buffer"]:
+        save_batch_features(state["buffer"], sink)
+    sink.flush()
+
+    duration = (time.time() - start_time) / 60
+    print(f"\n [Crawler] 완료! 소요 시간: {duration:.1f}분 | 총 저장된 유의미한 종목: {state['saved']}개")
+    kis_exchange.flush()
+    kis_exchange.print_stats()
+    yf_provider.print_stats()
 
 if __name__ == "__main__":
-    run_fast_crawler()
\ No newline at end of file
+    if "--async" in sys.argv:
+        run_async_crawler()
+    else:
+        run_fast_crawler()
\ No newline at end of file
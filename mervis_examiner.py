@@ -1,6 +1,12 @@
 import mervis_bigquery
-import kis_chart
+import mervis_chart_store
 import datetime
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import mervis_state
 from google import genai
 import os
@@ -12,6 +18,16 @@ client = genai.Client(api_key=api_key)
 # 1일 1회 실행 제한을 위한 타임스탬프 파일 설정
 TIMESTAMP_FILE = ".examiner_last_run"
 
+# [오답노트 생성 설정]
+FEEDBACK_WORKERS = int(os.getenv("MERVIS_FEEDBACK_WORKERS", "4"))        # 동시 LLM 호출 수
+FEEDBACK_RETRIES = int(os.getenv("MERVIS_FEEDBACK_RETRIES", "3"))        # 항목당 재시도 횟수
+FEEDBACK_BACKOFF = 2.0                                                    # 재시도 기본 대기(초), 지수 증가 + 지터
+FEEDBACK_TOKEN_BUDGET = int(os.getenv("MERVIS_FEEDBACK_TOKEN_BUDGET", "200000"))  # 일일 토큰 한도
+TOKEN_USAGE_FILE = ".examiner_token_usage"
+
+# 응답 메타데이터가 없을 때 쓰는 추정치 (문자 4개 ~= 1토큰, 짧은 한 문장 응답)
+EST_OUTPUT_TOKENS = 100
+
 def check_if_already_run():
     """오늘 이미 채점을 수행했는지 확인"""
     today_str = datetime.datetime.now().strftime("%Y-%m-%d")
@@ -35,16 +51,8 @@ def mark_as_run():
             f.write(today_str)
     except: pass
 
-def generate_feedback(item):
-    """
-    [AI] 매매 결과에 대한 원인 분석 및 교훈 도출
-    """
-    try:
-        # PENDING은 분석 대상 아님
-        if item['result'] not in ['WIN', 'LOSE']:
-            return None
-
-        prompt = f"""
+def _feedback_prompt(item):
+    return f"""
         You are a strict trading coach. Analyze the following trade result.
         
         [Trade Info]
@@ -52,7 +60,7 @@ def generate_feedback(item):
         - Action: {item['action']}
         - Entry Price: ${item['entry_price']}
         - Result: {item['result']} (WIN = Success, LOSE = Failed)
-        - Original Analysis Summary: {item['report'][:500]}...
+        - Original Analysis Summary: {(item['report'] or '')[:500]}...
         
         [Task]
         Write a very short, brutal "Lesson Learned" (One sentence, Korean).
@@ -62,14 +70,171 @@ def generate_feedback(item):
         Output example:
         "하락장에서는 과매도 시그널도 무시하고 관망했어야 함."
         """
-        
-        response = client.models.generate_content(
-            model='gemini-2.0-flash', 
-            contents=prompt
-        )
-        return response.text.strip()
-    except Exception as e:
-        return f"피드백 생성 실패: {e}"
+
+def _estimate_tokens(prompt):
+    return len(prompt) // 4 + EST_OUTPUT_TOKENS
+
+class TokenBudget:
+    """
+    일일 토큰 사용량 관리 (파일에 날짜별로 누적, 스레드 안전)
+    호출 전 추정치를 예약하고 응답 후 실제 사용량으로 정산
+    """
+    def __init__(self, limit=FEEDBACK_TOKEN_BUDGET, path=TOKEN_USAGE_FILE):
+        self.limit = limit
+        self.path = path
+        self.lock = threading.Lock()
+        self.today = datetime.datetime.now().strftime("%Y-%m-%d")
+        self.used = 0
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("date") == self.today:
+                self.used = int(data.get("tokens", 0))
+        except: pass
+
+    def reserve(self, tokens):
+        with self.lock:
+            if self.used + tokens > self.limit:
+                return False
+            self.used += tokens
+            return True
+
+    def settle(self, reserved, actual):
+        with self.lock:
+            self.used += actual - reserved
+            self._save()
+
+    def _save(self):
+        try:
+            with open(self.path, "w") as f:
+                json.dump({"date": self.today, "tokens": self.used}, f)
+        except: pass
+
+    def remaining(self):
+        with self.lock:
+            return max(self.limit - self.used, 0)
+
+def generate_feedback(item, budget=None):
+    """
+    [AI] 매매 결과에 대한 원인 분석 및 교훈 도출
+    - 실패 시 지수 백오프 + 지터로 재시도, 최종 실패/예산 초과 시 None (다음 실행 때 다시 대상이 됨)
+    """
+    # PENDING은 분석 대상 아님
+    if item['result'] not in ['WIN', 'LOSE']:
+        return None
+
+    prompt = _feedback_prompt(item)
+    estimate = _estimate_tokens(prompt)
+    if budget and not budget.reserve(estimate):
+        return None
+
+    used = 0
+    for attempt in range(FEEDBACK_RETRIES + 1):
+        try:
+            response = client.models.generate_content(
+                model='gemini-2.0-flash', 
+                contents=prompt
+            )
+            usage = getattr(response, "usage_metadata", None)
+            used += getattr(usage, "total_token_count", None) or estimate
+            text = (response.text or "").strip()
+            if text:
+                if budget: budget.settle(estimate, used)
+                return text
+        except Exception as e:
+            used += estimate - EST_OUTPUT_TOKENS
+            if attempt == FEEDBACK_RETRIES:
+                print(f" [Review] {item['ticker']} 피드백 생성 실패: {e}")
+        if attempt < FEEDBACK_RETRIES:
+            # 동시 작업자가 같은 시점에 재시도하지 않도록 지터 추가
+            time.sleep(FEEDBACK_BACKOFF * (2 ** attempt) + random.uniform(0, FEEDBACK_BACKOFF))
+
+    if budget: budget.settle(estimate, used)
+    return None
+
+def run_feedback_stage(review_list):
+    """
+    [오답노트] 피드백 대상 전체를 FEEDBACK_WORKERS개 동시 작업으로 생성 후 MERGE 1회로 저장
+    일일 토큰 예산을 넘으면 남은 항목은 다음 실행으로 이월
+    반환: (저장 건수, 실패/이월 건수)
+    """
+    budget = TokenBudget()
+    print(f" -> 대상 {len(review_list)}건 (동시 {FEEDBACK_WORKERS}개, 남은 토큰 예산 {budget.remaining():,})")
+
+    done = []
+    skipped = 0
+    with ThreadPoolExecutor(max_workers=FEEDBACK_WORKERS, thread_name_prefix="examiner-feedback") as pool:
+        futures = {pool.submit(generate_feedback, item, budget): item for item in review_list}
+        for future in as_completed(futures):
+            item = futures[future]
+            try: feedback = future.result()
+            except Exception: feedback = None
+            if feedback:
+                print(f" -> [{item['ticker']}] ({item['result']}) 교훈: {feedback}")
+                done.append({"ticker": item['ticker'], "log_date": item['date'], "feedback": feedback})
+            else:
+                skipped += 1
+
+    if done and not mervis_bigquery.update_trade_feedbacks(done):
+        # 반영 실패분은 피드백이 비어 있는 상태라 다음 실행에서 다시 작성됨
+        skipped += len(done)
+        done = []
+    if budget.remaining() == 0 or skipped:
+        print(f" -> 미완료 {skipped}건은 다음 실행으로 이월 (토큰 사용량 {budget.used:,}/{budget.limit:,})")
+    return len(done), skipped
+
+def _first_touch(mask):
+    # 행별 첫 True 위치 (없으면 열 개수)
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), mask.shape[1])
+
+def grade_trades(frame, trades, today):
+    """
+    [채점] 한 종목의 대기 매매들을 일봉 고가/저가 배열로 한 번에 판정
+    - frame: mervis_chart_store 일봉 DataFrame (xymd 오름차순)
+    - 진입일 이후 봉 중 손절/목표가를 먼저 건드린 쪽으로 판정 (같은 봉이면 손절 우선)
+    - HOLD/WAIT: 진입가 +5% 도달 시 LOSE(기회 놓침), 3일 경과 후 미도달이면 WIN
+    반환: trades와 같은 순서의 결과 리스트 (WIN/LOSE/PENDING)
+    """
+    dates = frame['xymd'].astype(int).to_numpy()
+    highs = frame['high'].to_numpy(dtype=float)
+    lows = frame['low'].to_numpy(dtype=float)
+    n_bars = len(dates)
+
+    actions = np.array([t['action'] for t in trades])
+    entry = np.array([float(t['entry_price']) for t in trades])
+    target = np.array([float(t['target']) for t in trades])
+    cut = np.array([float(t['cut']) for t in trades])
+    starts = np.searchsorted(dates, [int(t['date'].strftime("%Y%m%d")) for t in trades], side='left')
+
+    is_buy = actions == "BUY"
+    is_sell = actions == "SELL"
+    is_hold = np.isin(actions, ["HOLD", "WAIT"])
+
+    # 고가 기준 돌파선 / 저가 기준 이탈선 (해당 없으면 절대 닿지 않는 값)
+    up_level = np.where(is_buy, target, np.where(is_sell, cut, entry * 1.05))
+    down_level = np.where(is_buy, cut, np.where(is_sell, target, -np.inf))
+    up_level = np.where(is_buy | is_sell | is_hold, up_level, np.inf)
+
+    # [매매 수, 봉 수] 행렬: 진입일 이전 봉은 제외
+    valid = np.arange(n_bars)[None, :] >= starts[:, None]
+    first_up = _first_touch(valid & (highs[None, :] >= up_level[:, None]))
+    first_down = _first_touch(valid & (lows[None, :] <= down_level[:, None]))
+
+    # BUY: 저가 이탈 = 손절 / SELL, HOLD: 고가 돌파 = 손실(기회 놓침)
+    lose_at = np.where(is_buy, first_down, first_up)
+    win_at = np.where(is_buy, first_up, np.where(is_sell, first_down, n_bars))
+
+    results = []
+    for i, t in enumerate(trades):
+        if lose_at[i] < n_bars and lose_at[i] <= win_at[i]:
+            results.append("LOSE")
+        elif win_at[i] < n_bars:
+            results.append("WIN")
+        elif is_hold[i] and (today - t['date'].date()).days >= 3:
+            results.append("WIN") # 방어 성공
+        else:
+            results.append("PENDING")
+    return results
 
 def run_examination():
     """
@@ -100,84 +265,36 @@ def run_examination():
     else:
         print(f" [Grading] 총 {len(pending_list)}건의 검증 대기 항목 채점 시작...")
         
-        count_win = 0
-        count_lose = 0
-        count_pending = 0
+        # 종목별로 묶어서 차트는 종목당 1회만 조회
+        by_ticker = {}
+        for item in pending_list:
+            by_ticker.setdefault(item['ticker'], []).append(item)
+
         today = datetime.datetime.now().date()
+        graded = []
+        count_pending = 0
 
-        for item in pending_list:
-            ticker = item['ticker']
-            action = item['action']
-            entry_price = item['entry_price']
-            target = item['target']
-            cut = item['cut']
-            entry_date = item['date'] 
-            
-            start_date_str = entry_date.strftime("%Y%m%d")
-            daily_chart = kis_chart.get_daily_chart(ticker)
-            
-            if not daily_chart:
-                print(f" -> [Skip] {ticker}: 차트 데이터 조회 실패")
+        for ticker, trades in by_ticker.items():
+            frame = mervis_chart_store.get_daily_frame(ticker)
+            if frame is None or frame.empty:
+                print(f" -> [Skip] {ticker}: 차트 데이터 조회 실패 ({len(trades)}건)")
                 continue
-                
-            future_candles = []
-            for candle in daily_chart:
-                if candle['xymd'] >= start_date_str:
-                    future_candles.append(candle)
-            future_candles.sort(key=lambda x: x['xymd'])
-            
-            result = "PENDING"
-            
-            # 1. 매수 (BUY) 채점
-            if action == "BUY":
-                for candle in future_candles:
-                    h, l = float(candle['high']), float(candle['low'])
-                    if l <= cut:
-                        result = "LOSE"
-                        break 
-                    elif h >= target:
-                        result = "WIN"
-                        break 
-
-            # 2. 매도 (SELL) 채점
-            elif action == "SELL":
-                for candle in future_candles:
-                    h, l = float(candle['high']), float(candle['low'])
-                    if h >= cut:
-                        result = "LOSE"
-                        break
-                    elif l <= target:
-                        result = "WIN"
-                        break
-
-            # 3. 관망 (HOLD/WAIT) 채점
-            elif action in ["HOLD", "WAIT"]:
-                opportunity_threshold = entry_price * 1.05
-                days_passed = (today - entry_date.date()).days
-                
-                has_risen = False
-                for candle in future_candles:
-                    if float(candle['high']) >= opportunity_threshold:
-                        result = "LOSE" # 기회 놓침
-                        has_risen = True
-                        break
-                
-                if not has_risen:
-                    if days_passed >= 3:
-                        result = "WIN" # 방어 성공
-                    else:
-                        result = "PENDING"
-
-            if result != "PENDING":
-                print(f" -> [결과확정] {ticker} ({action}): {result}")
-                mervis_bigquery.update_trade_result(ticker, entry_date, result)
-                
-                if result == "WIN": count_win += 1
-                else: count_lose += 1
-            else:
-                count_pending += 1
 
-        print(f" [Grading 완료] WIN: {count_win} | LOSE: {count_lose} | PENDING: {count_pending}")
+            results = grade_trades(frame, trades, today)
+            for item, result in zip(trades, results):
+                if result != "PENDING":
+                    print(f" -> [결과확정] {ticker} ({item['action']}): {result}")
+                    graded.append({"ticker": ticker, "log_date": item['date'], "result_status": result})
+                else:
+                    count_pending += 1
+
+        # 채점 결과는 MERGE 1회로 일괄 반영 (실패 시 PENDING 그대로 남아 다음 실행에서 재채점)
+        if graded and not mervis_bigquery.update_trade_results(graded):
+            print(f" [Grading 실패] 채점 결과 {len(graded)}건 반영 실패 (다음 실행에서 재시도) | PENDING: {count_pending}")
+        else:
+            count_win = sum(1 for g in graded if g['result_status'] == "WIN")
+            count_lose = len(graded) - count_win
+            print(f" [Grading 완료] WIN: {count_win} | LOSE: {count_lose} | PENDING: {count_pending}")
 
     # ---------------------------------------------------------
     # Phase 2: 오답노트 작성 (Feedback Loop)
@@ -191,14 +308,8 @@ def run_examination():
     if not review_list:
         print(" -> 작성할 오답노트가 없습니다.")
     else:
-        for item in review_list:
-            print(f" -> [{item['ticker']}] ({item['result']}) 원인 분석 중...", end="")
-            feedback = generate_feedback(item)
-            if feedback:
-                mervis_bigquery.update_trade_feedback(item['ticker'], item['date'], feedback)
-                print(f" 완료.\n    교훈: {feedback}")
-            else:
-                print(" 실패.")
+        saved, skipped = run_feedback_stage(review_list)
+        print(f" [Review 완료] 저장: {saved} | 이월: {skipped}")
     
     # 실행 완료 기록
     mark_as_run()
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+# [로컬 수익률 예측 모델]
+# mervis_trainer가 BigQuery ML 모델과 같은 피처/하이퍼파라미터로 학습한 Gradient Boosting 모델을 파일로 저장하고
+# 앱은 시작 시 이를 읽어 프로세스 안에서 바로 예측 (ML.PREDICT 왕복 제거)
+# 파일이 없거나 오래되었거나 BQ 모델과 성능 차이가 크면 사용하지 않음 -> BigQuery 예측으로 대체
+
+MODEL_PATH = os.getenv("MERVIS_MODEL_PATH", os.path.join("models", "return_forecast.joblib"))
+
+# 학습 후 이 시간(초)이 지나면 오래된 모델로 간주 (일일 재학습 1회 누락까지 허용)
+MODEL_MAX_AGE = int(os.getenv("MERVIS_MODEL_MAX_AGE", str(48 * 3600)))
+
+# daily_features 학습 피처 (mervis_trainer의 CREATE MODEL 쿼리와 동일한 순서)
+FEATURES = ['rsi', 'vwap_ratio', 'ma20_ratio', 'vol_ratio', 'forward_pe', 'target_upside', 'inst_pct', 'short_ratio']
+LABEL = 'next_day_return'
+
+# BQML BOOSTED_TREE_REGRESSOR 설정과 맞춘 하이퍼파라미터
+# (max_iterations=50, learn_rate=0.3, 기본 max_tree_depth=6, l2_reg=1.0)
+PARAMS = {"max_iter": 50, "learning_rate": 0.3, "max_depth": 6, "l2_regularization": 1.0}
+
+# ML.EVALUATE 대비 허용 MAE 차이 (상대값)
+PARITY_TOLERANCE = 0.15
+
+_artifact = None
+_loaded_mtime = None
+_lock = threading.Lock()
+
+# --- 학습/저장 (mervis_trainer에서 사용) ---
+
+def train(df, bq_metrics=None, test_size=0.2, seed=42):
+    """
+    DataFrame(FEATURES + LABEL) -> 모델 학습 및 홀드아웃 평가
+    - bq_metrics: ML.EVALUATE 결과 dict (mean_absolute_error 등), 있으면 정합성 판정
+    - 반환: 저장용 artifact dict
+    """
+    import numpy as np
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    df = df.dropna(subset=[LABEL])
+    X = df[FEATURES].astype(float).to_numpy()
+    y = df[LABEL].astype(float).to_numpy()
+
+    # 평가용 홀드아웃 (BQML AUTO_SPLIT과 같은 20% 랜덤 분할)
+    rng = np.random.default_rng(seed)
+    mask = rng.random(len(y)) < test_size
+    if mask.sum() == 0 or (~mask).sum() == 0:
+        mask = np.zeros(len(y), dtype=bool)
+
+    model = HistGradientBoostingRegressor(random_state=seed, **PARAMS)
+    model.fit(X[~mask], y[~mask])
+
+    metrics = {}
+    if mask.any():
+        pred = model.predict(X[mask])
+        metrics = {
+            "mean_absolute_error": float(mean_absolute_error(y[mask], pred)),
+            "mean_squared_error": float(mean_squared_error(y[mask], pred)),
+            "r2_score": float(r2_score(y[mask], pred))
+        }
+
+    # 평가가 끝나면 전체 데이터로 재학습하여 배포
+    model.fit(X, y)
+
+    parity_ok, parity_gap = check_parity(metrics, bq_metrics)
+    return {
+        "model": model,
+        "features": list(FEATURES),
+        "trained_at": time.time(),
+        "rows": int(len(y)),
+        "metrics": metrics,
+        "bq_metrics": bq_metrics or {},
+        "parity_ok": parity_ok,
+        "parity_gap": parity_gap
+    }
+
+def check_parity(local_metrics, bq_metrics):
+    """
+    로컬 홀드아웃 MAE vs ML.EVALUATE MAE 비교
+    반환: (통과 여부, 상대 차이) - BQ 지표가 없으면 판정 불가로 실패 처리
+    """
+    local_mae = (local_metrics or {}).get("mean_absolute_error")
+    bq_mae = (bq_metrics or {}).get("mean_absolute_error")
+    if local_mae is None or not bq_mae:
+        return False, None
+    gap = (local_mae - bq_mae) / bq_mae
+    # 로컬 모델이 더 정확한 경우(gap < 0)는 허용
+    return gap <= PARITY_TOLERANCE, round(gap, 4)
+
+def save(artifact, path=None):
+    import joblib
+
+    path = path or MODEL_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    joblib.dump(artifact, tmp)
+    os.replace(tmp, path)
+    return path
+
+# --- 로드/예측 (앱 런타임) ---
+
+def load(force=False):
+    """
+    모델 파일 로드 (파일이 바뀌었을 때만 다시 읽음), 실패 시 None
+    """
+    global _artifact, _loaded_mtime
+    if not os.path.exists(MODEL_PATH):
+        return None
+    try:
+        mtime = os.path.getmtime(MODEL_PATH)
+    except OSError:
+        return None
+    if not force and _artifact is not None and mtime == _loaded_mtime:
+        return _artifact
+
+    with _lock:
+        if not force and _artifact is not None and mtime == _loaded_mtime:
+            return _artifact
+        try:
+            import joblib
+            artifact = joblib.load(MODEL_PATH)
+        except Exception as e:
+            print(f" [LocalModel] 모델 로드 실패 (BigQuery 예측 사용): {e}")
+            return None
+        _artifact, _loaded_mtime = artifact, mtime
+        trained = datetime.fromtimestamp(artifact.get("trained_at", 0)).strftime('%Y-%m-%d %H:%M')
+        print(f" [LocalModel] 로드 완료 (학습: {trained}, {artifact.get('rows', 0)}행, 정합성: {'OK' if artifact.get('parity_ok') else 'FAIL'})")
+        return _artifact
+
+def is_available():
+    # 사용 가능 조건: 파일 존재 + 정합성 통과 + 학습 후 MODEL_MAX_AGE 이내
+    artifact = load()
+    if not artifact or not artifact.get("parity_ok"):
+        return False
+    return time.time() - artifact.get("trained_at", 0) <= MODEL_MAX_AGE
+
+def predict_rows(rows):
+    """
+    피처 dict 리스트 -> 예측 수익률 리스트 (사용 불가 시 None)
+    """
+    if not rows or not is_available():
+        return None
+    import numpy as np
+
+    artifact = _artifact
+    cols = artifact["features"]
+    X = np.array([[_to_float(r.get(c)) for c in cols] for r in rows], dtype=float)
+    return [float(p) for p in artifact["model"].predict(X)]
+
+def predict(row):
+    """
+    피처 dict 1건 -> get_prediction과 같은 형태의 dict (사용 불가 시 None)
+    """
+    preds = predict_rows([row])
+    if not preds: return None
+    pred = preds[0]
+    return {"predicted_return": pred, "return_min": pred, "return_max": pred}
+
+def _to_float(value):
+    # 결측은 NaN으로 전달 (HistGradientBoosting이 직접 처리)
+    try:
+        return float(value) if value is not None else float("nan")
+    except (TypeError, ValueError):
+        return float("nan")
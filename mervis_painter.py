@@ -5,9 +5,14 @@ import os
 import glob
 import datetime
 import time
+import threading
 import numpy as np
 
 CHART_DIR = "charts"
+
+# pyplot 전역 상태는 스레드 안전하지 않으므로 렌더링은 한 번에 하나씩
+# (mervis_brain이 LLM 호출과 동시에 백그라운드에서 차트를 그림)
+_PLOT_LOCK = threading.Lock()
 if not os.path.exists(CHART_DIR):
     os.makedirs(CHART_DIR)
 
@@ -155,18 +160,19 @@ def draw_chart(ticker, daily_data, highlight_indicators=[]):
         reasons = ", ".join(highlight_indicators) if highlight_indicators else "General"
         title_text = f"{ticker} Analysis\nKey Factors: {reasons}"
         
-        mpf.plot(
-            df, 
-            type='candle', 
-            style=s, 
-            addplot=add_plots,
-            volume=True, 
-            panel_ratios=ratios,
-            title=title_text,
-            savefig=dict(fname=filepath, dpi=100, bbox_inches='tight'),
-            tight_layout=True,
-            warn_too_much_data=10000
-        )
+        with _PLOT_LOCK:
+            mpf.plot(
+                df, 
+                type='candle', 
+                style=s, 
+                addplot=add_plots,
+                volume=True, 
+                panel_ratios=ratios,
+                title=title_text,
+                savefig=dict(fname=filepath, dpi=100, bbox_inches='tight'),
+                tight_layout=True,
+                warn_too_much_data=10000
+            )
         return filepath
     except Exception as e:
         print(f" [Painter Error] {e}")
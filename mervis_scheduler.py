@@ -0,0 +1,191 @@
+import heapq
+import os
+import threading
+import time
+import mervis_state
+
+# [이벤트 기반 분석 스케줄러]
+# 60초마다 감시 종목 전체를 analyze_stock 하던 방식 대신
+# mervis_state 가격 갱신 이벤트에서 트리거(가격 변동 / 거래량 급증 / 감시가 근접)를 평가하고
+# 신호 강도 순 우선순위 큐에서 꺼낸 종목만 분석 -> LLM/API 예산을 실제로 움직인 종목에 집중
+
+# 트리거 설정 (환경 변수로 조정 가능)
+TRIGGERS = {
+    # 마지막 분석 시점 가격 대비 변동률(%)
+    "price_move_pct": float(os.getenv("MERVIS_TRIGGER_PRICE_PCT", "1.0")),
+    # 틱 거래량이 평소(EWMA) 대비 이 배수 이상
+    "volume_spike_ratio": float(os.getenv("MERVIS_TRIGGER_VOLUME_RATIO", "3.0")),
+    # 감시가(사용자 지정가 / 직전 분석의 목표가·손절가)까지 남은 거리(%)
+    "watch_proximity_pct": float(os.getenv("MERVIS_TRIGGER_WATCH_PCT", "0.5")),
+}
+
+# 같은 종목 재분석 최소 간격(초)
+MIN_INTERVAL = int(os.getenv("MERVIS_SCHED_MIN_INTERVAL", "120"))
+
+# 트리거가 없어도 이 시간(초)이 지나면 낮은 우선순위로 재분석 (0이면 사용 안 함)
+MAX_STALENESS = int(os.getenv("MERVIS_SCHED_MAX_STALENESS", "1800"))
+
+# 거래량 평활 계수 / 급증 판정 전 최소 관측 수
+VOLUME_ALPHA = 0.1
+VOLUME_WARMUP = 20
+
+# 최초 분석 / 주기 재분석 점수 (트리거 점수 1.0보다 낮게 두어 실제 움직임이 우선)
+INITIAL_SCORE = 0.5
+STALE_SCORE = 0.2
+
+class AnalysisScheduler:
+    """
+    - attach(): mervis_state 가격 이벤트 구독
+    - next_ticker(timeout): 가장 강한 신호의 종목을 꺼냄 (없으면 timeout까지 대기 후 None)
+    - done(ticker, price, levels): 분석 완료 기록 (기준가/감시가 갱신)
+    - watch_provider: ticker -> 감시 가격 리스트 (예: kis_websocket.get_watch_prices)
+    """
+    def __init__(self, watch_provider=None, triggers=None):
+        self.triggers = dict(TRIGGERS, **(triggers or {}))
+        self.watch_provider = watch_provider
+        self.cond = threading.Condition()
+        self.heap = []          # (-score, seq, ticker)
+        self.pending = {}       # ticker -> (score, reasons), 큐에 있는 최신 항목
+        self.state = {}         # ticker -> 기준가/거래량 통계/감시가
+        self.running = set()    # 분석 중인 종목 (중복 투입 방지)
+        self.seq = 0
+        self.stats = {"events": 0, "triggered": 0, "analyzed": 0}
+
+    def attach(self):
+        mervis_state.add_listener(self.on_price)
+
+    def detach(self):
+        mervis_state.remove_listener(self.on_price)
+        with self.cond:
+            self.cond.notify_all()
+
+    # --- 이벤트 평가 ---
+
+    def _ticker_state(self, ticker):
+        st = self.state.get(ticker)
+        if st is None:
+            st = {"base_price": None, "last_run": 0.0, "levels": [],
+                  "last_volume": None, "vol_avg": 0.0, "vol_obs": 0}
+            self.state[ticker] = st
+        return st
+
+    def _volume_ratio(self, st, volume):
+        # 누적 거래량 증가분을 틱 거래량으로 보고 EWMA 대비 배수 계산
+        last = st["last_volume"]
+        st["last_volume"] = volume
+        if last is None or volume < last:
+            return 0.0 # 첫 관측 또는 일자 변경(누적 초기화)
+        delta = volume - last
+        avg = st["vol_avg"]
+        ratio = delta / avg if avg > 0 and st["vol_obs"] >= VOLUME_WARMUP else 0.0
+        st["vol_avg"] = delta if st["vol_obs"] == 0 else avg + VOLUME_ALPHA * (delta - avg)
+        st["vol_obs"] += 1
+        return ratio
+
+    def evaluate(self, ticker, price, vol_ratio, now=None):
+        """
+        트리거 평가 -> (점수, 사유 리스트). 점수 0이면 재분석 불필요
+        - vol_ratio: _volume_ratio로 미리 갱신한 거래량 배수
+        각 트리거 점수는 임계값 대비 배수 (1.0 = 임계값 도달), 발생한 트리거 점수 합산
+        """
+        now = now or time.time()
+        st = self._ticker_state(ticker)
+
+        if now - st["last_run"] < MIN_INTERVAL:
+            return 0.0, []
+        if st["base_price"] is None:
+            # 아직 분석한 적 없음 (또는 직전 분석 실패)
+            return INITIAL_SCORE, ["initial"]
+
+        score, reasons = 0.0, []
+        base = st["base_price"]
+        if base > 0:
+            move = abs(price - base) / base * 100
+            if move >= self.triggers["price_move_pct"]:
+                score += move / self.triggers["price_move_pct"]
+                reasons.append(f"price {move:.2f}%")
+
+        if vol_ratio >= self.triggers["volume_spike_ratio"]:
+            score += vol_ratio / self.triggers["volume_spike_ratio"]
+            reasons.append(f"volume x{vol_ratio:.1f}")
+
+        levels = list(st["levels"])
+        if self.watch_provider:
+            try: levels += self.watch_provider(ticker)
+            except Exception: pass
+        levels = [lv for lv in levels if lv > 0]
+        if levels and price > 0:
+            dist = min(abs(price - lv) for lv in levels) / price * 100
+            if dist <= self.triggers["watch_proximity_pct"]:
+                # 감시가에 가까울수록 높은 점수 (도달 시 최대 3배)
+                score += min(self.triggers["watch_proximity_pct"] / max(dist, 1e-9), 3.0)
+                reasons.append(f"watch {dist:.2f}%")
+
+        if score == 0.0 and MAX_STALENESS and now - st["last_run"] >= MAX_STALENESS:
+            return STALE_SCORE, ["stale"]
+        return score, reasons
+
+    def on_price(self, ticker, data, prev):
+        # mervis_state 리스너 (웹소켓 수신 스레드에서 호출되므로 가볍게 유지)
+        with self.cond:
+            self.stats["events"] += 1
+            # 거래량 통계는 분석 중에도 매 틱 갱신 (건너뛰면 분석 구간 거래량이 한 틱으로 몰려 평균이 부풀려짐)
+            vol_ratio = self._volume_ratio(self._ticker_state(ticker), data.get("volume", 0.0))
+            if ticker in self.running:
+                return
+            score, reasons = self.evaluate(ticker, data["price"], vol_ratio)
+            if score <= 0: return
+            queued = self.pending.get(ticker)
+            if queued and queued[0] >= score:
+                return
+            self.stats["triggered"] += 1
+            self.pending[ticker] = (score, reasons)
+            self.seq += 1
+            heapq.heappush(self.heap, (-score, self.seq, ticker))
+            self.cond.notify()
+
+    # --- 작업자 API ---
+
+    def next_ticker(self, timeout=1.0):
+        """
+        우선순위 큐에서 다음 종목 반환: (ticker, score, reasons), 대기 시간 초과 시 None
+        """
+        deadline = time.time() + timeout
+        with self.cond:
+            while True:
+                while self.heap:
+                    neg_score, _, ticker = heapq.heappop(self.heap)
+                    queued = self.pending.get(ticker)
+                    # 더 높은 점수로 다시 들어온 항목이 있으면 이전 항목은 건너뜀
+                    if not queued or queued[0] != -neg_score:
+                        continue
+                    del self.pending[ticker]
+                    self.running.add(ticker)
+                    return ticker, queued[0], queued[1]
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+
+    def done(self, ticker, price, levels=None):
+        """
+        분석 완료: 기준가를 분석 시점 가격으로, 감시가를 이번 전략의 목표가/손절가로 갱신
+        """
+        with self.cond:
+            self.running.discard(ticker)
+            st = self._ticker_state(ticker)
+            st["base_price"] = float(price) if price else None
+            st["last_run"] = time.time()
+            if levels is not None:
+                st["levels"] = [float(lv) for lv in levels if lv]
+            self.stats["analyzed"] += 1
+
+    def queue_size(self):
+        with self.cond:
+            return len(self.pending)
+
+    def get_stats(self):
+        with self.cond:
+            stats = dict(self.stats)
+            stats["queued"] = len(self.pending)
+        return stats
@@ -1,5 +1,9 @@
+import os
 import threading
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pytz
 
 # [머비스 상태 관리자]
 # 모드 설정 및 실시간 데이터 공유 메모리 역할
@@ -22,29 +26,191 @@ def is_real():
 
 # --- 실시간 데이터 메모리 (In-Memory DB) ---
 
-# 구조: { "TSLA": {"price": 250.0, "change": 1.5, "volume": 10000, "updated_at": ...} }
+# 종목별 최근 틱 보관 개수 (링 버퍼 크기)
+TICK_CAPACITY = int(os.getenv("MERVIS_TICK_CAPACITY", "4096"))
+
+class TickRing:
+    """
+    종목 1개의 최근 틱 링 버퍼 (시각/가격/누적 거래량, 미리 할당한 NumPy 배열)
+    - 쓰기: 웹소켓 수신 스레드 하나만 (append)
+    - 읽기: 락 없이 snapshot() - seqlock 방식으로 복사 중 덮어쓰기가 감지되면 다시 복사
+    """
+    def __init__(self, capacity=TICK_CAPACITY):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.float64)      # epoch 초
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.volume = np.zeros(capacity, dtype=np.float64)  # 당일 누적 거래량
+        self.seq = 0  # 지금까지 기록된 틱 수 (슬롯 기록이 끝난 뒤 증가 = 발행)
+
+    def append(self, ts, price, volume):
+        i = self.seq % self.capacity
+        self.ts[i] = ts
+        self.price[i] = price
+        self.volume[i] = volume
+        self.seq += 1
+
+    def snapshot(self, n=None):
+        """
+        최근 n개 틱 복사본 (오래된 순) -> (ts, price, volume)
+        기록 중인 다음 슬롯과 겹치지 않도록 최대 capacity - 1개
+        """
+        limit = self.capacity - 1
+        n = limit if n is None else min(n, limit)
+        while True:
+            start_seq = self.seq
+            count = min(n, start_seq)
+            idx = np.arange(start_seq - count, start_seq) % self.capacity
+            ts, price, volume = self.ts[idx], self.price[idx], self.volume[idx]
+            # 복사하는 동안 writer가 복사 구간의 가장 오래된 슬롯까지 돌아왔으면 재시도
+            if self.seq - start_seq < self.capacity - count:
+                return ts, price, volume
+
+# 최신 스냅샷: { "TSLA": {"price": 250.0, "change": 1.5, "volume": 10000, "updated_at": ...} }
+# 갱신 시 dict를 새로 만들어 참조만 교체하므로 읽기 쪽은 락 없이 조회
 _REALTIME_STORE = {}
-_DATA_LOCK = threading.Lock() # 스레드 충돌 방지용
+_TICKS = {}  # { "TSLA": TickRing }
+_DATA_LOCK = threading.Lock() # 쓰기 전용 (웹소켓 재연결 등으로 writer가 겹칠 때 대비)
+
+# 가격 갱신 이벤트 구독자: func(ticker, data, prev) - prev는 직전 스냅샷 (최초 수신 시 None)
+_LISTENERS = []
+
+def add_listener(func):
+    if func not in _LISTENERS:
+        _LISTENERS.append(func)
+
+def remove_listener(func):
+    if func in _LISTENERS:
+        _LISTENERS.remove(func)
+
+class ChangeFeed:
+    """
+    [변경 구독] 마지막 drain 이후 바뀐 종목만 종목당 최신값 1건으로 합쳐서 전달 (GUI 등 프레임 단위 소비자용)
+    - wait(timeout): 변경이 생길 때까지 대기 (변경이 없으면 CPU 사용 없음)
+    - drain(): { ticker: (price, change, volume) } 반환 후 비움
+    """
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+
+    def _on_update(self, ticker, data, prev):
+        with self.lock:
+            self.pending[ticker] = (data["price"], data["change"], data["volume"])
+        self.event.set()
+
+    def wait(self, timeout=None):
+        return self.event.wait(timeout)
+
+    def drain(self):
+        with self.lock:
+            batch, self.pending = self.pending, {}
+            self.event.clear()
+        return batch
+
+    def close(self):
+        remove_listener(self._on_update)
+        self.event.set() # 대기 중인 소비자 깨우기
+
+def subscribe_changes():
+    feed = ChangeFeed()
+    add_listener(feed._on_update)
+    return feed
 
 def update_realtime_price(ticker, price, change_rate, volume):
-    # 웹소켓에서 수신한 최신 데이터 갱신
+    # 웹소켓에서 수신한 최신 데이터 갱신 + 틱 링 버퍼 기록
+    now = datetime.now()
+    data = {
+        "price": float(price),
+        "change": float(change_rate),
+        "volume": float(volume),
+        "updated_at": now
+    }
     with _DATA_LOCK:
-        _REALTIME_STORE[ticker] = {
-            "price": float(price),
-            "change": float(change_rate),
-            "volume": float(volume),
-            "updated_at": datetime.now()
-        }
+        ring = _TICKS.get(ticker)
+        if ring is None:
+            ring = TickRing()
+            _TICKS[ticker] = ring
+        ring.append(now.timestamp(), data["price"], data["volume"])
+        prev = _REALTIME_STORE.get(ticker)
+        _REALTIME_STORE[ticker] = data
+
+    # 구독자 호출은 락 밖에서 (구독자 예외가 수신 스레드를 멈추지 않도록)
+    for listener in list(_LISTENERS):
+        try: listener(ticker, data.copy(), prev)
+        except Exception: pass
 
 def get_realtime_data(ticker):
-    # 전략 모듈에서 최신 데이터 조회용
-    with _DATA_LOCK:
-        data = _REALTIME_STORE.get(ticker)
-        if data:
-            return data.copy() # 원본 훼손 방지
-        return None
+    # 전략 모듈에서 최신 데이터 조회용 (발행된 dict는 수정되지 않으므로 락 없이 복사)
+    data = _REALTIME_STORE.get(ticker)
+    if data:
+        return data.copy() # 원본 훼손 방지
+    return None
 
 def get_all_realtime_tickers():
     # 현재 메모리에 올라와 있는 모든 종목 코드 반환
-    with _DATA_LOCK:
-        return list(_REALTIME_STORE.keys())
\ No newline at end of file
+    return list(_REALTIME_STORE)
+
+# --- 틱 히스토리 조회 / 장중 지표 ---
+
+def get_ticks(ticker, n=None, since=None):
+    """
+    최근 틱 복사본 {"ts", "price", "volume"} (NumPy 배열, 오래된 순), 없으면 None
+    - n: 최근 n개, since: 이 epoch 초 이후 틱만
+    """
+    ring = _TICKS.get(ticker)
+    if ring is None or ring.seq == 0: return None
+    ts, price, volume = ring.snapshot(n)
+    if since is not None:
+        mask = ts >= since
+        ts, price, volume = ts[mask], price[mask], volume[mask]
+    return {"ts": ts, "price": price, "volume": volume}
+
+def _tick_volumes(cum_volume):
+    # 누적 거래량 -> 틱별 체결량 (누적값이 줄면 새 세션 시작으로 보고 해당 값 자체를 사용)
+    if len(cum_volume) == 0: return cum_volume
+    deltas = np.diff(cum_volume, prepend=cum_volume[0])
+    reset = deltas < 0
+    deltas[reset] = cum_volume[reset]
+    return deltas
+
+# 정규장 시작 (미국 동부)
+MARKET_TZ = pytz.timezone('US/Eastern')
+SESSION_OPEN = (9, 30)
+
+def session_open(now=None):
+    # 가장 최근 정규장 시작 시각 (epoch 초), 09:30 이전이면 전날 09:30
+    now = datetime.fromtimestamp(now if now is not None else time.time(), MARKET_TZ)
+    day = now.date() if (now.hour, now.minute) >= SESSION_OPEN else now.date() - timedelta(days=1)
+    return MARKET_TZ.localize(datetime(day.year, day.month, day.day, *SESSION_OPEN)).timestamp()
+
+def get_intraday_vwap(ticker, since=None):
+    """
+    당일 세션 틱 기준 VWAP (거래량 정보가 없으면 단순 평균가), 틱이 없으면 None
+    - since 미지정 시 최근 정규장 시작 이후 틱만 사용
+    - 구간 안에서 누적 거래량이 초기화되었으면 마지막 초기화 이후만 사용
+    """
+    ticks = get_ticks(ticker, since=session_open() if since is None else since)
+    if ticks is None or len(ticks["price"]) == 0: return None
+    prices, vols = ticks["price"], _tick_volumes(ticks["volume"])
+    resets = np.flatnonzero(np.diff(ticks["volume"]) < 0)
+    if len(resets):
+        start = resets[-1] + 1
+        prices, vols = prices[start:], vols[start:]
+    total = vols.sum()
+    if total <= 0:
+        return float(prices.mean())
+    return float((prices * vols).sum() / total)
+
+def get_momentum(ticker, window_sec=60):
+    # window_sec 전 대비 현재가 변화율(%), 비교할 틱이 없으면 None
+    ticks = get_ticks(ticker)
+    if ticks is None: return None
+    ts, price = ticks["ts"], ticks["price"]
+    base_idx = np.searchsorted(ts, ts[-1] - window_sec, side='left')
+    if base_idx >= len(ts) - 1 or price[base_idx] <= 0: return None
+    return float((price[-1] / price[base_idx] - 1) * 100)
+
+def get_tick_rate(ticker, window_sec=60):
+    # 최근 window_sec 동안 초당 틱 수
+    ticks = get_ticks(ticker, since=time.time() - window_sec)
+    return len(ticks["ts"]) / window_sec if ticks else 0.0
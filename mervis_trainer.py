@@ -2,6 +2,7 @@ import sys
 import logging
 from google.cloud import bigquery
 import mervis_bigquery
+import mervis_local_model
 
 # 로깅 설정
 logging.basicConfig(
@@ -77,6 +78,43 @@ def run_training():
         
     except Exception as e:
         logging.error(f"모델 학습 중 오류: {e}")
+        return
+
+    # 앱 내 추론용 로컬 모델 학습 (실패해도 BigQuery 모델은 이미 배포됨)
+    bq_metrics = {k: float(v) for k, v in dict(metrics.items()).items() if isinstance(v, (int, float))}
+    export_local_model(client, bq_metrics)
+
+def export_local_model(client, bq_metrics):
+    """
+    [로컬 모델 내보내기]
+    BigQuery 모델과 같은 학습 데이터/피처로 Gradient Boosting 모델을 학습하여 파일로 저장
+    ML.EVALUATE 지표와 홀드아웃 MAE를 비교하여 정합성 결과를 함께 기록
+    (정합성 실패 모델은 앱에서 사용하지 않고 BigQuery 예측으로 대체됨)
+    """
+    import pandas as pd
+
+    logging.info(">>> 로컬 추론용 모델 학습 시작...")
+    cols = ", ".join(mervis_local_model.FEATURES + [mervis_local_model.LABEL])
+    query = f"""
+        SELECT {cols}
+        FROM `{client.project}.{mervis_bigquery.DATASET_ID}.{mervis_bigquery.TABLE_FEATURES}`
+        WHERE next_day_return IS NOT NULL
+          AND date >= DATE_SUB(CURRENT_DATE(), INTERVAL 2 YEAR)
+    """
+    try:
+        rows = [dict(row.items()) for row in client.query(query).result()]
+        if not rows:
+            logging.warning("    학습 데이터 없음 - 로컬 모델 생략")
+            return
+        artifact = mervis_local_model.train(pd.DataFrame(rows), bq_metrics=bq_metrics)
+        path = mervis_local_model.save(artifact)
+
+        local_mae = artifact["metrics"].get("mean_absolute_error")
+        bq_mae = bq_metrics.get("mean_absolute_error")
+        logging.info(f"    [정합성] Local MAE: {local_mae} | BQ MAE: {bq_mae} | 차이: {artifact['parity_gap']} -> {'OK' if artifact['parity_ok'] else 'FAIL (BigQuery 예측 사용)'}")
+        logging.info(f"<<< 로컬 모델 저장 완료 ({path}, {artifact['rows']}행)")
+    except Exception as e:
+        logging.error(f"로컬 모델 학습 중 오류: {e}")
 
 if __name__ == "__main__":
     run_training()
\ No newline at end of file
@@ -1,5 +1,5 @@
-import yfinance as yf
 import pandas as pd
+from modules import yf_provider
 
 # 안전한 숫자 변환 헬퍼 함수
 def safe_float(value):
@@ -18,8 +18,7 @@ def get_fundamental_info(ticker):
     [가치투자] yfinance를 통해 펀더멘털 및 컨센서스 데이터 조회
     """
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = yf_provider.get_info(ticker)
         
         # yfinance 버전 이슈 대비: regularMarketPrice가 없으면 currentPrice 확인
         if not info:
@@ -82,12 +81,8 @@ def analyze_fundamentals(ticker, active_strategies=None):
             summary_parts.append(f"PE improving ({val['trailing_pe']:.1f} -> {val['forward_pe']:.1f})")
 
     # 2. [컨센서스 분석] 목표가 괴리율
-    try:
-        # fast_info 접근 시 오류 방지
-        fi = yf.Ticker(ticker).fast_info
-        curr_price = fi.get('last_price', 0) if hasattr(fi, 'get') else fi['last_price']
-    except:
-        curr_price = 0
+    # info에 포함된 현재가 재사용 (없을 때만 fast_info 조회)
+    curr_price = yf_provider.get_last_price(ticker)
 
     if curr_price > 0 and con['target_mean'] > curr_price * 1.1: # 목표가가 현재가보다 10% 이상 높으면
         factors.append("Analyst_Upside_Potential")
@@ -1,12 +1,11 @@
-import yfinance as yf
+from modules import yf_provider
 
 def get_supply_info(ticker):
     """
     [Data Fetcher] yfinance를 통해 수급 기초 데이터 조회
     """
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = yf_provider.get_info(ticker)
         
         # 데이터가 없을 경우 방어 로직
         supply_data = {
@@ -99,7 +99,12 @@ def prepare_data(daily_data):
     cols = ['close', 'open', 'high', 'low', 'volume']
     for c in cols: 
         if c in df.columns: df[c] = pd.to_numeric(df[c], errors='coerce')
-    if 'date' in df.columns:
+    if 'date' in df.columns and 'xhms' in df.columns:
+        # 분봉 (mervis_candles.to_records): 날짜 + 시각
+        df['date'] = pd.to_datetime(df['date'].astype(str) + df['xhms'].astype(str).str.zfill(6), format='%Y%m%d%H%M%S', errors='coerce')
+        df = df.sort_values('date')
+        df.set_index('date', inplace=True)
+    elif 'date' in df.columns:
         df['date'] = pd.to_datetime(df['date'].astype(str), format='%Y%m%d', errors='coerce')
         df = df.sort_values('date')
         df.set_index('date', inplace=True)
@@ -257,4 +262,4 @@ def analyze_technical_signals(daily_data, active_strategies=[]):
     rsi_val = summary_data["indicators"]["rsi"].iloc[-1] if summary_data["indicators"].get("rsi") is not None else 0
     summary_data['summary'] = f"Price: {summary_data['price']}\nRSI: {rsi_val:.2f}\nSignals: {signals}"
 
-    return summary_data, None, signals
\ No newline at end of file
+    return summary_data, None, signals
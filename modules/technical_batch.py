@@ -0,0 +1,325 @@
+import time
+import numpy as np
+import pandas as pd
+
+# [전 종목 일괄 기술적 지표 엔진]
+# technical.analyze_technical_signals는 종목마다 DataFrame을 만들고 pandas_ta를 지표별로 호출함
+# 크롤러처럼 수천 종목을 처리할 때는 (봉 x 종목) 2차원 배열에 NumPy 누적/롤링 연산을 한 번에 적용
+# 지표 정의는 pandas_ta(pandas 구현)와 동일하게 맞춤:
+#   - SMA: rolling(n, min_periods=n).mean()
+#   - RSI: RMA(ewm alpha=1/n, adjust=True, min_periods=n) 기반
+#   - VWAP: 일봉 + 일 단위 앵커 -> 봉별 hlc3
+#   - Bollinger: SMA ± std(ddof=0) * 2
+
+MA_PERIODS = [5, 20, 50, 100, 200]
+RSI_LENGTH = 14
+BB_LENGTH = 20
+BB_STD = 2.0
+VOL_AVG_LENGTH = 20
+MIN_BARS = 20   # 개별 분석과 동일한 데이터 부족 기준
+
+# --- [패널 구성] ---
+
+def build_panel(chart_map):
+    """
+    {ticker: KIS 일봉 리스트(최신순)} -> 2차원 패널
+    - 각 종목을 오래된 순으로 정렬 후 마지막 봉 기준 우측 정렬 (앞쪽은 NaN 패딩)
+    - 반환: (tickers, {"open","high","low","close","volume": ndarray[T, N]}, lengths)
+    """
+    series = []
+    for ticker, records in chart_map.items():
+        if not records: continue
+        rows = []
+        for r in records:
+            xymd = str(r.get('xymd', ''))
+            if len(xymd) != 8: continue
+            rows.append((xymd, _num(r.get('open')), _num(r.get('high')), _num(r.get('low')),
+                         _num(r.get('clos')), _num(r.get('tvol'))))
+        if not rows: continue
+        rows.sort(key=lambda x: x[0])
+        series.append((ticker, np.array([row[1:] for row in rows], dtype=np.float64)))
+
+    if not series:
+        return [], {}, np.zeros(0, dtype=np.int64)
+
+    tickers = [t for t, _ in series]
+    lengths = np.array([len(arr) for _, arr in series], dtype=np.int64)
+    T, N = int(lengths.max()), len(series)
+    block = np.full((5, T, N), np.nan)
+    for j, (_, arr) in enumerate(series):
+        block[:, T - len(arr):, j] = arr.T
+
+    panel = {"open": block[0], "high": block[1], "low": block[2], "close": block[3], "volume": block[4]}
+    return tickers, panel, lengths
+
+def _num(value):
+    # pd.to_numeric(errors='coerce')와 동일하게 변환 불가 값은 NaN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+# --- [2차원 지표 연산 (axis 0 = 시간)] ---
+
+def _window_sums(x, n):
+    # 윈도우 합계와 유효값 개수 (누적합 차분)
+    valid = ~np.isnan(x)
+    zeros = np.zeros((1, x.shape[1]))
+    cs = np.vstack([zeros, np.cumsum(np.where(valid, x, 0.0), axis=0)])
+    cc = np.vstack([zeros, np.cumsum(valid, axis=0)])
+    return cs[n:] - cs[:-n], cc[n:] - cc[:-n]
+
+def sma(x, n):
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] < n: return out
+    s, c = _window_sums(x, n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out[n - 1:] = np.where(c == n, s / n, np.nan)
+    return out
+
+def rolling_std(x, n, ddof=0):
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] < n: return out
+    # 종목별 첫 유효값을 빼서 누적 제곱합의 자릿수 손실 방지 (분산은 평행이동 불변)
+    first_idx = np.argmax(~np.isnan(x), axis=0)
+    offset = x[first_idx, np.arange(x.shape[1])]
+    xc = x - np.where(np.isnan(offset), 0.0, offset)
+    s1, c = _window_sums(xc, n)
+    s2, _ = _window_sums(xc * xc, n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = (s2 - s1 * s1 / n) / (n - ddof)
+        out[n - 1:] = np.where(c == n, np.sqrt(np.maximum(var, 0.0)), np.nan)
+    return out
+
+def rma(x, n):
+    """
+    Wilder 평활 (pandas ewm(alpha=1/n, adjust=True, ignore_na=False, min_periods=n).mean()과 동일)
+    시간 축만 순회하고 종목 축은 벡터 연산
+    """
+    T, N = x.shape
+    decay = 1.0 - 1.0 / n
+    out = np.full(x.shape, np.nan)
+    weighted = np.full(N, np.nan)
+    old_wt = np.zeros(N)
+    nobs = np.zeros(N)
+    for t in range(T):
+        cur = x[t]
+        obs = ~np.isnan(cur)
+        started = ~np.isnan(weighted)
+        nobs += obs
+
+        old_wt = np.where(started, old_wt * decay, old_wt)
+        upd = started & obs
+        with np.errstate(invalid='ignore'):
+            weighted = np.where(upd, (old_wt * weighted + cur) / (old_wt + 1.0), weighted)
+        old_wt = np.where(upd, old_wt + 1.0, old_wt)
+
+        init = ~started & obs
+        weighted = np.where(init, cur, weighted)
+        old_wt = np.where(init, 1.0, old_wt)
+
+        out[t] = np.where(nobs >= n, weighted, np.nan)
+    return out
+
+def rsi(close, n=RSI_LENGTH):
+    diff = np.full(close.shape, np.nan)
+    diff[1:] = close[1:] - close[:-1]
+    with np.errstate(invalid='ignore'):
+        positive = np.where(diff < 0, 0.0, diff)
+        negative = np.where(diff > 0, 0.0, diff)
+    pos_avg = rma(positive, n)
+    neg_avg = rma(negative, n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100.0 * pos_avg / (pos_avg + np.abs(neg_avg))
+
+def vwap(high, low, close, volume):
+    # 일봉에 일 단위 앵커를 쓰면 그룹이 봉 하나 -> (hlc3 * v) / v
+    tp = (high + low + close) / 3.0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (tp * volume) / volume
+
+def bbands(close, n=BB_LENGTH, std=BB_STD):
+    mid = sma(close, n)
+    dev = rolling_std(close, n, ddof=0)
+    return mid - std * dev, mid, mid + std * dev
+
+def fractals(high, low):
+    # 5봉 기준 (양옆 2봉보다 높은 고점 / 낮은 저점), 비교 불가 구간은 False
+    T = high.shape[0]
+    up = np.zeros(high.shape, dtype=bool)
+    down = np.zeros(low.shape, dtype=bool)
+    if T < 5: return up, down
+    h, l = high, low
+    with np.errstate(invalid='ignore'):
+        up[2:-2] = (h[2:-2] > h[1:-3]) & (h[2:-2] > h[:-4]) & (h[2:-2] > h[3:-1]) & (h[2:-2] > h[4:])
+        down[2:-2] = (l[2:-2] < l[1:-3]) & (l[2:-2] < l[:-4]) & (l[2:-2] < l[3:-1]) & (l[2:-2] < l[4:])
+    return up, down
+
+def compute_indicators(panel):
+    """
+    패널 전체 지표 계산 (모든 결과는 [T, N] 배열)
+    """
+    c, h, l, v = panel["close"], panel["high"], panel["low"], panel["volume"]
+    ind = {f"ma{p}": sma(c, p) for p in MA_PERIODS}
+    ind["rsi"] = rsi(c)
+    ind["vwap"] = vwap(h, l, c, v)
+    ind["bbl"], ind["bbm"], ind["bbu"] = bbands(c)
+    ind["fractal_up"], ind["fractal_down"] = fractals(h, l)
+    ind["vol_avg"] = sma(v, VOL_AVG_LENGTH)
+    return ind
+
+# --- [종목별 특징 테이블] ---
+
+def compute_features(chart_map, active_strategies=None):
+    """
+    {ticker: 일봉 리스트} -> 종목당 1행 특징 테이블 (index: ticker)
+    - 시그널 판정 규칙은 technical.analyze_technical_signals와 동일
+    - 봉 수가 MIN_BARS 미만인 종목은 제외 (개별 분석의 '데이터 부족')
+    """
+    active_strategies = active_strategies or []
+    tickers, panel, lengths = build_panel(chart_map)
+    if not tickers:
+        return pd.DataFrame()
+
+    ind = compute_indicators(panel)
+    c, v = panel["close"], panel["volume"]
+    last, prev = -1, -2
+
+    price, volume = c[last], v[last]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ma_cross = (ind["ma5"][prev] < ind["ma20"][prev]) & (ind["ma5"][last] > ind["ma20"][last])
+        volume_spike = (v[prev] > 0) & (v[last] >= v[prev] * 2.0)
+        above_vwap = price > ind["vwap"][last]
+        ma20_ratio = price / ind["ma20"][last]
+        vol_ratio = volume / ind["vol_avg"][last]
+    rsi_last = ind["rsi"][last]
+    fractal_sell = ind["fractal_up"][-3] if c.shape[0] > 3 else np.zeros(len(tickers), dtype=bool)
+    fractal_buy = ind["fractal_down"][-3] if c.shape[0] > 3 else np.zeros(len(tickers), dtype=bool)
+
+    table = pd.DataFrame({
+        "price": price,
+        "volume": volume,
+        **{f"ma{p}": ind[f"ma{p}"][last] for p in MA_PERIODS},
+        "rsi": rsi_last,
+        "vwap": ind["vwap"][last],
+        "bbl": ind["bbl"][last], "bbm": ind["bbm"][last], "bbu": ind["bbu"][last],
+        "ma20_ratio": ma20_ratio,
+        "vol_ratio": vol_ratio,
+        "ma_cross": ma_cross,
+        "volume_spike": volume_spike,
+        "above_vwap": above_vwap,
+        "fractal_sell": fractal_sell,
+        "fractal_buy": fractal_buy,
+        "bars": lengths
+    }, index=pd.Index(tickers, name="ticker"))
+    table = table[table["bars"] >= MIN_BARS].copy()
+
+    table["signals"] = [_signals(row, active_strategies) for row in table.itertuples()]
+    table["summary"] = [
+        f"Price: {row.price}\nRSI: {row.rsi:.2f}\nSignals: {row.signals}" for row in table.itertuples()
+    ]
+    return table
+
+def _signals(row, active_strategies):
+    signals = []
+    if 'ma_cross' in active_strategies and row.ma_cross:
+        signals.append("MA5_Cross_MA20")
+    if 'volume_spike' in active_strategies and row.volume_spike:
+        signals.append("Volume_Spike")
+    if 'rsi' in active_strategies:
+        if row.rsi <= 30: signals.append("RSI_OVERSOLD")
+        elif row.rsi >= 70: signals.append("RSI_OVERBOUGHT")
+    if 'vwap' in active_strategies and row.above_vwap:
+        signals.append("Price_Above_VWAP")
+    if row.fractal_sell: signals.append("Fractal_Sell_Signal")
+    if row.fractal_buy: signals.append("Fractal_Buy_Signal")
+    return signals
+
+def to_tech_data(row):
+    """
+    특징 테이블 1행 -> 크롤러 저장용 tech_data (technical.analyze_technical_signals 결과와 같은 구조)
+    - 지표는 기존처럼 indicators 아래에 두므로 build_daily_feature_row가 읽는 값(기본값)은 변하지 않음
+      (daily_features 분포가 바뀌면 모델 재학습이 필요하므로 저장 값 변경은 별도 작업으로 진행)
+    """
+    def _f(key):
+        return float(row[key]) if row[key] == row[key] else 0.0
+    return {
+        "price": float(row["price"]),
+        "indicators": {
+            "rsi": _f("rsi"), "vwap": _f("vwap"),
+            "ma20_ratio": _f("ma20_ratio"), "vol_ratio": _f("vol_ratio")
+        },
+        "signals": list(row["signals"]),
+        "summary": row["summary"]
+    }
+
+# --- [벤치마크 / 정합성 검증] ---
+
+def _synthetic_universe(n_tickers, n_bars, seed=7):
+    # 랜덤워크 기반 가상 일봉 (KIS 응답 형태, 최신순)
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=n_bars).strftime('%Y%m%d')
+    chart_map = {}
+    for i in range(n_tickers):
+        bars = int(rng.integers(MIN_BARS, n_bars + 1))
+        close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+        open_ = close * (1 + rng.normal(0, 0.005, bars))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, bars)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, bars)))
+        vol = rng.integers(50_000, 5_000_000, bars)
+        recs = [
+            {"xymd": d, "open": f"{o:.4f}", "high": f"{h:.4f}", "low": f"{l:.4f}", "clos": f"{c:.4f}", "tvol": str(v)}
+            for d, o, h, l, c, v in zip(dates[-bars:], open_, high, low, close, vol)
+        ]
+        chart_map[f"T{i:04d}"] = recs[::-1]
+    return chart_map
+
+def _last(series):
+    if series is None: return np.nan
+    return float(series.iloc[-1])
+
+def run_benchmark(n_tickers=500, n_bars=300):
+    from modules import technical
+
+    strategies = ['ma_cross', 'volume_spike', 'rsi', 'vwap']
+    chart_map = _synthetic_universe(n_tickers, n_bars)
+    print(f" [Benchmark] {n_tickers}종목 x 최대 {n_bars}봉")
+
+    start = time.perf_counter()
+    single = {t: technical.analyze_technical_signals(recs, strategies) for t, recs in chart_map.items()}
+    t_single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = compute_features(chart_map, strategies)
+    t_batch = time.perf_counter() - start
+
+    print(f"   - 종목별 pandas_ta: {t_single:.2f}s ({t_single / n_tickers * 1000:.1f}ms/종목)")
+    print(f"   - 일괄 NumPy 엔진: {t_batch:.3f}s ({t_batch / n_tickers * 1000:.2f}ms/종목) -> x{t_single / max(t_batch, 1e-9):.0f}")
+
+    # 정합성: 마지막 봉 지표값 및 시그널 비교
+    mismatches = 0
+    for ticker, (data, err, signals) in single.items():
+        if err:
+            continue
+        row = table.loc[ticker]
+        ind = data["indicators"]
+        bb = ind.get("bollinger")
+        expected = {f"ma{p}": _last(ind[f"ma{p}"]) for p in MA_PERIODS}
+        expected.update({
+            "rsi": _last(ind["rsi"]), "vwap": _last(ind["vwap"]),
+            "bbl": _last(bb.iloc[:, 0]) if bb is not None else np.nan,
+            "bbm": _last(bb.iloc[:, 1]) if bb is not None else np.nan,
+            "bbu": _last(bb.iloc[:, 2]) if bb is not None else np.nan
+        })
+        for key, exp in expected.items():
+            if not np.isclose(row[key], exp, rtol=1e-8, atol=1e-8, equal_nan=True):
+                mismatches += 1
+                print(f"   ! {ticker} {key}: single={exp} batch={row[key]}")
+        if signals != row["signals"]:
+            mismatches += 1
+            print(f"   ! {ticker} signals: single={signals} batch={row['signals']}")
+    print(f"   - 정합성 검사: {len(table)}종목, 불일치 {mismatches}건")
+    return mismatches
+
+if __name__ == "__main__":
+    run_benchmark()
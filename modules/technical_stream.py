@@ -0,0 +1,129 @@
+import math
+import threading
+import numpy as np
+
+# [실시간 증분 지표]
+# 틱이 들어올 때마다 process_chart_data로 전체 DataFrame을 다시 계산하는 대신
+# 확정된 봉(마지막 봉 제외)의 합계 상태를 보관하고 마지막 봉만 O(1)로 갱신
+# 갱신 컬럼은 technical.process_chart_data의 MA*, BBL/BBM/BBU, Fractal_*
+# (엘리게이터는 3~8봉 미래로 이동된 값이라 표시 구간은 마지막 봉 틱의 영향을 받지 않음)
+
+BB_LENGTH = 20
+BB_STD = 2
+
+class _Ring:
+    """
+    고정 길이 링 버퍼 (가장 최근 값부터 k번째 조회 O(1))
+    """
+    def __init__(self, size):
+        self.size = size
+        self.buf = [0.0] * size
+        self.head = -1
+        self.count = 0
+
+    def push(self, value):
+        self.head = (self.head + 1) % self.size
+        self.buf[self.head] = value
+        self.count = min(self.count + 1, self.size)
+
+    def ago(self, k):
+        # k=0: 가장 최근 값
+        return self.buf[(self.head - k) % self.size]
+
+class IndicatorStream:
+    """
+    종목 1개의 증분 지표 상태
+    - df: technical.process_chart_data 결과 (Open/High/Low/Close 컬럼, 오래된 순)
+    - update(price): 마지막 봉 종가/고가/저가 반영 후 마지막 봉 기준 지표값 dict 반환
+    - apply(df, price): update 결과를 df의 해당 행에 기록 (GUI용)
+    - 새 봉이 시작되면 차트가 다시 계산한 df로 새 인스턴스를 만들어 상태를 구성
+    """
+    def __init__(self, df, settings=None):
+        self.ma_periods = settings.get('ma_periods', [5, 20, 50, 100, 200]) if settings else [5, 20, 50, 100, 200]
+        self.lock = threading.Lock()
+
+        closes = df['Close'].to_numpy(dtype=np.float64)
+        highs = df['High'].to_numpy(dtype=np.float64)
+        lows = df['Low'].to_numpy(dtype=np.float64)
+
+        # 확정 봉 (마지막 봉 제외) 수 / 프랙탈용 최근 4개 고저가
+        self.closed_count = max(len(closes) - 1, 0)
+        self.highs = _Ring(4)
+        self.lows = _Ring(4)
+        for h, l in zip(highs[:-1], lows[:-1]):
+            self.highs.push(h)
+            self.lows.push(l)
+
+        # 기간별 직전 (n-1)개 확정 종가 합
+        hist = closes[:-1]
+        self.sums = {n: float(hist[-(n - 1):].sum()) if n > 1 else 0.0 for n in self.ma_periods}
+
+        # 볼린저: 직전 19개 합/제곱합 (기준값을 빼서 자릿수 손실 방지)
+        self.bb_offset = float(closes[-1]) if len(closes) else 0.0
+        tail = hist[-(BB_LENGTH - 1):] - self.bb_offset
+        self.bb_s1 = float(tail.sum())
+        self.bb_s2 = float((tail * tail).sum())
+
+        self.last = {
+            'Open': float(df['Open'].iloc[-1]) if 'Open' in df.columns else float(closes[-1]),
+            'High': float(highs[-1]), 'Low': float(lows[-1]), 'Close': float(closes[-1])
+        }
+
+    # --- 내부 계산 ---
+
+    def _ma(self, n, price):
+        if self.closed_count < n - 1: return np.nan
+        return (self.sums[n] + price) / n
+
+    def _bollinger(self, price):
+        if self.closed_count < BB_LENGTH - 1: return np.nan, np.nan, np.nan
+        p = price - self.bb_offset
+        s1 = self.bb_s1 + p
+        s2 = self.bb_s2 + p * p
+        mean = s1 / BB_LENGTH
+        std = math.sqrt(max(s2 / BB_LENGTH - mean * mean, 0.0))
+        mid = mean + self.bb_offset
+        return mid - BB_STD * std, mid, mid + BB_STD * std
+
+    def _fractal_3(self, high, low):
+        # 마지막 봉 고/저가가 바뀌면 3번째 전 봉(-3)의 프랙탈 판정만 영향을 받음
+        if self.highs.count < 4: return np.nan, np.nan
+        h = [self.highs.ago(3), self.highs.ago(2), self.highs.ago(1), self.highs.ago(0), high]
+        l = [self.lows.ago(3), self.lows.ago(2), self.lows.ago(1), self.lows.ago(0), low]
+        up = h[2] > h[0] and h[2] > h[1] and h[2] > h[3] and h[2] > h[4]
+        down = l[2] < l[0] and l[2] < l[1] and l[2] < l[3] and l[2] < l[4]
+        return (h[2] * 1.01 if up else np.nan), (l[2] * 0.99 if down else np.nan)
+
+    def _compute(self):
+        price, high, low = self.last['Close'], self.last['High'], self.last['Low']
+        values = dict(self.last)
+        for n in self.ma_periods:
+            values[f'MA{n}'] = self._ma(n, price)
+        values['BBL'], values['BBM'], values['BBU'] = self._bollinger(price)
+        values['Fractal_Up_3'], values['Fractal_Down_3'] = self._fractal_3(high, low)
+        return values
+
+    # --- 공개 API ---
+
+    def update(self, price):
+        with self.lock:
+            price = float(price)
+            self.last['Close'] = price
+            self.last['High'] = max(self.last['High'], price)
+            self.last['Low'] = min(self.last['Low'], price)
+            return self._compute()
+
+    def apply(self, df, price):
+        """
+        df 마지막 봉(및 프랙탈이 바뀌는 -3 봉)만 갱신
+        """
+        values = self.update(price)
+        last_idx = df.index[-1]
+        for col in ['Close', 'High', 'Low'] + [f'MA{n}' for n in self.ma_periods] + ['BBL', 'BBM', 'BBU']:
+            if col in df.columns:
+                df.at[last_idx, col] = values[col]
+        if len(df) >= 5 and 'Fractal_Up' in df.columns:
+            idx3 = df.index[-3]
+            df.at[idx3, 'Fractal_Up'] = values['Fractal_Up_3']
+            df.at[idx3, 'Fractal_Down'] = values['Fractal_Down_3']
+        return values
@@ -0,0 +1,155 @@
+import threading
+import time
+from datetime import datetime
+import pytz
+import yfinance as yf
+
+# [yfinance 메타데이터 공용 제공자]
+# supply / fundamental 모듈이 같은 종목의 Ticker.info를 각각 조회하던 것을
+# (종목, 미국 거래일) 단위로 한 번만 받아 공유
+
+# 같은 거래일이라도 이 시간(초)이 지나면 재조회 (목표가/공매도 비율 등 장중 갱신 대비)
+INFO_TTL = 6 * 3600
+
+# 일괄 시세 조회 시 한 번에 요청할 종목 수
+PRICE_BATCH_SIZE = 200
+
+# 구조: { ("TSLA", "20260105"): {"info": {...}, "ts": 1767225600.0} }
+_INFO_CACHE = {}
+_PRICE_CACHE = {}   # { ("TSLA", "20260105"): 251.3 }
+_LOCK = threading.Lock()
+_TICKER_LOCKS = {}
+_cache_day = None
+
+_STATS = {"info_requests": 0, "info_hits": 0, "info_fetches": 0, "price_hits": 0, "price_fetches": 0, "batch_prices": 0}
+_STATS_LOCK = threading.Lock()
+
+def _count(key, n=1):
+    # 크롤러/분석 스레드 풀에서 동시에 갱신
+    with _STATS_LOCK:
+        _STATS[key] += n
+
+def trading_day():
+    # 캐시 키로 쓰는 미국 동부 기준 날짜
+    return datetime.now(pytz.timezone('US/Eastern')).strftime('%Y%m%d')
+
+def _ticker_lock(ticker):
+    with _LOCK:
+        lock = _TICKER_LOCKS.get(ticker)
+        if lock is None:
+            lock = threading.Lock()
+            _TICKER_LOCKS[ticker] = lock
+        return lock
+
+def _roll_day_locked(day):
+    # 거래일이 바뀌면 지난 항목 정리 (전체 크롤링 시 메모리 누적 방지)
+    global _cache_day
+    if day == _cache_day: return
+    for cache in (_INFO_CACHE, _PRICE_CACHE):
+        for key in [k for k in cache if k[1] != day]:
+            del cache[key]
+    _cache_day = day
+
+def _cached_info(ticker, day):
+    with _LOCK:
+        entry = _INFO_CACHE.get((ticker, day))
+    if entry and time.time() - entry["ts"] < INFO_TTL:
+        return entry["info"]
+    return None
+
+def _store_info(ticker, day, info):
+    with _LOCK:
+        _roll_day_locked(day)
+        _INFO_CACHE[(ticker, day)] = {"info": info, "ts": time.time()}
+        price = info.get('currentPrice') or info.get('regularMarketPrice')
+        if price:
+            _PRICE_CACHE[(ticker, day)] = float(price)
+
+def get_info(ticker, stock=None):
+    """
+    Ticker.info 반환 (캐시 우선, 동시 요청은 한 번만 조회)
+    - stock: 이미 만들어 둔 yf.Ticker 객체 (일괄 조회 시 재사용)
+    - 조회 실패 시 예외 전파 (호출부에서 에러 메시지 처리)
+    """
+    day = trading_day()
+    _count("info_requests")
+    info = _cached_info(ticker, day)
+    if info is not None:
+        _count("info_hits")
+        return info
+
+    # 수급/펀더멘털이 병렬로 같은 종목을 요청해도 네트워크 호출은 1회
+    with _ticker_lock(ticker):
+        info = _cached_info(ticker, day)
+        if info is not None:
+            _count("info_hits")
+            return info
+        _count("info_fetches")
+        info = (stock or yf.Ticker(ticker)).info or {}
+        if info:
+            _store_info(ticker, day, info)
+        return info
+
+def get_last_price(ticker):
+    """
+    현재가 (info/일괄 조회 캐시 -> 없으면 fast_info 1회 조회), 실패 시 0
+    """
+    day = trading_day()
+    with _LOCK:
+        price = _PRICE_CACHE.get((ticker, day))
+    if price:
+        _count("price_hits")
+        return price
+
+    try:
+        _count("price_fetches")
+        fi = yf.Ticker(ticker).fast_info
+        price = fi.get('last_price', 0) if hasattr(fi, 'get') else fi['last_price']
+    except Exception:
+        return 0
+    if price:
+        with _LOCK:
+            _roll_day_locked(day)
+            _PRICE_CACHE[(ticker, day)] = float(price)
+    return price or 0
+
+def prefetch_prices(tickers):
+    """
+    [크롤러용] yf.download 다중 종목 조회로 최근 종가를 일괄 캐싱
+    (종목별 fast_info 호출 대체)
+    """
+    day = trading_day()
+    loaded = 0
+    for i in range(0, len(tickers), PRICE_BATCH_SIZE):
+        batch = tickers[i:i + PRICE_BATCH_SIZE]
+        try:
+            df = yf.download(" ".join(batch), period="5d", progress=False, threads=True)
+            if df is None or df.empty: continue
+            close = df['Close']
+            if not hasattr(close, 'columns'):
+                close = close.to_frame(batch[0])
+            last = close.ffill().iloc[-1]
+        except Exception as e:
+            print(f" [YF] 일괄 시세 조회 실패 ({i}~{i + len(batch)}): {e}")
+            continue
+
+        with _LOCK:
+            _roll_day_locked(day)
+            for ticker, price in last.items():
+                if price == price and price > 0: # NaN 제외
+                    _PRICE_CACHE[(ticker, day)] = float(price)
+                    loaded += 1
+    _count("batch_prices", loaded)
+    return loaded
+
+def get_stats():
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    with _LOCK:
+        stats["cached_info"] = len(_INFO_CACHE)
+        stats["cached_prices"] = len(_PRICE_CACHE)
+    return stats
+
+def print_stats():
+    s = get_stats()
+    print(f" [YF Provider] Info: {s['info_requests']} req / {s['info_fetches']} fetched / {s['info_hits']} hit | Price: {s['price_hits']} hit / {s['price_fetches']} fetched / {s['batch_prices']} batch")
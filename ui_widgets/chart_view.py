@@ -4,10 +4,14 @@ from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from matplotlib.lines import Line2D
 from matplotlib.ticker import FuncFormatter
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox
 
 # 모듈에서 로직 가져오기
-from modules import technical 
+from modules import technical, technical_stream
+import mervis_candles
+
+# 봉 주기 선택 (표시명, 키): D = 일봉(ChartLoader 데이터), 나머지는 웹소켓 틱으로 만든 장중 분봉
+INTERVAL_OPTIONS = [("일봉", "D"), ("1분봉", "1m"), ("5분봉", "5m")]
 
 class RealTimeChartWidget(QWidget):
     def __init__(self, parent=None):
@@ -18,7 +22,16 @@ class RealTimeChartWidget(QWidget):
         
         self.info_label = QLabel("종목을 선택해주세요.")
         self.info_label.setStyleSheet("background-color: #34495E; color: white; font-weight: bold; font-size: 12pt; padding: 5px;")
-        self.layout.addWidget(self.info_label)
+
+        self.interval_box = QComboBox()
+        for label, _ in INTERVAL_OPTIONS:
+            self.interval_box.addItem(label)
+        self.interval_box.currentIndexChanged.connect(self.on_interval_changed)
+
+        header = QHBoxLayout()
+        header.addWidget(self.info_label, 1)
+        header.addWidget(self.interval_box)
+        self.layout.addLayout(header)
 
         # 캔버스 설정
         self.fig = Figure(figsize=(10, 8), dpi=100)
@@ -30,7 +43,10 @@ class RealTimeChartWidget(QWidget):
         self.style = mpf.make_mpf_style(marketcolors=self.mc, gridstyle=':', y_on_right=True)
 
         self.df = None
+        self.daily_df = None  # 일봉 원본 (주기 전환 시 재사용)
         self.current_ticker = None
+        self.stream = None  # 실시간 틱용 증분 지표 상태
+        self.interval = "D"
         
         # 차트 설정
         self.chart_settings = {
@@ -42,10 +58,41 @@ class RealTimeChartWidget(QWidget):
 
     def load_data(self, ticker, df, change_rate=0.0):
         self.current_ticker = ticker
-        
+        self.daily_df = df.copy()
+
+        if self.interval != "D":
+            intraday = mervis_candles.get_bars_frame(ticker, self.interval)
+            if intraday is not None:
+                df = intraday
+        self.render(df, change_rate)
+
+    def on_interval_changed(self, index):
+        self.interval = INTERVAL_OPTIONS[index][1]
+        if self.current_ticker is None: return
+        df = self.daily_df.copy() if self.daily_df is not None else None
+        if self.interval != "D":
+            df = mervis_candles.get_bars_frame(self.current_ticker, self.interval)
+            if df is None:
+                self.info_label.setText(f"종목: {self.current_ticker} | 장중 분봉 수집 중 (실시간 체결 대기)")
+                self.df = None
+                self.fig.clear()
+                self.canvas.draw()
+                return
+        if df is not None:
+            self.render(df)
+
+    def render(self, df, change_rate=0.0):
         # 모듈화: 데이터 가공 (Alligator 컬럼도 여기서 계산됨)
         self.df = technical.process_chart_data(df, self.chart_settings)
         self.df.index.name = 'Date'
+
+        # 초기 지표를 기준으로 증분 상태 구성 (이후 틱은 마지막 봉만 갱신)
+        self.stream = None
+        if not self.df.empty and 'Close' in self.df.columns:
+            try:
+                self.stream = technical_stream.IndicatorStream(self.df, self.chart_settings)
+            except Exception as e:
+                print(f"Stream Init Error: {e}")
         
         self.update_plot()
         
@@ -147,8 +194,27 @@ class RealTimeChartWidget(QWidget):
             print(f"Plot Error: {e}")
 
     def update_realtime_price(self, price):
+        if self.interval != "D":
+            # 분봉: 진행 중인 봉 1개만 조회, 새 봉이 시작되었을 때만 전체 프레임으로 다시 구성
+            bars = mervis_candles.get_bars(self.current_ticker, self.interval, limit=1)
+            if not bars: return
+            bar = bars[-1]
+            bar_time = pd.Timestamp(bar["ts"], unit='s', tz='UTC').tz_convert(mervis_candles.MARKET_TZ).tz_localize(None)
+            if self.df is None or self.df.empty or bar_time != self.df.index[-1]:
+                frame = mervis_candles.get_bars_frame(self.current_ticker, self.interval)
+                if frame is not None: self.render(frame)
+                return
+            if 'Volume' in self.df.columns:
+                self.df.at[self.df.index[-1], 'Volume'] = bar["volume"]
+
         if self.df is None or self.df.empty: return
 
+        # 증분 상태가 있으면 마지막 봉 관련 값만 O(1) 갱신
+        if self.stream is not None:
+            self.stream.apply(self.df, price)
+            self.update_plot()
+            return
+
         last_idx = self.df.index[-1]
         
         current_h = self.df.at[last_idx, 'High']
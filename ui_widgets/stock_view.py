@@ -9,7 +9,7 @@ from PyQt6.QtCore import Qt, pyqtSignal, QThread
 from PyQt6.QtGui import QColor
 
 import mervis_bigquery
-import kis_chart
+import mervis_chart_store
 
 class UniverseLoader(QThread):
     loaded = pyqtSignal(list)
@@ -83,6 +83,7 @@ class StockListWidget(QWidget):
         self.layout.addWidget(self.stock_table)
 
         self.saved_tickers = []
+        self.row_index = {}  # 종목 -> 행 번호 (시세 갱신 시 행 탐색 없이 바로 접근)
         self.data_file = "watched_tickers.json"
         
         self.load_saved_tickers()
@@ -129,6 +130,7 @@ class StockListWidget(QWidget):
         self.stock_table.setItem(row, 0, QTableWidgetItem(ticker))
         self.stock_table.setItem(row, 1, QTableWidgetItem("로딩중..."))
         self.stock_table.setItem(row, 2, QTableWidgetItem("-"))
+        self.row_index[ticker] = row
         
         del_btn = QPushButton("X")
         del_btn.setStyleSheet("QPushButton { background-color: #E74C3C; color: white; border-radius: 4px; font-weight: bold; } QPushButton:hover { background-color: #C0392B; }")
@@ -145,7 +147,7 @@ class StockListWidget(QWidget):
     def fetch_initial_price(self, ticker, row):
         # 데이터 정렬 후 최신값 가져오기
         try:
-            data = kis_chart.get_daily_chart(ticker)
+            data = mervis_chart_store.get_daily_chart(ticker)
             if data:
                 # 날짜 기준 내림차순 정렬 (최신이 맨 위로)
                 data.sort(key=lambda x: x.get('xymd', ''), reverse=True)
@@ -168,14 +170,16 @@ class StockListWidget(QWidget):
     def delete_stock(self, ticker):
         reply = QMessageBox.question(self, "삭제", f"'{ticker}' 삭제하시겠습니까?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
-            for r in range(self.stock_table.rowCount()):
-                if self.stock_table.item(r, 0).text() == ticker:
-                    self.stock_table.removeRow(r)
-                    if ticker in self.saved_tickers:
-                        self.saved_tickers.remove(ticker)
-                        self.save_tickers_to_file()
-                    self.request_unsubscribe.emit(ticker)
-                    break
+            r = self.row_index.pop(ticker, None)
+            if r is None: return
+            self.stock_table.removeRow(r)
+            # 삭제된 행 아래 종목들은 한 칸씩 당겨짐
+            for t, row in self.row_index.items():
+                if row > r: self.row_index[t] = row - 1
+            if ticker in self.saved_tickers:
+                self.saved_tickers.remove(ticker)
+                self.save_tickers_to_file()
+            self.request_unsubscribe.emit(ticker)
 
     def save_tickers_to_file(self):
         try:
@@ -197,13 +201,22 @@ class StockListWidget(QWidget):
         if item: self.request_chart_switch.emit(item.text())
 
     def update_prices(self, ticker, price, rate):
-        for r in range(self.stock_table.rowCount()):
-            if self.stock_table.item(r, 0).text() == ticker:
-                self.stock_table.setItem(r, 1, QTableWidgetItem(f"${price:,.2f}"))
-                
-                rate_item = QTableWidgetItem(f"{rate:+.2f}%")
-                if rate > 0: rate_item.setForeground(QColor("#FF0000"))
-                elif rate < 0: rate_item.setForeground(QColor("#0000FF"))
-                else: rate_item.setForeground(QColor("#000000"))
-                self.stock_table.setItem(r, 2, rate_item)
-                return
\ No newline at end of file
+        r = self.row_index.get(ticker)
+        if r is None: return
+        # 기존 셀 아이템 재사용 (틱마다 아이템 객체를 새로 만들지 않음)
+        price_item = self.stock_table.item(r, 1)
+        rate_item = self.stock_table.item(r, 2)
+        price_item.setText(f"${price:,.2f}")
+        rate_item.setText(f"{rate:+.2f}%")
+        if rate > 0: rate_item.setForeground(QColor("#FF0000"))
+        elif rate < 0: rate_item.setForeground(QColor("#0000FF"))
+        else: rate_item.setForeground(QColor("#000000"))
+
+    def update_prices_batch(self, batch):
+        # batch: { ticker: (price, change, volume) } - 프레임당 1회, 바뀐 종목만
+        self.stock_table.setUpdatesEnabled(False)
+        try:
+            for ticker, (price, rate, _) in batch.items():
+                self.update_prices(ticker, price, rate)
+        finally:
+            self.stock_table.setUpdatesEnabled(True)
\ No newline at end of file
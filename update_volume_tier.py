@@ -77,10 +77,15 @@ def update_volume_data():
 
     # [Step 1] 기존 데이터 로딩
     print("[Step 1] BigQuery에서 기존 종목 정보 로딩 중...")
-    query = f"SELECT ticker, name, sector FROM `{client.project}.{DATASET_ID}.{TABLE_TICKERS}`"
-    results = list(client.query(query).result())
-    
-    ticker_info_map = {row.ticker: {'name': row.name, 'sector': row.sector} for row in results}
+    # exchange 컬럼은 덮어쓰기(WRITE_TRUNCATE) 시 유실되지 않도록 함께 로딩 (구버전 테이블 대비)
+    try:
+        query = f"SELECT ticker, name, sector, exchange FROM `{client.project}.{DATASET_ID}.{TABLE_TICKERS}`"
+        results = list(client.query(query).result())
+        ticker_info_map = {row.ticker: {'name': row.name, 'sector': row.sector, 'exchange': row.exchange} for row in results}
+    except Exception:
+        query = f"SELECT ticker, name, sector FROM `{client.project}.{DATASET_ID}.{TABLE_TICKERS}`"
+        results = list(client.query(query).result())
+        ticker_info_map = {row.ticker: {'name': row.name, 'sector': row.sector, 'exchange': None} for row in results}
     all_tickers = list(ticker_info_map.keys())
     
     print(f"[Step 2] 총 {len(all_tickers)}개 종목 분석 시작...")
@@ -166,6 +171,7 @@ def update_volume_data():
             "ticker": ticker,
             "name": name,
             "sector": sector,
+            "exchange": info.get('exchange'),
             "keywords": keywords, 
             "status": status,
             "change_rate": data['rate'],
@@ -182,6 +188,7 @@ def update_volume_data():
             bigquery.SchemaField("ticker", "STRING", mode="REQUIRED"),
             bigquery.SchemaField("name", "STRING", mode="NULLABLE"),
             bigquery.SchemaField("sector", "STRING", mode="NULLABLE"),
+            bigquery.SchemaField("exchange", "STRING", mode="NULLABLE"),
             bigquery.SchemaField("keywords", "STRING", mode="NULLABLE"),
             bigquery.SchemaField("status", "STRING", mode="NULLABLE"),
             bigquery.SchemaField("change_rate", "FLOAT", mode="NULLABLE"), 